@@ -0,0 +1,113 @@
+"""Vectorized batch pairing of a whole category queue (needs NumPy)."""
+
+from typing import List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# NumPy is optional; without it matchmaking stays greedy and event-driven
+available = np is not None
+
+# Each seeker is scored against this many neighbours on either side in Elo order
+NEIGHBOURS = 16
+
+# Elo gap traded for each second the pair has waited, so long waiters go first
+WAIT_WEIGHT = 2.0
+
+# Passes over the seekers left unpaired; any still left wait for the next batch
+MAX_PASSES = 8
+
+
+def pair_seekers(
+    elos: Sequence[int],
+    widths: Sequence[Optional[int]],
+    waits: Sequence[float],
+    neighbours: int = NEIGHBOURS,
+    wait_weight: float = WAIT_WEIGHT,
+) -> List[Tuple[int, int]]:
+    """
+    Pair up seekers, minimizing Elo gap and favouring those who waited longest.
+    
+    widths are how far from their own Elo each seeker accepts (None = any);
+    a pair is compatible if the gap is within both widths. Each compatible
+    pair among Elo-order neighbours costs gap - wait_weight * (wait_i + wait_j).
+    
+    The result is the greedy matching by ascending cost (a 1/2-approximation
+    of the optimum), found in vectorized rounds: every seeker points at its
+    cheapest remaining pair, mutually chosen pairs are matched, repeat.
+    Seekers left over once their neighbours are taken are paired again
+    among themselves, for up to MAX_PASSES passes in all (each pass can pair
+    as few as two, so the rest are left to the next batch rather than
+    looping up to n/2 times).
+    
+    Returns index pairs into the inputs.
+    """
+    n = len(elos)
+    if n < 2:
+        return []
+    
+    elo = np.asarray(elos, dtype=np.float64)
+    width = np.array([np.inf if w is None else w for w in widths], dtype=np.float64)
+    wait = np.asarray(waits, dtype=np.float64)
+    
+    # Seekers whose neighbours all got taken get new neighbours on the next pass
+    order = np.argsort(elo, kind="stable")
+    pairs = []
+    for _ in range(MAX_PASSES):
+        if order.size < 2:
+            break
+        found = _pair_neighbours(elo[order], width[order], wait[order], neighbours, wait_weight)
+        if not found.size:
+            break
+        pairs.extend(zip(order[found[:, 0]].tolist(), order[found[:, 1]].tolist()))
+        
+        matched = np.zeros(order.size, dtype=bool)
+        matched[found.ravel()] = True
+        order = order[~matched]
+    
+    return pairs
+
+
+def _pair_neighbours(elo, width, wait, neighbours: int, wait_weight: float):
+    """Greedy-by-cost pairs among Elo-order neighbours of already sorted arrays, as an (m, 2) array."""
+    n = elo.size
+    
+    # Candidate pairs (i, i + d) in Elo order
+    left, right = [], []
+    for d in range(1, min(neighbours, n - 1) + 1):
+        i = np.arange(n - d)
+        left.append(i)
+        right.append(i + d)
+    left = np.concatenate(left)
+    right = np.concatenate(right)
+    
+    gap = elo[right] - elo[left]
+    ok = gap <= np.minimum(width[left], width[right])
+    left, right = left[ok], right[ok]
+    cost = gap[ok] - wait_weight * (wait[left] + wait[right])
+    
+    # Cheapest first; the stable sort position breaks cost ties so the order is total
+    by_cost = np.argsort(cost, kind="stable")
+    left, right = left[by_cost], right[by_cost]
+    
+    pairs = []
+    while left.size:
+        # Each seeker's cheapest pair is its lowest edge index in cost order
+        edge = np.arange(left.size)
+        best = np.full(n, left.size)
+        np.minimum.at(best, left, edge)
+        np.minimum.at(best, right, edge)
+        
+        mutual = (best[left] == edge) & (best[right] == edge)
+        pairs.append(np.column_stack((left[mutual], right[mutual])))
+        
+        matched = np.zeros(n, dtype=bool)
+        matched[left[mutual]] = True
+        matched[right[mutual]] = True
+        keep = ~(matched[left] | matched[right])
+        left, right = left[keep], right[keep]
+    
+    return np.concatenate(pairs) if pairs else np.empty((0, 2), dtype=np.int64)
@@ -22,12 +22,33 @@ class Settings(BaseSettings):
     time_rapid_base: int = 600  # 10 min
     time_rapid_increment: int = 5
     
+    # Record %clk comments in stored PGNs
+    pgn_clock_comments: bool = False
+    
     # Matchmaking
     elo_starting: int = 1200
     elo_floor: int = 100
     elo_band_bronze_max: int = 999
     elo_band_silver_max: int = 1400
     
+    # Seconds between whole-queue batch matching passes (0 = match on insert; batching needs NumPy)
+    matchmaking_batch_interval: float = 0
+    
+    # Time search widening to queue depth and recent arrivals near each seeker's Elo (off = every 30s)
+    matchmaking_adaptive_widening: bool = True
+    
+    # Shared matchmaking service for running several workers: a unix socket path or host:port
+    # ("" keeps the queues in this process); start it with `python -m app.matchmaking_service`
+    matchmaking_service: str = ""
+    
+    # Shared secret workers give the matchmaking service when they connect; required for
+    # a TCP address other than localhost, where anyone who can reach the port could seek
+    matchmaking_token: str = ""
+    
+    # Where the matchmaking service puts new games: "hash" spreads them over all workers by
+    # game ID, "seeker" keeps each on its first seeker's worker (fewer relayed moves)
+    game_placement: str = "hash"
+    
     # Rate limits (seconds)
     cooldown_bullet: int = 30
     cooldown_blitz: int = 60
@@ -35,9 +56,37 @@ class Settings(BaseSettings):
     loss_streak_threshold: int = 3
     loss_streak_cooldown: int = 120
     
+    # Frames queued per websocket before it counts as a slow consumer, and what happens to slow
+    # consumers: "coalesce" (keep only the newest state frame queued, disconnect if still full)
+    # or "disconnect"
+    send_queue_limit: int = 64
+    slow_consumer_policy: str = "coalesce"
+    
+    # Games with at least this many spectators send them only the latest state, at most
+    # spectator_max_fps times a second, instead of every move (players still get every move)
+    spectator_coalesce_threshold: int = 50
+    spectator_max_fps: float = 4
+    
+    # Games one multi-game /watch socket can follow at once, and seconds between
+    # re-rankings of the top games for its feeds
+    spectator_max_games: int = 64
+    spectator_feed_interval: float = 2.0
+    
+    # Seconds over which lobby spectator count changes are batched into one event
+    lobby_spectator_interval: float = 1.0
+    
     # Disconnect
     disconnect_forfeit_time: int = 120  # 2 minutes
     
+    # Move journal for recovering active games after a crash ("" disables it)
+    journal_path: str = "moltchess.journal"
+    journal_fsync: bool = True
+    journal_compact_bytes: int = 64 * 1024 * 1024
+    
+    # State handed to the next process on a restart ("" disables it); older handoffs are ignored
+    handoff_path: str = "moltchess.handoff"
+    handoff_max_age: int = 300
+    
     # CORS
     cors_origins: list[str] = ["http://localhost:5173", "http://localhost:3000", "https://moltchess.io"]
     
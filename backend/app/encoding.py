@@ -0,0 +1,44 @@
+"""JSON encoding for outbound frames and REST responses, using orjson when it is installed."""
+
+import json
+from typing import Any, Union
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def encoder_name() -> str:
+    """The JSON encoder in use, for the startup log."""
+    return "orjson" if orjson is not None else "json (orjson is not installed)"
+
+
+def dumps(obj: Any) -> str:
+    """Compact JSON text, with non-ASCII characters kept as is (as WebSocket.send_json does)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    """Compact JSON as UTF-8 bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def loads(text: Union[str, bytes]) -> Any:
+    """Parse JSON text."""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when available (same output as the default otherwise)."""
+    
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
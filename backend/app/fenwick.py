@@ -0,0 +1,75 @@
+"""Fenwick (binary indexed) tree for counting items over integer slots."""
+
+from typing import Iterable
+
+
+class FenwickTree:
+    """
+    Per-slot counts with O(log n) updates, prefix sums and k-th item lookups.
+    
+    Slots are 0-indexed; the tree itself is stored 1-indexed.
+    """
+    
+    __slots__ = ("size", "total", "_tree", "_top")
+    
+    def __init__(self, size: int):
+        self.size = size
+        self.total = 0
+        self._tree = [0] * (size + 1)
+        self._top = 1 << (size.bit_length() - 1) if size else 0
+    
+    @classmethod
+    def from_counts(cls, counts: Iterable[int]) -> "FenwickTree":
+        """Build a tree from per-slot counts in O(n)."""
+        counts = list(counts)
+        tree = cls(len(counts))
+        data = tree._tree
+        for i, count in enumerate(counts, 1):
+            data[i] += count
+            parent = i + (i & -i)
+            if parent <= tree.size:
+                data[parent] += data[i]
+        tree.total = sum(counts)
+        return tree
+    
+    def add(self, slot: int, delta: int):
+        """Add delta to a slot's count."""
+        self.total += delta
+        i = slot + 1
+        data = self._tree
+        while i <= self.size:
+            data[i] += delta
+            i += i & -i
+    
+    def prefix(self, slot: int) -> int:
+        """Sum of counts in slots 0..slot (0 for slot < 0)."""
+        i = min(slot + 1, self.size)
+        total = 0
+        data = self._tree
+        while i > 0:
+            total += data[i]
+            i -= i & -i
+        return total
+    
+    def find(self, k: int) -> int:
+        """Smallest slot whose prefix sum reaches k (1 <= k <= total)."""
+        pos = 0
+        step = self._top
+        data = self._tree
+        while step:
+            nxt = pos + step
+            if nxt <= self.size and data[nxt] < k:
+                pos = nxt
+                k -= data[nxt]
+            step >>= 1
+        return pos
+    
+    def next_at_or_after(self, slot: int) -> int:
+        """First non-empty slot >= slot, or -1."""
+        k = self.prefix(slot - 1) + 1
+        return self.find(k) if k <= self.total else -1
+    
+    def prev_at_or_before(self, slot: int) -> int:
+        """Last non-empty slot <= slot, or -1."""
+        k = self.prefix(slot)
+        return self.find(k) if k > 0 else -1
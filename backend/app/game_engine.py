@@ -1,14 +1,17 @@
 """Chess game engine using python-chess."""
 
 import chess
-import chess.pgn
-import io
 import time
-from typing import Optional, Literal, Tuple
+from array import array
+from typing import Dict, List, Optional, Literal, Tuple
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
 
+from .encoding import dumps
+from .pgn import PgnRecorder
+from .termination import TerminationDetector
+
 
 class GameStatus(Enum):
     PENDING = "pending"
@@ -30,6 +33,7 @@ class Termination(Enum):
     REPETITION = "repetition"
     FIFTY_MOVE = "fifty_move"
     DISCONNECT = "disconnect"
+    ABORTED = "aborted"  # A recorded game that could not be rebuilt after a restart
 
 
 @dataclass
@@ -47,7 +51,7 @@ class TimeControl:
         return controls.get(category, controls["blitz"])
 
 
-@dataclass
+@dataclass(slots=True)
 class Clock:
     white_time: float
     black_time: float
@@ -95,6 +99,13 @@ class Clock:
         else:
             return self.white_time, max(0, self.black_time - elapsed)
     
+    def time_until_flag(self) -> Optional[float]:
+        """Seconds until the player to move runs out of time, or None if the clock isn't running."""
+        if self.last_move_time is None:
+            return None
+        white, black = self.get_current_times()
+        return white if self.active_color == chess.WHITE else black
+    
     def is_timeout(self) -> Optional[chess.Color]:
         """Check if either player has timed out. Returns the color that timed out, or None."""
         white, black = self.get_current_times()
@@ -105,7 +116,17 @@ class Clock:
         return None
 
 
-@dataclass
+def encode_move(move: chess.Move) -> int:
+    """Pack a move into 16 bits: from (6) | to (6) | promotion piece type (4)."""
+    return move.from_square | (move.to_square << 6) | ((move.promotion or 0) << 12)
+
+
+def decode_move(code: int) -> chess.Move:
+    """Unpack a move encoded with encode_move."""
+    return chess.Move(code & 0x3F, (code >> 6) & 0x3F, (code >> 12) or None)
+
+
+@dataclass(slots=True)
 class ChessGame:
     """Represents an active chess game."""
     
@@ -120,7 +141,7 @@ class ChessGame:
     result: Optional[GameResult] = None
     termination: Optional[Termination] = None
     
-    moves: list[str] = field(default_factory=list)  # UCI moves
+    move_codes: array = field(default_factory=lambda: array("H"), repr=False)  # see encode_move
     started_at: Optional[datetime] = None
     ended_at: Optional[datetime] = None
     
@@ -131,9 +152,31 @@ class ChessGame:
     
     spectator_count: int = 0
     
+    # Mean of both players' ratings at the start, for ranking live games
+    average_elo: float = 0
+    
+    # Record %clk comments in the PGN
+    pgn_clock_comments: bool = False
+    
+    # With %clk comments: the (white, black) clock reading after each move, for rebuilding the game
+    move_clocks: List[Optional[Tuple[float, float]]] = field(default_factory=list, repr=False)
+    
+    detector: TerminationDetector = field(init=False, repr=False)
+    pgn: PgnRecorder = field(default_factory=PgnRecorder, repr=False)
+    
+    # Legal moves for the current ply, keyed by UCI
+    legal_ply: int = field(default=-1, init=False, repr=False)
+    legal_index: Dict[str, chess.Move] = field(default_factory=dict, init=False, repr=False)
+    
+    # Pre-encoded state frame for the current ply (everything except the clocks)
+    frame_ply: int = field(default=-1, init=False, repr=False)
+    frame_prefix: str = field(default="", init=False, repr=False)
+    frame_legal_moves: str = field(default="", init=False, repr=False)
+    
     def __post_init__(self):
         tc = TimeControl.from_category(self.category)
         self.clock = Clock(tc.base_time, tc.base_time, tc.increment)
+        self.detector = TerminationDetector(self.board)
     
     def start(self):
         """Start the game."""
@@ -157,54 +200,83 @@ class ChessGame:
             self._end_by_timeout(timed_out)
             return False, "Time out"
         
-        # Parse and validate move
-        try:
-            move = chess.Move.from_uci(uci_move)
-        except ValueError:
-            return False, "Invalid move format"
-        
-        if move not in self.board.legal_moves:
+        # Validate move against this ply's legal moves
+        move = self.get_legal_moves().get(uci_move)
+        if move is None:
+            try:
+                chess.Move.from_uci(uci_move)
+            except ValueError:
+                return False, "Invalid move format"
             return False, "Illegal move"
         
         # Make the move
-        self.board.push(move)
-        self.moves.append(uci_move)
+        self._push(move)
         
         # Switch clock
-        self.clock.switch()
+        remaining = self.clock.switch()
+        if self.pgn_clock_comments:
+            self.pgn.add_clock(remaining)
+            self.move_clocks.append((self.clock.white_time, self.clock.black_time))
         
         # Check for game end conditions
         self._check_game_end()
         
         return True, None
     
-    def _check_game_end(self):
-        """Check all game end conditions."""
-        if self.board.is_checkmate():
-            winner = chess.BLACK if self.board.turn == chess.WHITE else chess.WHITE
-            self.result = GameResult.WHITE_WIN if winner == chess.WHITE else GameResult.BLACK_WIN
-            self.termination = Termination.CHECKMATE
-            self._end_game()
+    def _push(self, move: chess.Move):
+        """Play a validated move and update the move records."""
+        self.pgn.add_move(self.board, move)
+        self.detector.push(self.board, move)
+        self.move_codes.append(encode_move(move))
         
-        elif self.board.is_stalemate():
-            self.result = GameResult.DRAW
-            self.termination = Termination.STALEMATE
-            self._end_game()
+        # Repetition and fifty-move detection are tracked by the detector,
+        # so the board doesn't need to keep its own history
+        self.board.clear_stack()
+    
+    def replay_move(self, uci_move: str, clock: Optional[Tuple[float, float]] = None) -> bool:
+        """
+        Re-apply a recorded move without touching the running clock.
         
-        elif self.board.is_insufficient_material():
-            self.result = GameResult.DRAW
-            self.termination = Termination.INSUFFICIENT
-            self._end_game()
+        clock is the (white, black) reading recorded right after the move, if known.
+        Returns False if the move is not legal in the current position.
+        """
+        move = self.get_legal_moves().get(uci_move)
+        if move is None:
+            return False
         
-        elif self.board.can_claim_threefold_repetition():
-            self.result = GameResult.DRAW
-            self.termination = Termination.REPETITION
-            self._end_game()
+        mover = self.board.turn
+        self._push(move)
+        self.clock.active_color = self.board.turn
+        
+        if clock is not None:
+            self.clock.white_time, self.clock.black_time = clock
+            if self.pgn_clock_comments:
+                self.pgn.add_clock(clock[0] if mover == chess.WHITE else clock[1])
+        if self.pgn_clock_comments:
+            self.move_clocks.append(clock)
         
-        elif self.board.can_claim_fifty_moves():
+        return True
+    
+    def resume(self, started_at: Optional[datetime] = None):
+        """Resume a replayed game, with the clock stopped until the player to move is back."""
+        self.status = GameStatus.ACTIVE
+        self.started_at = started_at or datetime.utcnow()
+        self.clock.last_move_time = None
+        self._check_game_end()
+    
+    def _check_game_end(self):
+        """Check all game end conditions."""
+        ending = self.detector.check(self.board, bool(self.get_legal_moves()))
+        if ending is None:
+            return
+        
+        self.termination = Termination(ending)
+        if self.termination == Termination.CHECKMATE:
+            winner = chess.BLACK if self.board.turn == chess.WHITE else chess.WHITE
+            self.result = GameResult.WHITE_WIN if winner == chess.WHITE else GameResult.BLACK_WIN
+        else:
             self.result = GameResult.DRAW
-            self.termination = Termination.FIFTY_MOVE
-            self._end_game()
+        self._end_game()
     
     def _end_by_timeout(self, timed_out_color: chess.Color):
         """End game due to timeout."""
@@ -223,19 +295,29 @@ class ChessGame:
         self.status = GameStatus.ENDED
         self.ended_at = datetime.utcnow()
     
+    def get_legal_moves(self) -> Dict[str, chess.Move]:
+        """Get the legal moves in the current position, keyed by UCI (computed once per ply)."""
+        ply = len(self.move_codes)
+        if self.legal_ply != ply:
+            self.legal_index = {move.uci(): move for move in self.board.generate_legal_moves()}
+            self.legal_ply = ply
+        return self.legal_index
+    
     def get_fen(self) -> str:
         """Get current board position in FEN."""
         return self.board.fen()
     
     def get_pgn(self) -> str:
         """Generate PGN for the game."""
-        game = chess.pgn.Game()
-        game.headers["Event"] = "MoltChess Arena"
-        game.headers["Site"] = "moltchess.io"
-        game.headers["Date"] = self.started_at.strftime("%Y.%m.%d") if self.started_at else "????.??.??"
-        game.headers["White"] = self.white_agent_id
-        game.headers["Black"] = self.black_agent_id
-        game.headers["TimeControl"] = f"{int(TimeControl.from_category(self.category).base_time)}+{int(TimeControl.from_category(self.category).increment)}"
+        tc = TimeControl.from_category(self.category)
+        headers = {
+            "Event": "MoltChess Arena",
+            "Site": "moltchess.io",
+            "Date": self.started_at.strftime("%Y.%m.%d") if self.started_at else "????.??.??",
+            "White": self.white_agent_id,
+            "Black": self.black_agent_id,
+            "TimeControl": f"{int(tc.base_time)}+{int(tc.increment)}",
+        }
         
         if self.result:
             result_map = {
@@ -243,20 +325,22 @@ class ChessGame:
                 GameResult.BLACK_WIN: "0-1",
                 GameResult.DRAW: "1/2-1/2",
             }
-            game.headers["Result"] = result_map[self.result]
+            headers["Result"] = result_map[self.result]
         
         if self.termination:
-            game.headers["Termination"] = self.termination.value
-        
-        # Add moves
-        node = game
-        temp_board = chess.Board()
-        for uci_move in self.moves:
-            move = chess.Move.from_uci(uci_move)
-            node = node.add_variation(move)
-            temp_board.push(move)
+            headers["Termination"] = self.termination.value
         
-        return str(game)
+        return self.pgn.export(headers)
+    
+    @property
+    def moves(self) -> list[str]:
+        """All moves played so far, in UCI notation."""
+        return [decode_move(code).uci() for code in self.move_codes]
+    
+    @property
+    def last_move(self) -> Optional[str]:
+        """The last move played, in UCI notation."""
+        return decode_move(self.move_codes[-1]).uci() if self.move_codes else None
     
     def to_move(self) -> Literal["white", "black"]:
         """Get whose turn it is."""
@@ -282,9 +366,41 @@ class ChessGame:
         white_time, black_time = self.clock.get_current_times()
         return {
             "fen": self.get_fen(),
-            "last_move": self.moves[-1] if self.moves else None,
+            "last_move": self.last_move,
             "clock_white": round(white_time, 1),
             "clock_black": round(black_time, 1),
             "to_move": self.to_move(),
             "move_number": self.board.fullmove_number,
         }
+    
+    def get_state_frame(self, extra: Optional[dict] = None, legal_moves: bool = False) -> str:
+        """
+        Get the current state event as encoded JSON.
+        
+        The position part is encoded once per ply and shared by every
+        recipient; only the clocks (and any extra fields) are added per call.
+        With legal_moves, the UCI moves available to the side to move are
+        included as well.
+        """
+        ply = len(self.move_codes)
+        if self.frame_ply != ply:
+            self.frame_prefix = dumps({
+                "event": "state",
+                "fen": self.get_fen(),
+                "last_move": self.last_move,
+                "to_move": self.to_move(),
+                "move_number": self.board.fullmove_number,
+            })[:-1]
+            self.frame_legal_moves = ""
+            self.frame_ply = ply
+        
+        if legal_moves and not self.frame_legal_moves:
+            self.frame_legal_moves = ',"legal_moves":' + dumps(list(self.get_legal_moves()))
+        
+        white_time, black_time = self.clock.get_current_times()
+        frame = f'{self.frame_prefix},"clock_white":{round(white_time, 1)!r},"clock_black":{round(black_time, 1)!r}'
+        if legal_moves:
+            frame += self.frame_legal_moves
+        if extra:
+            frame += "," + dumps(extra)[1:-1]
+        return frame + "}"
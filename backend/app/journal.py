@@ -0,0 +1,232 @@
+"""Append-only move journal for recovering active games after a crash."""
+
+import asyncio
+import json
+import math
+import os
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional
+
+
+def clock_reading(seconds: float) -> float:
+    """A clock time to the millisecond, truncated so its %clk second is the one the game showed."""
+    return math.floor(seconds * 1000) / 1000
+
+
+@dataclass
+class JournaledGame:
+    """An unfinished game as reconstructed from the journal."""
+    game_id: str
+    white_agent_id: str
+    black_agent_id: str
+    category: str
+    started_at: Optional[str] = None
+    pgn_clock_comments: bool = False
+    moves: List[str] = field(default_factory=list)
+    clocks: List[Optional[tuple[float, float]]] = field(default_factory=list)  # (white, black) after each move
+
+
+class MoveJournal:
+    """
+    Group-committed, append-only journal of game starts, moves and ends.
+    
+    record() only appends an encoded line to an in-memory batch, so it never
+    blocks the move path. A writer task flushes whatever has accumulated in
+    one write (and fsync) off the event loop; records arriving during a
+    flush go out with the next batch.
+    
+    Records are JSON lines:
+        {"t": "start", "g": game_id, "w": white, "b": black, "c": category, "s": started_at, "clk": bool}
+        {"t": "move", "g": game_id, "m": uci, "cw": white_time, "cb": black_time}
+        {"t": "end", "g": game_id}
+    
+    Clock readings are optional on compacted move records: recovery needs
+    the one after the last move, and games with %clk comments keep every
+    move's so their PGN comes out the same.
+    """
+    
+    def __init__(self):
+        self.path: Optional[str] = None
+        self.fsync = True
+        self.compact_bytes = 64 * 1024 * 1024
+        
+        # Produces the records describing all live games, used for compaction
+        self.snapshot_source: Optional[Callable[[], Iterable[dict]]] = None
+        
+        self._batch: List[str] = []
+        self._file = None
+        self._bytes_written = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+    
+    @property
+    def enabled(self) -> bool:
+        return self._file is not None
+    
+    async def open(self, path: str, fsync: bool = True, compact_bytes: Optional[int] = None):
+        """Open the journal for appending and start the writer task."""
+        self.path = path
+        self.fsync = fsync
+        if compact_bytes is not None:
+            self.compact_bytes = compact_bytes
+        
+        self._file = open(path, "ab")
+        self._bytes_written = self._file.tell()
+        self._closing = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._writer())
+    
+    async def close(self):
+        """Flush pending records and stop the writer task."""
+        if self._task:
+            # Let the writer finish its current batch rather than cancelling mid-write
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        
+        if self._file:
+            await asyncio.to_thread(self._write, self._take_batch())
+            self._file.close()
+            self._file = None
+    
+    def record(self, entry: dict):
+        """Queue a record for the next group commit."""
+        if self._file is None:
+            return
+        self._batch.append(json.dumps(entry, separators=(",", ":")))
+        self._wakeup.set()
+    
+    def record_start(self, game_id: str, white_id: str, black_id: str, category: str,
+                     started_at: Optional[str], pgn_clock_comments: bool = False):
+        self.record({
+            "t": "start", "g": game_id, "w": white_id, "b": black_id,
+            "c": category, "s": started_at, "clk": pgn_clock_comments,
+        })
+    
+    def record_move(self, game_id: str, uci_move: str, white_time: float, black_time: float):
+        self.record({
+            "t": "move", "g": game_id, "m": uci_move,
+            "cw": clock_reading(white_time), "cb": clock_reading(black_time),
+        })
+    
+    def record_end(self, game_id: str):
+        self.record({"t": "end", "g": game_id})
+    
+    def _take_batch(self) -> bytes:
+        batch, self._batch = self._batch, []
+        return ("\n".join(batch) + "\n").encode() if batch else b""
+    
+    def _write(self, data: bytes):
+        if not data:
+            return
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._bytes_written += len(data)
+    
+    async def _writer(self):
+        """Flush accumulated records, one batch at a time."""
+        while True:
+            try:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                
+                await asyncio.to_thread(self._write, self._take_batch())
+                if self._closing:
+                    break
+                
+                if self._bytes_written > self.compact_bytes and self.snapshot_source:
+                    await self.compact(self.snapshot_source())
+            
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                print(f"Journal write error: {e}")
+                await asyncio.sleep(0.1)
+    
+    async def compact(self, records: Iterable[dict]):
+        """Atomically replace the journal with the given records (the live games)."""
+        if self._file is None:
+            return
+        
+        # Anything still queued predates the snapshot, which already covers it
+        self._batch = []
+        data = "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records).encode()
+        
+        def rewrite():
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            self._file.close()
+            os.replace(tmp_path, self.path)
+            self._file = open(self.path, "ab")
+            self._bytes_written = len(data)
+        
+        await asyncio.to_thread(rewrite)
+
+
+def load_journal(path: str) -> Dict[str, JournaledGame]:
+    """Replay a journal file and return the games that never ended."""
+    games: Dict[str, JournaledGame] = {}
+    if not os.path.exists(path):
+        return games
+    
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # Torn write at the tail of a crashed process
+            
+            kind = entry.get("t")
+            game_id = entry.get("g")
+            
+            if kind == "start":
+                games[game_id] = JournaledGame(
+                    game_id=game_id,
+                    white_agent_id=entry["w"],
+                    black_agent_id=entry["b"],
+                    category=entry["c"],
+                    started_at=entry.get("s"),
+                    pgn_clock_comments=entry.get("clk", False),
+                )
+            elif kind == "move" and game_id in games:
+                games[game_id].moves.append(entry["m"])
+                games[game_id].clocks.append((entry["cw"], entry["cb"]) if "cw" in entry else None)
+            elif kind == "end":
+                games.pop(game_id, None)
+    
+    return games
+
+
+def game_records(game_id: str, white_id: str, black_id: str, category: str, started_at: Optional[str],
+                 pgn_clock_comments: bool, moves: List[str], white_time: float, black_time: float,
+                 clocks: Optional[List[Optional[tuple[float, float]]]] = None) -> List[dict]:
+    """
+    Records that recreate a live game from scratch (used for compaction).
+    
+    clocks holds the (white, black) reading after each move where known; the
+    current one goes on the last move either way.
+    """
+    records = [{
+        "t": "start", "g": game_id, "w": white_id, "b": black_id,
+        "c": category, "s": started_at, "clk": pgn_clock_comments,
+    }]
+    for i, uci_move in enumerate(moves):
+        record = {"t": "move", "g": game_id, "m": uci_move}
+        clock = clocks[i] if clocks and i < len(clocks) else None
+        if clock is not None:
+            record.update(cw=clock_reading(clock[0]), cb=clock_reading(clock[1]))
+        records.append(record)
+    if records[1:]:
+        records[-1].update(cw=clock_reading(white_time), cb=clock_reading(black_time))
+    return records
+
+
+# Global journal instance
+journal = MoveJournal()
@@ -0,0 +1,98 @@
+"""
+The live games, as GET /games/live lists them, kept in memory.
+
+Every change is an event that bumps the version:
+
+    game_started  {game}                  a new entry
+    game_ended    {game_id}
+    spectators    {counts: {game_id: n}}  spectator counts that changed
+
+Workers without a matchmaking service version events themselves; with one,
+the service versions them and sends each to every worker, which applies
+them in order. The listing is encoded once per version and served with an
+ETag of "epoch-version" (the epoch changes whenever the versions restart).
+"""
+
+import secrets
+from typing import Dict, Optional, Tuple
+
+from .encoding import dumps_bytes
+
+
+class LiveGames:
+    """Live game entries, keyed by game ID in the order the games started."""
+    
+    def __init__(self):
+        self.epoch = secrets.token_hex(4)
+        self.version = 0
+        self.games: Dict[str, dict] = {}
+        
+        # ((epoch, version), encoded listing)
+        self._body: Tuple[Optional[tuple], bytes] = (None, b"")
+    
+    @property
+    def etag(self) -> str:
+        return f'"{self.epoch}-{self.version}"'
+    
+    def record(self, event: dict) -> Optional[dict]:
+        """Apply a new event as the next version. Returns it versioned, or None if it changed nothing."""
+        event = self._change(event)
+        if event is None:
+            return None
+        self.version += 1
+        event["version"] = self.version
+        return event
+    
+    def apply(self, event: dict) -> bool:
+        """Apply an event versioned elsewhere, unless it is not newer than what is here."""
+        if event["version"] <= self.version:
+            return False
+        self._change(event)
+        self.version = event["version"]
+        return True
+    
+    def _change(self, event: dict) -> Optional[dict]:
+        kind = event["event"]
+        
+        if kind == "game_started":
+            game = event["game"]
+            if game["id"] in self.games:
+                return None
+            self.games[game["id"]] = game
+        
+        elif kind == "game_ended":
+            if self.games.pop(event["game_id"], None) is None:
+                return None
+        
+        elif kind == "spectators":
+            counts = {
+                game_id: count for game_id, count in event["counts"].items()
+                if game_id in self.games and self.games[game_id]["spectator_count"] != count
+            }
+            if not counts:
+                return None
+            for game_id, count in counts.items():
+                self.games[game_id]["spectator_count"] = count
+            event = {**event, "counts": counts}
+        
+        return event
+    
+    def snapshot(self) -> dict:
+        return {"epoch": self.epoch, "version": self.version, "games": list(self.games.values())}
+    
+    def load(self, snapshot: dict):
+        """Replace everything with a snapshot taken elsewhere."""
+        self.epoch = snapshot["epoch"]
+        self.version = snapshot["version"]
+        self.games = {game["id"]: game for game in snapshot["games"]}
+        self._body = (None, b"")
+    
+    def body(self) -> bytes:
+        """The GET /games/live response, newest games first, encoded once per version."""
+        if self._body[0] != (self.epoch, self.version):
+            self._body = ((self.epoch, self.version), dumps_bytes({
+                "success": True,
+                "version": self.version,
+                "games": list(reversed(self.games.values())),
+            }))
+        return self._body[1]
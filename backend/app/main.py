@@ -2,13 +2,15 @@
 
 import asyncio
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request, HTTPException, Query, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, JSONResponse
 import os
+from typing import Optional
 
 from .config import get_settings
+from .encoding import FastJSONResponse, encoder_name
 from .database import init_db
 from .routes import register, leaderboard, agents, games
 from .websocket.manager import manager
@@ -17,12 +19,17 @@ from .websocket.play import (
     handle_seek,
     handle_cancel_seek,
     handle_move,
+    handle_agent_connect,
     handle_agent_disconnect,
     handle_agent_reconnect,
+    handle_snapshot,
     start_background_tasks,
     stop_background_tasks,
 )
-from .websocket.spectator import handle_spectator
+from .websocket.handoff import drain, is_draining, restore_seeks
+from .websocket.multiwatch import handle_multi_spectator
+from .websocket.spectator import handle_spectator, handle_spectator_events
+from .websocket.protocol import UNSUPPORTED_PROTOCOL_CODE, parse_protocol, receive_message, unsupported_protocol_error
 
 
 settings = get_settings()
@@ -33,6 +40,7 @@ async def lifespan(app: FastAPI):
     """Application lifespan handler."""
     # Startup
     print("Starting MoltChess...")
+    print(f"Encoding JSON with {encoder_name()}")
     await init_db()
     await start_background_tasks()
     print("MoltChess is ready!")
@@ -41,6 +49,7 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     print("Shutting down MoltChess...")
+    await drain()
     await stop_background_tasks()
 
 
@@ -49,6 +58,7 @@ app = FastAPI(
     description="The AI Chess Arena for Moltbook Agents",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
 # CORS
@@ -100,6 +110,29 @@ async def stats():
     }
 
 
+@app.get("/stats/queue/{category}")
+async def queue_seekers(category: str, offset: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=200)):
+    """List the seekers in one matchmaking queue, a page at a time."""
+    from .matchmaking import matchmaking
+    from .matchmaking_service import MatchmakingError
+    
+    queue_stats = matchmaking.get_queue_stats()
+    if category not in queue_stats:
+        raise HTTPException(status_code=404, detail="Unknown category")
+    
+    try:
+        seekers = await matchmaking.list_seekers(category, offset, limit)
+    except MatchmakingError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    return {
+        "category": category,
+        "count": queue_stats[category]["count"],
+        "offset": offset,
+        "seekers": seekers,
+    }
+
+
 # === Static Files (Skill files) ===
 
 STATIC_DIR = os.path.join(os.path.dirname(__file__), "..", "static")
@@ -140,6 +173,10 @@ async def websocket_play(websocket: WebSocket):
     # Authenticate
     await websocket.accept()
     
+    if is_draining():
+        await websocket.close(code=1012, reason="Server restarting")
+        return
+    
     agent_data = await authenticate_agent(websocket)
     if not agent_data:
         await websocket.send_json({
@@ -151,15 +188,22 @@ async def websocket_play(websocket: WebSocket):
     
     agent_id = agent_data["id"]
     agent_name = agent_data["name"]
+    legal_moves = websocket.query_params.get("legal_moves", "").lower() in ("1", "true", "yes")
+    protocol = parse_protocol(websocket.query_params.get("protocol"))
+    if protocol is None:
+        await websocket.send_json(unsupported_protocol_error())
+        await websocket.close(code=UNSUPPORTED_PROTOCOL_CODE)
+        return
     
-    # Check if reconnecting to existing game
+    # Check if reconnecting to existing game (which may run on another worker)
+    await handle_agent_connect(agent_id, legal_moves)
     existing_game = manager.get_agent_game(agent_id)
     
     # Register connection
-    conn = await manager.connect_agent(websocket, agent_id, agent_name)
+    conn = await manager.connect_agent(websocket, agent_id, agent_name, legal_moves=legal_moves, protocol=protocol)
     
     # Send connected confirmation
-    await websocket.send_json({
+    conn.send({
         "event": "connected",
         "agent_id": agent_id,
         "agent_name": agent_name,
@@ -173,14 +217,17 @@ async def websocket_play(websocket: WebSocket):
         await handle_agent_reconnect(agent_id)
     
     try:
+        # Pick up seeks handed over from before a restart
+        await restore_seeks(agent_id)
+        
         while True:
-            data = await websocket.receive_json()
+            data = await receive_message(websocket)
             action = data.get("action")
             
             if action == "seek":
                 category = data.get("category")
                 if category not in ["bullet", "blitz", "rapid"]:
-                    await websocket.send_json({
+                    conn.send({
                         "event": "error",
                         "message": "Invalid category. Use: bullet, blitz, rapid"
                     })
@@ -188,26 +235,32 @@ async def websocket_play(websocket: WebSocket):
                 
                 elo = agent_data.get(f"elo_{category}", 1200)
                 response = await handle_seek(agent_id, agent_name, category, elo)
-                await websocket.send_json(response)
+                if response:
+                    conn.send(response)
             
             elif action == "cancel_seek":
                 category = data.get("category")
                 if category:
                     response = await handle_cancel_seek(agent_id, category)
-                    await websocket.send_json(response)
+                    conn.send(response)
             
             elif action == "move":
                 move = data.get("move")
                 if move:
                     error = await handle_move(agent_id, move)
                     if error:
-                        await websocket.send_json(error)
+                        conn.send(error)
+            
+            elif action == "snapshot":
+                error = await handle_snapshot(agent_id)
+                if error:
+                    conn.send(error)
             
             elif action == "ping":
-                await websocket.send_json({"event": "pong"})
+                conn.send({"event": "pong"})
             
             else:
-                await websocket.send_json({
+                conn.send({
                     "event": "error",
                     "message": f"Unknown action: {action}"
                 })
@@ -217,8 +270,15 @@ async def websocket_play(websocket: WebSocket):
     except Exception as e:
         print(f"WebSocket error for {agent_id}: {e}")
     finally:
-        await handle_agent_disconnect(agent_id)
-        await manager.disconnect_agent(websocket)
+        # A newer connection for the same agent may already have replaced this one
+        if await manager.disconnect_agent(websocket):
+            await handle_agent_disconnect(agent_id)
+
+
+@app.websocket("/watch")
+async def websocket_watch_many(websocket: WebSocket):
+    """WebSocket endpoint for spectators following several games."""
+    await handle_multi_spectator(websocket)
 
 
 @app.websocket("/watch/{game_id}")
@@ -227,6 +287,12 @@ async def websocket_watch(websocket: WebSocket, game_id: str):
     await handle_spectator(websocket, game_id)
 
 
+@app.get("/watch/{game_id}/events")
+async def watch_events(game_id: str, last_event_id: Optional[str] = Header(None)):
+    """Server-Sent Events endpoint for spectators."""
+    return await handle_spectator_events(game_id, last_event_id)
+
+
 # === Error Handlers ===
 
 @app.exception_handler(Exception)
@@ -1,22 +1,54 @@
 """Matchmaking system with Elo-banded queues and wait-based widening."""
 
 import asyncio
+import math
 import time
+from collections import Counter
 from dataclasses import dataclass, field
-from typing import Optional, Dict, List, Callable, Awaitable
+from typing import Optional, Dict, List, Set, Callable, Awaitable, Iterator
 from enum import Enum
 
-from .elo import get_elo_band, elos_compatible
+from .elo import get_elo_band
+from . import batch_matching
+from .fenwick import FenwickTree
+from .scheduler import DeadlineScheduler
 
 
 class SeekStatus(Enum):
     SEARCHING = "searching"
-    WIDENING_1 = "widening_1"  # After 30s, ±400 Elo
-    WIDENING_2 = "widening_2"  # After 60s, any Elo
+    WIDENING_1 = "widening_1"  # ±400 Elo (after 30s, unless widening adaptively)
+    WIDENING_2 = "widening_2"  # Any Elo (after 60s, unless widening adaptively)
     MATCHED = "matched"
     CANCELLED = "cancelled"
 
 
+# Queued seekers by widening stage, with how far from their own Elo they accept (None = any)
+STAGES = (SeekStatus.SEARCHING, SeekStatus.WIDENING_1, SeekStatus.WIDENING_2)
+STAGE_INDEX = {status: i for i, status in enumerate(STAGES)}
+STAGE_WIDTHS = (200, 400, None)
+
+# Wait (seconds) after which a seeker enters each stage
+STAGE_WAITS = (0, 30, 60)
+
+# Adaptive widening scales each stage's wait by how many partners the seeker can
+# expect within its current range over that wait (recent arrivals there plus
+# seekers already queued nearby): WIDEN_TARGET expected partners keeps the
+# default wait, fewer widen sooner, more later, within these factors
+WIDEN_TARGET = 2.0
+WIDEN_MIN_FACTOR = 0.1
+WIDEN_MAX_FACTOR = 2.0
+
+# Recent arrivals are counted per RATE_BUCKET Elo, halving in weight every RATE_HALF_LIFE seconds
+RATE_BUCKET = 100
+RATE_HALF_LIFE = 120.0
+
+# Elo values are clamped into this many index slots
+ELO_SLOTS = 4096
+
+# Upper bounds (seconds) of the wait-time histogram buckets; the last bucket is open-ended
+WAIT_BUCKETS = (1, 5, 10, 30, 60, 120, 300)
+
+
 @dataclass
 class Seeker:
     agent_id: str
@@ -27,19 +59,21 @@ class Seeker:
     status: SeekStatus = SeekStatus.SEARCHING
     queued_at: float = field(default_factory=time.time)
     position: int = 0
+    seq: int = field(default=0, repr=False)  # Arrival slot in its SeekerQueue
+    
+    # Widening stage it was last queued at, kept once it is matched or cancelled
+    stage: int = 0
     
     def get_elo_range(self) -> tuple[int, int]:
-        """Get current acceptable Elo range based on status."""
-        if self.status == SeekStatus.SEARCHING:
-            return (self.elo - 200, self.elo + 200)
-        elif self.status == SeekStatus.WIDENING_1:
-            return (self.elo - 400, self.elo + 400)
-        else:  # WIDENING_2 or later
+        """Get the acceptable Elo range of the seeker's widening stage."""
+        width = STAGE_WIDTHS[self.stage]
+        if width is None:  # WIDENING_2
             return (0, 9999)
+        return (self.elo - width, self.elo + width)
     
-    def get_wait_time(self) -> float:
+    def get_wait_time(self, now: Optional[float] = None) -> float:
         """Get time spent in queue."""
-        return time.time() - self.queued_at
+        return (time.time() if now is None else now) - self.queued_at
 
 
 @dataclass
@@ -47,17 +81,250 @@ class MatchResult:
     seeker1: Seeker
     seeker2: Seeker
     category: str
+    game_id: Optional[str] = None  # Set by the matchmaking service; otherwise the game picks its own
 
 
-class MatchmakingQueue:
-    """Manages matchmaking queues for all categories."""
+class WaitHistogram:
+    """Counts of completed waits (queued until matched or cancelled) per WAIT_BUCKETS bucket."""
+    
+    __slots__ = ("counts", "total", "total_wait")
+    
+    def __init__(self):
+        self.counts = [0] * (len(WAIT_BUCKETS) + 1)
+        self.total = 0
+        self.total_wait = 0.0
+    
+    def record(self, wait: float):
+        bucket = 0
+        while bucket < len(WAIT_BUCKETS) and wait > WAIT_BUCKETS[bucket]:
+            bucket += 1
+        self.counts[bucket] += 1
+        self.total += 1
+        self.total_wait += wait
+    
+    def to_dict(self) -> dict:
+        return {
+            "count": self.total,
+            "mean": round(self.total_wait / self.total, 1) if self.total else None,
+            "buckets": [
+                {"le": bound, "count": count}
+                for bound, count in zip(WAIT_BUCKETS + (None,), self.counts)
+            ],
+        }
+
+
+def elo_slot(elo: int) -> int:
+    return min(max(elo, 0), ELO_SLOTS - 1)
+
+
+class ArrivalRate:
+    """Recent seek arrival rate per Elo bucket, as exponentially decayed counts."""
+    
+    __slots__ = ("_counts", "_updated")
+    
+    def __init__(self):
+        buckets = ELO_SLOTS // RATE_BUCKET + 1
+        self._counts = [0.0] * buckets
+        self._updated = [0.0] * buckets
+    
+    def record(self, elo: int, now: float):
+        bucket = elo_slot(elo) // RATE_BUCKET
+        self._counts[bucket] = self._decayed(bucket, now) + 1
+        self._updated[bucket] = now
+    
+    def rate(self, lo: int, hi: int, now: float) -> float:
+        """Arrivals per second with Elo in [lo, hi] (to bucket precision)."""
+        count = sum(
+            self._decayed(bucket, now)
+            for bucket in range(elo_slot(lo) // RATE_BUCKET, elo_slot(hi) // RATE_BUCKET + 1)
+        )
+        # A steady rate r settles at a decayed count of r * RATE_HALF_LIFE / ln 2
+        return count * math.log(2) / RATE_HALF_LIFE
+    
+    def _decayed(self, bucket: int, now: float) -> float:
+        return self._counts[bucket] * 0.5 ** (max(now - self._updated[bucket], 0.0) / RATE_HALF_LIFE)
+
+
+class SeekerQueue:
+    """
+    One category's queue, indexed by arrival order and by Elo within each widening stage.
+    
+    Partner search walks outward from a seeker's Elo in each stage's index,
+    so it is a bounded range query rather than a scan of the queue. Adding,
+    removing, restaging and position lookups are O(log n).
+    
+    Seekers in one category queue are keyed by agent_id, which is unique there.
+    """
     
     def __init__(self):
+        # agent_id -> seeker, in arrival order
+        self.arrivals: Dict[str, Seeker] = {}
+        self._by_seq: Dict[int, Seeker] = {}
+        self._arrival_tree = FenwickTree(1024)
+        self._next_seq = 0
+        
+        self.band_counts: Counter = Counter()
+        
+        # Per stage: Elo slot counts and Elo slot -> {agent_id -> seeker}
+        self._elo_trees = [FenwickTree(ELO_SLOTS) for _ in STAGES]
+        self._buckets: List[Dict[int, Dict[str, Seeker]]] = [{} for _ in STAGES]
+    
+    def __len__(self) -> int:
+        return len(self.arrivals)
+    
+    def __iter__(self) -> Iterator[Seeker]:
+        return iter(list(self.arrivals.values()))
+    
+    def __contains__(self, seeker: Seeker) -> bool:
+        return self.arrivals.get(seeker.agent_id) is seeker
+    
+    def add(self, seeker: Seeker):
+        """Append a seeker (its status picks the stage)."""
+        if self._next_seq >= self._arrival_tree.size:
+            self._renumber()
+        seeker.seq = self._next_seq
+        self._next_seq += 1
+        self._arrival_tree.add(seeker.seq, 1)
+        self.arrivals[seeker.agent_id] = seeker
+        self._by_seq[seeker.seq] = seeker
+        self.band_counts[seeker.band] += 1
+        self._index(seeker, STAGE_INDEX[seeker.status])
+    
+    def remove(self, seeker: Seeker) -> bool:
+        """Remove a seeker. Returns False if it wasn't queued."""
+        if seeker not in self:
+            return False
+        del self.arrivals[seeker.agent_id]
+        del self._by_seq[seeker.seq]
+        self._arrival_tree.add(seeker.seq, -1)
+        self.band_counts[seeker.band] -= 1
+        self._unindex(seeker, STAGE_INDEX[seeker.status])
+        return True
+    
+    def set_status(self, seeker: Seeker, status: SeekStatus):
+        """Move a queued seeker to another widening stage."""
+        self._unindex(seeker, STAGE_INDEX[seeker.status])
+        seeker.status = status
+        self._index(seeker, STAGE_INDEX[status])
+    
+    def position(self, seeker: Seeker) -> int:
+        """Position in arrival order (1-indexed), or 0 if not queued."""
+        if seeker not in self:
+            return 0
+        return self._arrival_tree.prefix(seeker.seq)
+    
+    def stage_count(self, stage: int) -> int:
+        return self._elo_trees[stage].total
+    
+    def count_between(self, lo: int, hi: int) -> int:
+        """Number of queued seekers (in any stage) with Elo in [lo, hi]."""
+        lo_slot, hi_slot = elo_slot(lo), elo_slot(hi)
+        return sum(tree.prefix(hi_slot) - tree.prefix(lo_slot - 1) for tree in self._elo_trees)
+    
+    def page(self, offset: int, limit: int) -> List[Seeker]:
+        """Seekers at arrival positions offset+1 .. offset+limit, in O(limit log n)."""
+        end = min(offset + limit, len(self))
+        return [self._by_seq[self._arrival_tree.find(k)] for k in range(offset + 1, end + 1)]
+    
+    def find_partner(self, seeker: Seeker) -> Optional[Seeker]:
+        """
+        The compatible seeker closest in Elo, earliest arrival first on ties.
+        
+        Widths are symmetric, so a candidate in stage s at distance d accepts
+        the seeker iff d <= STAGE_WIDTHS[s]; searching each stage within the
+        smaller of the two widths finds exactly the mutually compatible ones.
+        """
+        own_width = STAGE_WIDTHS[STAGE_INDEX[seeker.status]]
+        slot = elo_slot(seeker.elo)
+        best = None
+        best_key = None
+        
+        for stage, width in enumerate(STAGE_WIDTHS):
+            tree = self._elo_trees[stage]
+            if tree.total == 0 or (tree.total == 1 and STAGE_INDEX[seeker.status] == stage):
+                continue
+            
+            limit = min(w for w in (own_width, width, ELO_SLOTS) if w is not None)
+            lo, hi = max(slot - limit, 0), min(slot + limit, ELO_SLOTS - 1)
+            
+            for candidate in self._nearest(stage, slot, lo, hi, seeker.agent_id):
+                key = (abs(candidate.elo - seeker.elo), candidate.seq)
+                if best_key is None or key < best_key:
+                    best, best_key = candidate, key
+        
+        return best
+    
+    def _nearest(self, stage: int, slot: int, lo: int, hi: int, exclude: str) -> List[Seeker]:
+        """The earliest seeker in the nearest non-empty Elo slots on each side of slot, within [lo, hi]."""
+        tree = self._elo_trees[stage]
+        buckets = self._buckets[stage]
+        found = []
+        
+        # Same slot: anyone but the seeker itself
+        for agent_id, other in buckets.get(slot, {}).items():
+            if agent_id != exclude:
+                return [other]
+        
+        above = tree.next_at_or_after(slot + 1) if slot < hi else -1
+        if above != -1 and above <= hi:
+            found.append(next(iter(buckets[above].values())))
+        
+        below = tree.prev_at_or_before(slot - 1) if slot > lo else -1
+        if below != -1 and below >= lo:
+            found.append(next(iter(buckets[below].values())))
+        
+        return found
+    
+    def _index(self, seeker: Seeker, stage: int):
+        seeker.stage = stage
+        slot = elo_slot(seeker.elo)
+        self._buckets[stage].setdefault(slot, {})[seeker.agent_id] = seeker
+        self._elo_trees[stage].add(slot, 1)
+    
+    def _unindex(self, seeker: Seeker, stage: int):
+        slot = elo_slot(seeker.elo)
+        bucket = self._buckets[stage][slot]
+        del bucket[seeker.agent_id]
+        if not bucket:
+            del self._buckets[stage][slot]
+        self._elo_trees[stage].add(slot, -1)
+    
+    def _renumber(self):
+        """Reassign arrival slots 0..n-1 once they run out (amortized O(1) per add)."""
+        for seq, seeker in enumerate(self.arrivals.values()):
+            seeker.seq = seq
+        self._by_seq = {seeker.seq: seeker for seeker in self.arrivals.values()}
+        size = max(1024, 2 * len(self.arrivals) + 2)
+        self._arrival_tree = FenwickTree.from_counts(
+            1 if i < len(self.arrivals) else 0 for i in range(size)
+        )
+        self._next_seq = len(self.arrivals)
+
+
+class MatchmakingQueue:
+    """
+    Manages matchmaking queues for all categories.
+    
+    Matching is event-driven: a seeker is matched as soon as it is added, and
+    otherwise again whenever its search widens. Widening runs off per-seeker
+    timers, so an idle queue costs nothing; with adaptive_widening the timers
+    are set from how likely a match is in the seeker's current range rather
+    than at the fixed STAGE_WAITS.
+    
+    With batch_interval set (and NumPy installed), seekers are instead paired
+    a whole category at a time every batch_interval seconds, trading a little
+    latency for better pairings (see batch_matching.pair_seekers).
+    """
+    
+    def __init__(self, clock: Callable[[], float] = time.time):
+        # Time source for queued_at and widening timers (a virtual clock in the simulator)
+        self.clock = clock
+        
         # Queues per category
-        self.queues: Dict[str, List[Seeker]] = {
-            "bullet": [],
-            "blitz": [],
-            "rapid": [],
+        self.queues: Dict[str, SeekerQueue] = {
+            "bullet": SeekerQueue(),
+            "blitz": SeekerQueue(),
+            "rapid": SeekerQueue(),
         }
         
         # Track seekers by agent_id for quick lookup
@@ -69,27 +336,53 @@ class MatchmakingQueue:
         # Callback for widening notifications
         self.on_widening: Optional[Callable[[Seeker, list[int]], Awaitable[None]]] = None
         
-        # Background task
-        self._running = False
-        self._task: Optional[asyncio.Task] = None
+        # Completed waits per category, kept up to date so stats never walk the queues
+        self.wait_stats: Dict[str, Dict[str, WaitHistogram]] = {
+            category: {"matched": WaitHistogram(), "cancelled": WaitHistogram()}
+            for category in self.queues
+        }
+        
+        # Widening timers: (category, agent_id) -> next stage threshold
+        self.timers = DeadlineScheduler(clock=clock)
+        
+        # Time stage waits to queue depth and recent arrivals (False = fixed STAGE_WAITS)
+        self.adaptive_widening = True
+        self.arrival_rates: Dict[str, ArrivalRate] = {category: ArrivalRate() for category in self.queues}
+        
+        # Seconds between batch matching passes (0 = match greedily on insert)
+        self.batch_interval = 0.0
+        self._batch_task: Optional[asyncio.Task] = None
+        
+        # Callbacks still running (the loop only keeps weak references to tasks)
+        self._callbacks: Set[asyncio.Task] = set()
+    
+    @property
+    def batching(self) -> bool:
+        return self.batch_interval > 0 and batch_matching.available
     
     async def start(self):
-        """Start the matchmaking loop."""
-        self._running = True
-        self._task = asyncio.create_task(self._matchmaking_loop())
+        """Start the widening timers (and batch matching, if enabled)."""
+        await self.timers.start()
+        if self.batch_interval > 0 and not batch_matching.available:
+            print("NumPy is not installed, falling back to greedy matchmaking")
+        if self.batching:
+            self._batch_task = asyncio.create_task(self._batch_loop())
     
     async def stop(self):
-        """Stop the matchmaking loop."""
-        self._running = False
-        if self._task:
-            self._task.cancel()
+        """Stop the widening timers and batch matching. Pending timers are kept."""
+        await self.timers.stop()
+        if self._batch_task:
+            self._batch_task.cancel()
             try:
-                await self._task
+                await self._batch_task
             except asyncio.CancelledError:
                 pass
+            self._batch_task = None
     
-    async def add_seeker(self, agent_id: str, agent_name: str, elo: int, category: str) -> Seeker:
-        """Add an agent to the matchmaking queue."""
+    async def add_seeker(
+        self, agent_id: str, agent_name: str, elo: int, category: str, queued_at: Optional[float] = None
+    ) -> Seeker:
+        """Add an agent to the matchmaking queue. queued_at keeps the wait time of a handed-over seek."""
         band = get_elo_band(elo)
         seeker = Seeker(
             agent_id=agent_id,
@@ -98,16 +391,24 @@ class MatchmakingQueue:
             category=category,
             band=band,
         )
+        now = self.clock()
+        seeker.queued_at = now if queued_at is None else queued_at
+        seeker.status = self._status_for_wait(seeker.get_wait_time(now))
+        self.arrival_rates[category].record(elo, now)
         
         # Add to queue
-        self.queues[category].append(seeker)
-        seeker.position = len(self.queues[category])
+        queue = self.queues[category]
+        queue.add(seeker)
+        seeker.position = len(queue)
         
         # Track by agent
         if agent_id not in self.seekers_by_agent:
             self.seekers_by_agent[agent_id] = {}
         self.seekers_by_agent[agent_id][category] = seeker
         
+        if not self._try_match(seeker):
+            self._schedule_widening(seeker)
+        
         return seeker
     
     async def remove_seeker(self, agent_id: str, category: str) -> bool:
@@ -115,11 +416,12 @@ class MatchmakingQueue:
         if agent_id in self.seekers_by_agent:
             if category in self.seekers_by_agent[agent_id]:
                 seeker = self.seekers_by_agent[agent_id][category]
-                seeker.status = SeekStatus.CANCELLED
                 
                 # Remove from queue
-                if seeker in self.queues[category]:
-                    self.queues[category].remove(seeker)
+                self.queues[category].remove(seeker)
+                self.timers.cancel((category, agent_id))
+                seeker.status = SeekStatus.CANCELLED
+                self.wait_stats[category]["cancelled"].record(seeker.get_wait_time(self.clock()))
                 
                 # Remove from tracking
                 del self.seekers_by_agent[agent_id][category]
@@ -149,122 +451,172 @@ class MatchmakingQueue:
     def get_queue_position(self, agent_id: str, category: str) -> int:
         """Get position in queue (1-indexed)."""
         seeker = self.get_seeker(agent_id, category)
-        if seeker and seeker in self.queues[category]:
-            return self.queues[category].index(seeker) + 1
+        if seeker:
+            return self.queues[category].position(seeker)
         return 0
     
-    async def _matchmaking_loop(self):
-        """Background loop that processes queues and finds matches."""
-        while self._running:
+    def _schedule_widening(self, seeker: Seeker):
+        """Set a timer for the seeker's next widening stage, if any."""
+        stage = STAGE_INDEX[seeker.status] + 1
+        if stage >= len(STAGES):
+            return
+        
+        if self.adaptive_widening:
+            deadline = self.clock() + self._widening_delay(seeker, stage)
+        else:
+            deadline = seeker.queued_at + STAGE_WAITS[stage]
+        self.timers.schedule(
+            (seeker.category, seeker.agent_id),
+            deadline,
+            lambda: self._widen(seeker, STAGES[stage]),
+        )
+    
+    def _widening_delay(self, seeker: Seeker, stage: int) -> float:
+        """How long the seeker should stay in its current stage before moving on to `stage`."""
+        base = STAGE_WAITS[stage] - STAGE_WAITS[stage - 1]
+        lo, hi = seeker.get_elo_range()
+        
+        # Partners expected in range: arrivals over the default wait, plus seekers
+        # already queued there (still too narrow to accept us, but widening too)
+        expected = (
+            self.arrival_rates[seeker.category].rate(lo, hi, self.clock()) * base
+            + self.queues[seeker.category].count_between(lo, hi) - 1
+        )
+        factor = min(max(expected / WIDEN_TARGET, WIDEN_MIN_FACTOR), WIDEN_MAX_FACTOR)
+        return base * factor
+    
+    def _widen(self, seeker: Seeker, status: SeekStatus):
+        """Widening timer: move the seeker to its next stage and look for a match again."""
+        queue = self.queues[seeker.category]
+        if seeker not in queue:
+            return
+        
+        queue.set_status(seeker, status)
+        
+        # Notify on status change
+        if self.on_widening:
+            elo_range = list(seeker.get_elo_range())
+            self._notify(self.on_widening(seeker, elo_range))
+        
+        if not self._try_match(seeker):
+            self._schedule_widening(seeker)
+    
+    def _try_match(self, seeker: Seeker) -> bool:
+        """Match a seeker with its best compatible partner, if there is one."""
+        if self.batching:
+            return False  # Left for the next batch pass
+        
+        partner = self.queues[seeker.category].find_partner(seeker)
+        if partner is None:
+            return False
+        self._make_match(seeker.category, seeker, partner)
+        return True
+    
+    async def _batch_loop(self):
+        """Background loop that pairs each category's queue in one batch."""
+        while True:
             try:
+                await asyncio.sleep(self.batch_interval)
                 for category in self.queues:
-                    await self._process_queue(category)
-                await asyncio.sleep(0.5)  # Check every 500ms
+                    self.match_batch(category)
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 print(f"Matchmaking error: {e}")
-                await asyncio.sleep(1)
     
-    async def _process_queue(self, category: str):
-        """Process a single category queue."""
+    def match_batch(self, category: str) -> int:
+        """Pair up a whole category queue at once. Returns the number of matches made."""
         queue = self.queues[category]
         if len(queue) < 2:
-            return
-        
-        now = time.time()
-        matches_to_make = []
-        
-        # Update status based on wait time and check for matches
-        for seeker in queue:
-            wait_time = seeker.get_wait_time()
-            old_status = seeker.status
-            
-            # Update widening status
-            if wait_time >= 60 and seeker.status != SeekStatus.WIDENING_2:
-                seeker.status = SeekStatus.WIDENING_2
-            elif wait_time >= 30 and seeker.status == SeekStatus.SEARCHING:
-                seeker.status = SeekStatus.WIDENING_1
-            
-            # Notify on status change
-            if seeker.status != old_status and self.on_widening:
-                elo_range = list(seeker.get_elo_range())
-                asyncio.create_task(self.on_widening(seeker, elo_range))
+            return 0
         
-        # Find matches (iterate through pairs)
-        matched_indices = set()
-        for i, seeker1 in enumerate(queue):
-            if i in matched_indices:
-                continue
-            
-            for j, seeker2 in enumerate(queue):
-                if j <= i or j in matched_indices:
-                    continue
-                
-                if self._can_match(seeker1, seeker2):
-                    matches_to_make.append((i, j, seeker1, seeker2))
-                    matched_indices.add(i)
-                    matched_indices.add(j)
-                    break
+        now = self.clock()
+        seekers = list(queue)
+        pairs = batch_matching.pair_seekers(
+            [s.elo for s in seekers],
+            [STAGE_WIDTHS[STAGE_INDEX[s.status]] for s in seekers],
+            [s.get_wait_time(now) for s in seekers],
+        )
+        for i, j in pairs:
+            self._make_match(category, seekers[i], seekers[j])
+        return len(pairs)
+    
+    def _make_match(self, category: str, seeker1: Seeker, seeker2: Seeker):
+        """Take two seekers out of the queue and report the match."""
+        queue = self.queues[category]
+        now = self.clock()
         
-        # Process matches
-        for i, j, seeker1, seeker2 in matches_to_make:
-            seeker1.status = SeekStatus.MATCHED
-            seeker2.status = SeekStatus.MATCHED
-            
-            # Remove from queue
-            self.queues[category] = [s for s in queue if s not in (seeker1, seeker2)]
+        for seeker in (seeker1, seeker2):
+            self.wait_stats[category]["matched"].record(seeker.get_wait_time(now))
+            queue.remove(seeker)
+            self.timers.cancel((category, seeker.agent_id))
+            seeker.status = SeekStatus.MATCHED
             
             # Remove from tracking
-            for seeker in (seeker1, seeker2):
-                if seeker.agent_id in self.seekers_by_agent:
-                    if category in self.seekers_by_agent[seeker.agent_id]:
-                        del self.seekers_by_agent[seeker.agent_id][category]
-                    if not self.seekers_by_agent[seeker.agent_id]:
-                        del self.seekers_by_agent[seeker.agent_id]
-            
-            # Notify
-            if self.on_match:
-                match = MatchResult(seeker1=seeker1, seeker2=seeker2, category=category)
-                asyncio.create_task(self.on_match(match))
-    
-    def _can_match(self, seeker1: Seeker, seeker2: Seeker) -> bool:
-        """Check if two seekers can be matched."""
-        # Same agent can't play themselves
-        if seeker1.agent_id == seeker2.agent_id:
-            return False
-        
-        # Check Elo compatibility based on both seekers' current ranges
-        range1 = seeker1.get_elo_range()
-        range2 = seeker2.get_elo_range()
-        
-        # Both must accept each other's Elo
-        if not (range1[0] <= seeker2.elo <= range1[1]):
-            return False
-        if not (range2[0] <= seeker1.elo <= range2[1]):
-            return False
+            if seeker.agent_id in self.seekers_by_agent:
+                if category in self.seekers_by_agent[seeker.agent_id]:
+                    del self.seekers_by_agent[seeker.agent_id][category]
+                if not self.seekers_by_agent[seeker.agent_id]:
+                    del self.seekers_by_agent[seeker.agent_id]
         
-        return True
+        # Notify
+        if self.on_match:
+            match = MatchResult(seeker1=seeker1, seeker2=seeker2, category=category)
+            self._notify(self.on_match(match))
+    
+    def _notify(self, callback: Awaitable[None]):
+        task = asyncio.create_task(callback)
+        self._callbacks.add(task)
+        task.add_done_callback(self._callbacks.discard)
+    
+    @staticmethod
+    def _status_for_wait(wait_time: float) -> SeekStatus:
+        """The widening stage a seeker should be in after waiting this long."""
+        for stage in range(len(STAGES) - 1, 0, -1):
+            if wait_time >= STAGE_WAITS[stage]:
+                return STAGES[stage]
+        return SeekStatus.SEARCHING
     
     def get_queue_stats(self) -> dict:
-        """Get statistics about all queues."""
+        """Get statistics about all queues, from counters kept up to date (independent of queue size)."""
         return {
             category: {
                 "count": len(queue),
-                "seekers": [
-                    {
-                        "agent_name": s.agent_name,
-                        "elo": s.elo,
-                        "band": s.band,
-                        "status": s.status.value,
-                        "wait_time": round(s.get_wait_time(), 1),
-                    }
-                    for s in queue
-                ]
+                "bands": {band: queue.band_counts[band] for band in ("bronze", "silver", "gold")},
+                "stages": {status.value: queue.stage_count(stage) for stage, status in enumerate(STAGES)},
+                "wait_to_match": self.wait_stats[category]["matched"].to_dict(),
+                "wait_to_cancel": self.wait_stats[category]["cancelled"].to_dict(),
             }
             for category, queue in self.queues.items()
         }
+    
+    async def list_seekers(self, category: str, offset: int = 0, limit: int = 50) -> List[dict]:
+        """A page of a queue's seekers, in arrival order."""
+        now = self.clock()
+        return [
+            {
+                "position": offset + i + 1,
+                "agent_name": s.agent_name,
+                "elo": s.elo,
+                "band": s.band,
+                "status": s.status.value,
+                "wait_time": round(s.get_wait_time(now), 1),
+            }
+            for i, s in enumerate(self.queues[category].page(offset, limit))
+        ]
+
+
+# Global matchmaking instance: the queues themselves, or a client of the
+# matchmaking service shared by several workers
+def _create_matchmaking():
+    from .config import get_settings
+    
+    settings = get_settings()
+    if not settings.matchmaking_service:
+        return MatchmakingQueue()
+    
+    from .matchmaking_service import MatchmakingClient
+    return MatchmakingClient(settings.matchmaking_service, settings.matchmaking_token)
 
 
-# Global matchmaking queue instance
-matchmaking = MatchmakingQueue()
+matchmaking = _create_matchmaking()
@@ -0,0 +1,791 @@
+"""
+Matchmaking as one local service process shared by several server workers.
+
+Run it with `python -m app.matchmaking_service` and set MATCHMAKING_SERVICE
+on every worker (and the service) to the same address: a unix socket path,
+or host:port for local TCP (a TCP address other than localhost also needs
+MATCHMAKING_TOKEN, a shared secret every worker sends in its hello; the
+service closes connections without it). Workers send seeks and cancels; the
+service owns the queues and sends each match to the workers holding the two
+agents' connections. Each game gets its ID here and is placed on a worker by
+hashing that ID (or, with GAME_PLACEMENT=seeker, on the first seeker's
+worker), and the service relays frames between workers so both agents can play it from
+wherever they are connected. Spectator frames are published once per game
+and fanned out here to every worker or spectator relay (see
+app.spectator_relay) watching the game.
+
+Messages are JSON lines. Worker -> service:
+    hello         {worker, games, token}  games false: a spectator relay, never given games to host
+    seek          {id, agent_id, agent_name, elo, category, queued_at}  -> reply {seeker} or {error}
+    cancel        {id, agent_id, category}                              -> reply {removed}
+    cancel_all    {agent_id}
+    list          {id, category, offset, limit}                         -> reply {seekers}
+    connected     {id, agent_id, legal_moves}                           -> reply {game_id, host}
+    disconnected  {agent_id}
+    locate        {id, game_id}                                         -> reply {host}
+    top           {id, category, count}  the live games with the highest average Elo -> reply {game_ids}
+    lobby         {event}               a change to the live games list (see app.live_games)
+    ratings       {agents}              agents' rows after a game, for every worker's leaderboards
+    watch         {game_id, count, joined}  the sender has count spectators of the game (0: none left)
+    publish       {game_id, message, state} a spectator frame, for every worker watching the game
+    assign        {agent_id, game_id}   the sender hosts the agent's game (game_id null: it is over)
+    deliver       {agent_id, message}   pass a frame to the worker holding the agent's connection
+    route         {worker, event}       pass an event to another worker
+Service -> worker:
+    reply {id, ...}, match {seeker1, seeker2, category, game_id, host, legal_moves},
+    widened {seeker, elo_range}, stats {stats}, assign {agent_id, game_id, host},
+    deliver {agent_id, message}, route {event},
+    lobby {snapshot} (after hello) or {event} (each versioned change, to every worker),
+    ratings {agents} (to every worker)
+"""
+
+import asyncio
+import heapq
+import ipaddress
+import json
+import os
+import secrets
+import sys
+import uuid
+import zlib
+from typing import Optional, Dict, Set, Callable, Awaitable, Tuple
+
+from .config import get_settings
+from .encoding import dumps_bytes
+from .live_games import LiveGames
+from .matchmaking import MatchmakingQueue, MatchResult, Seeker, SeekStatus
+
+
+# Seconds between queue stats pushes to the workers
+STATS_INTERVAL = 1.0
+
+# Longest JSON line either side accepts (game frames carry the whole PGN)
+LINE_LIMIT = 16 * 1024 * 1024
+
+# Bytes queued on either side of a connection whose other end has stopped reading before
+# it is dropped (the worker reconnects and replays its state, as after any lost connection)
+SEND_BUFFER_LIMIT = 4 * LINE_LIMIT
+
+# Seconds between reconnect attempts while the service is unreachable
+RECONNECT_DELAY = 1.0
+
+# Where new games run
+HASH = "hash"  # The worker picked by hashing the game ID, spreading games over every worker
+SEEKER = "seeker"  # The worker holding the first seeker, so at most one player is relayed
+
+
+class MatchmakingError(Exception):
+    """A request to the matchmaking service failed (or the service could not be reached)."""
+
+
+def seeker_to_dict(seeker: Seeker) -> dict:
+    return {
+        "agent_id": seeker.agent_id,
+        "agent_name": seeker.agent_name,
+        "elo": seeker.elo,
+        "category": seeker.category,
+        "band": seeker.band,
+        "status": seeker.status.value,
+        "stage": seeker.stage,
+        "queued_at": seeker.queued_at,
+        "position": seeker.position,
+    }
+
+
+def seeker_from_dict(data: dict) -> Seeker:
+    return Seeker(
+        agent_id=data["agent_id"],
+        agent_name=data["agent_name"],
+        elo=data["elo"],
+        category=data["category"],
+        band=data["band"],
+        status=SeekStatus(data["status"]),
+        stage=data["stage"],
+        queued_at=data["queued_at"],
+        position=data["position"],
+    )
+
+
+def is_local(address: str) -> bool:
+    """Whether only this machine can reach the address (a unix socket, or TCP on loopback)."""
+    host, _, path = parse_address(address)
+    if path:
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return host == "localhost"
+
+
+def parse_address(address: str) -> Tuple[Optional[str], Optional[int], Optional[str]]:
+    """Split an address into (host, port, None) for TCP or (None, None, path) for a unix socket."""
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit():
+        return host or "127.0.0.1", int(port), None
+    return None, None, address
+
+
+async def open_connection(address: str):
+    host, port, path = parse_address(address)
+    if path:
+        return await asyncio.open_unix_connection(path, limit=LINE_LIMIT)
+    return await asyncio.open_connection(host, port, limit=LINE_LIMIT)
+
+
+async def start_server(handler, address: str):
+    host, port, path = parse_address(address)
+    if path:
+        # A socket file left behind by a previous run would make bind fail
+        if os.path.exists(path):
+            os.unlink(path)
+        return await asyncio.start_unix_server(handler, path, limit=LINE_LIMIT)
+    return await asyncio.start_server(handler, host, port, limit=LINE_LIMIT)
+
+
+def encode_line(message: dict) -> bytes:
+    return dumps_bytes(message) + b"\n"
+
+
+def shard_for(game_id: str, workers) -> str:
+    """The worker a game ID hashes to. Stable for a given set of workers."""
+    workers = sorted(workers)
+    return workers[zlib.crc32(game_id.encode()) % len(workers)]
+
+
+class MatchmakingService:
+    """The service side: one MatchmakingQueue, and which worker holds which agent."""
+    
+    def __init__(self, queue: Optional[MatchmakingQueue] = None, placement: str = HASH, token: str = ""):
+        self.queue = queue or MatchmakingQueue()
+        self.placement = placement
+        self.token = token
+        self.queue.on_match = self._on_match
+        self.queue.on_widening = self._on_widening
+        
+        # Connected workers: worker id -> writer
+        self.workers: Dict[str, asyncio.StreamWriter] = {}
+        
+        # agent_id -> worker holding its connection (or that sent its seeks)
+        self.owners: Dict[str, str] = {}
+        
+        # agent_id -> (game_id, worker hosting the game)
+        self.hosts: Dict[str, Tuple[str, str]] = {}
+        
+        # game_id -> worker hosting the game
+        self.games: Dict[str, str] = {}
+        
+        # Workers that take games (spectator relays don't)
+        self.hosting: Set[str] = set()
+        
+        # game_id -> workers with spectators of the game
+        self.subscribers: Dict[str, Set[str]] = {}
+        
+        # game_id -> (category, players' average Elo), for games matched here
+        self.ratings: Dict[str, Tuple[str, float]] = {}
+        
+        # Agents that asked for legal moves in state frames
+        self.legal_moves: Set[str] = set()
+        
+        # The live games list every worker keeps a copy of
+        self.live = LiveGames()
+        
+        self._stats_task: Optional[asyncio.Task] = None
+    
+    async def start(self):
+        await self.queue.start()
+        self._stats_task = asyncio.create_task(self._stats_loop())
+    
+    async def stop(self):
+        if self._stats_task:
+            self._stats_task.cancel()
+            self._stats_task = None
+        await self.queue.stop()
+    
+    def send(self, worker: Optional[str], message: dict):
+        writer = self.workers.get(worker)
+        if writer:
+            self._write(writer, encode_line(message))
+    
+    def _write(self, writer: asyncio.StreamWriter, line: bytes):
+        """Queue a line for a worker, dropping the worker if too much is already waiting."""
+        if writer.is_closing():
+            return
+        writer.write(line)
+        backlog = writer.transport.get_write_buffer_size()
+        if backlog > SEND_BUFFER_LIMIT:
+            print(f"Matchmaking service: dropping a worker with {backlog} bytes unread")
+            writer.transport.abort()
+    
+    async def handle_worker(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve one worker connection until it closes."""
+        worker = None
+        try:
+            async for line in reader:
+                message = json.loads(line)
+                if message.get("op") == "hello":
+                    if self.token and not secrets.compare_digest(str(message.get("token", "")), self.token):
+                        print("Matchmaking service: rejected a connection with a wrong or missing token")
+                        break
+                    worker = message["worker"]
+                    self.workers[worker] = writer
+                    if message.get("games", True):
+                        self.hosting.add(worker)
+                    self.send(worker, {"op": "stats", "stats": self.queue.get_queue_stats()})
+                    self.send(worker, {"op": "lobby", "snapshot": self.live.snapshot()})
+                elif worker:
+                    reply = await self.handle(worker, message)
+                    if "id" in message:
+                        self.send(worker, {"op": "reply", "id": message["id"], **(reply or {})})
+                
+                # A worker only gets to send more once what it was sent is on its way
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            print(f"Matchmaking service: worker {worker} connection error: {e}")
+        finally:
+            if worker and self.workers.get(worker) is writer:
+                await self._drop_worker(worker)
+            writer.close()
+    
+    async def handle(self, worker: str, message: dict) -> Optional[dict]:
+        """Handle one request from a worker. Returns the reply fields, if the op has a reply."""
+        op = message.get("op")
+        agent_id = message.get("agent_id")
+        
+        if op == "seek":
+            category = message["category"]
+            if category not in self.queue.queues:
+                return {"error": "Invalid category"}
+            if self.queue.get_seeker(agent_id, category):
+                return {"error": f"Already seeking {category}"}
+            self.owners[agent_id] = worker
+            seeker = await self.queue.add_seeker(
+                agent_id, message["agent_name"], message["elo"], category, message.get("queued_at")
+            )
+            return {"seeker": seeker_to_dict(seeker), "elo_range": list(seeker.get_elo_range())}
+        
+        elif op == "cancel":
+            return {"removed": await self.queue.remove_seeker(agent_id, message["category"])}
+        
+        elif op == "cancel_all":
+            await self.queue.remove_all_seeks(agent_id)
+        
+        elif op == "list":
+            category = message["category"]
+            if category not in self.queue.queues:
+                return {"seekers": []}
+            return {"seekers": await self.queue.list_seekers(category, message["offset"], message["limit"])}
+        
+        elif op == "connected":
+            self.owners[agent_id] = worker
+            if message.get("legal_moves"):
+                self.legal_moves.add(agent_id)
+            else:
+                self.legal_moves.discard(agent_id)
+            game_id, host = self.hosts.get(agent_id, (None, None))
+            return {"game_id": game_id, "host": host}
+        
+        elif op == "locate":
+            return {"host": self.games.get(message["game_id"])}
+        
+        elif op == "top":
+            category = message["category"]
+            ranked = heapq.nlargest(message["count"], (
+                (elo, game_id) for game_id, (c, elo) in self.ratings.items()
+                if c == category and game_id in self.games
+            ))
+            return {"game_ids": [game_id for _, game_id in ranked]}
+        
+        elif op == "watch":
+            game_id = message["game_id"]
+            host = self.games.get(game_id)
+            if host:
+                subscribers = self.subscribers.setdefault(game_id, set())
+                if message["count"]:
+                    subscribers.add(worker)
+                else:
+                    subscribers.discard(worker)
+                    if not subscribers:
+                        del self.subscribers[game_id]
+                self.send(host, {"op": "route", "event": {
+                    "type": "watchers",
+                    "game_id": game_id,
+                    "worker": worker,
+                    "count": message["count"],
+                    "joined": message["joined"],
+                }})
+        
+        elif op == "publish":
+            # Encoded once for all the game's subscribers
+            line = encode_line({"op": "route", "event": {
+                "type": "spectate",
+                "game_id": message["game_id"],
+                "message": message["message"],
+                "state": message["state"],
+            }})
+            for subscriber in list(self.subscribers.get(message["game_id"], ())):
+                writer = self.workers.get(subscriber)
+                if writer:
+                    self._write(writer, line)
+        
+        elif op == "disconnected":
+            if self.owners.get(agent_id) == worker:
+                del self.owners[agent_id]
+        
+        elif op == "assign":
+            game_id = message.get("game_id")
+            previous = self.hosts.pop(agent_id, None)
+            if game_id:
+                self.hosts[agent_id] = (game_id, worker)
+                self.games[game_id] = worker
+                if message.get("rating"):
+                    self.ratings[game_id] = tuple(message["rating"])
+            elif previous:
+                self.games.pop(previous[0], None)
+                self.subscribers.pop(previous[0], None)
+                self.ratings.pop(previous[0], None)
+            owner = self.owners.get(agent_id)
+            if owner and owner != worker:
+                self.send(owner, {"op": "assign", "agent_id": agent_id, "game_id": game_id, "host": worker})
+        
+        elif op == "lobby":
+            self._lobby(message["event"])
+        
+        elif op == "ratings":
+            self._broadcast({"op": "ratings", "agents": message["agents"]})
+        
+        elif op == "deliver":
+            self.send(self.owners.get(agent_id), message)
+        
+        elif op == "route":
+            self.send(message["worker"], {"op": "route", "event": message["event"]})
+        
+        return None
+    
+    async def _drop_worker(self, worker: str):
+        """A worker went away: its agents' seeks are cancelled and the games it hosted are gone."""
+        del self.workers[worker]
+        self.hosting.discard(worker)
+        for agent_id in [a for a, w in self.owners.items() if w == worker]:
+            del self.owners[agent_id]
+            await self.queue.remove_all_seeks(agent_id)
+        for agent_id in [a for a, (_, w) in self.hosts.items() if w == worker]:
+            del self.hosts[agent_id]
+        for game_id in [g for g, w in self.games.items() if w == worker]:
+            del self.games[game_id]
+            self.subscribers.pop(game_id, None)
+            self.ratings.pop(game_id, None)
+            self._lobby({"event": "game_ended", "game_id": game_id})
+        for game_id, subscribers in self.subscribers.items():
+            if worker in subscribers:
+                subscribers.discard(worker)
+                self.send(self.games.get(game_id), {"op": "route", "event": {
+                    "type": "watchers", "game_id": game_id, "worker": worker, "count": 0, "joined": False,
+                }})
+        print(f"Matchmaking service: worker {worker} disconnected")
+    
+    def _lobby(self, event: dict):
+        """Version a change to the live games list and send it to every worker, encoded once."""
+        event = self.live.record(event)
+        if event:
+            self._broadcast({"op": "lobby", "event": event})
+    
+    def _broadcast(self, message: dict):
+        """Send a message to every worker, encoded once."""
+        line = encode_line(message)
+        for writer in list(self.workers.values()):
+            self._write(writer, line)
+    
+    async def _on_match(self, match: MatchResult):
+        owner1 = self.owners.get(match.seeker1.agent_id)
+        owner2 = self.owners.get(match.seeker2.agent_id)
+        game_id = secrets.token_urlsafe(12)
+        if self.placement == HASH and self.hosting:
+            host = shard_for(game_id, self.hosting)
+        else:
+            host = owner1 or owner2
+        message = {
+            "op": "match",
+            "seeker1": seeker_to_dict(match.seeker1),
+            "seeker2": seeker_to_dict(match.seeker2),
+            "category": match.category,
+            "game_id": game_id,
+            "host": host,
+            "legal_moves": [
+                s.agent_id for s in (match.seeker1, match.seeker2) if s.agent_id in self.legal_moves
+            ],
+        }
+        for worker in {owner1, owner2, host}:
+            self.send(worker, message)
+    
+    async def _on_widening(self, seeker: Seeker, elo_range: list):
+        self.send(self.owners.get(seeker.agent_id), {
+            "op": "widened",
+            "seeker": seeker_to_dict(seeker),
+            "elo_range": elo_range,
+        })
+    
+    async def _stats_loop(self):
+        while True:
+            await asyncio.sleep(STATS_INTERVAL)
+            message = {"op": "stats", "stats": self.queue.get_queue_stats()}
+            for worker in list(self.workers):
+                self.send(worker, message)
+
+
+class MatchmakingClient:
+    """
+    Worker-side stand-in for MatchmakingQueue, backed by the matchmaking service.
+    
+    Keeps a mirror of this worker's own seekers so get_seeker and friends stay
+    synchronous, and the latest queue stats pushed by the service. Also relays
+    frames and events for games whose players are on different workers.
+    """
+    
+    def __init__(self, address: str, token: str = ""):
+        self.address = address
+        self.token = token
+        self.worker_id = uuid.uuid4().hex[:12]
+        
+        # Off for spectator relays, which only serve /watch
+        self.host_games = True
+        
+        # Same callbacks as MatchmakingQueue; on_match only fires on the worker hosting the game
+        self.on_match: Optional[Callable[[MatchResult], Awaitable[None]]] = None
+        self.on_widening: Optional[Callable[[Seeker, list[int]], Awaitable[None]]] = None
+        
+        # Seeks the service dropped (it restarted, or lost this worker)
+        self.on_dropped: Optional[Callable[[Seeker], Awaitable[None]]] = None
+        
+        # Events routed here from other workers, frames for agents connected here,
+        # and games of agents connected here that run on another worker
+        self.on_route: Optional[Callable[[dict], Awaitable[None]]] = None
+        self.on_deliver: Optional[Callable[[str, object], Awaitable[None]]] = None
+        self.on_assign: Optional[Callable[[str, Optional[str], Optional[str]], None]] = None
+        
+        # The live games list: a snapshot on connecting, then every change
+        self.on_lobby: Optional[Callable[[dict], None]] = None
+        
+        # Agents' rows after each game, and every (re)connect (broadcasts may have been missed)
+        self.on_ratings: Optional[Callable[[list], None]] = None
+        self.on_connected: Optional[Callable[[], None]] = None
+        
+        # Settings that only matter where the queues are; kept so setup code can set them either way
+        self.batch_interval = 0.0
+        self.adaptive_widening = True
+        
+        # Seekers live in the service, so there are none here to hand over on a restart
+        self.queues: Dict[str, object] = {}
+        
+        self.seekers_by_agent: Dict[str, Dict[str, Seeker]] = {}
+        
+        # Remote players in games hosted here that asked for legal moves
+        self.legal_moves: Set[str] = set()
+        
+        # Replayed to the service after a reconnect: agents connected here, games hosted
+        # here, and their live games list entries
+        self._connected: Dict[str, bool] = {}
+        self._assigned: Dict[str, Tuple[str, Optional[Tuple[str, float]]]] = {}
+        self._listed: Dict[str, dict] = {}
+        
+        self._stats: dict = {}
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        
+        # Callbacks still running (the loop only keeps weak references to tasks)
+        self._callbacks: Set[asyncio.Task] = set()
+    
+    async def start(self):
+        """Connect to the service, and keep reconnecting in the background if it goes away."""
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    # === MatchmakingQueue interface ===
+    
+    async def add_seeker(
+        self, agent_id: str, agent_name: str, elo: int, category: str, queued_at: Optional[float] = None
+    ) -> Seeker:
+        reply = await self._request(
+            "seek", agent_id=agent_id, agent_name=agent_name, elo=elo, category=category, queued_at=queued_at
+        )
+        if "error" in reply:
+            raise MatchmakingError(reply["error"])
+        
+        seeker = seeker_from_dict(reply["seeker"])
+        if seeker.status != SeekStatus.MATCHED:
+            self.seekers_by_agent.setdefault(agent_id, {})[category] = seeker
+        return seeker
+    
+    async def remove_seeker(self, agent_id: str, category: str) -> bool:
+        self._forget(agent_id, category)
+        try:
+            reply = await self._request("cancel", agent_id=agent_id, category=category)
+        except MatchmakingError:
+            return False
+        return reply["removed"]
+    
+    async def remove_all_seeks(self, agent_id: str):
+        self.seekers_by_agent.pop(agent_id, None)
+        self._send({"op": "cancel_all", "agent_id": agent_id})
+    
+    def get_seeker(self, agent_id: str, category: str) -> Optional[Seeker]:
+        return self.seekers_by_agent.get(agent_id, {}).get(category)
+    
+    def is_seeking(self, agent_id: str) -> bool:
+        return bool(self.seekers_by_agent.get(agent_id))
+    
+    def get_queue_position(self, agent_id: str, category: str) -> int:
+        seeker = self.get_seeker(agent_id, category)
+        return seeker.position if seeker else 0
+    
+    def get_queue_stats(self) -> dict:
+        """The latest stats pushed by the service (at most STATS_INTERVAL old)."""
+        return self._stats
+    
+    async def list_seekers(self, category: str, offset: int = 0, limit: int = 50) -> list:
+        reply = await self._request("list", category=category, offset=offset, limit=limit)
+        return reply["seekers"]
+    
+    # === Relaying between workers ===
+    
+    async def agent_connected(self, agent_id: str, legal_moves: bool) -> Tuple[Optional[str], Optional[str]]:
+        """Claim an agent's connection. Returns (game_id, host worker) of its game, if it has one."""
+        self._connected[agent_id] = legal_moves
+        try:
+            reply = await self._request("connected", agent_id=agent_id, legal_moves=legal_moves)
+        except MatchmakingError:
+            return None, None
+        return reply["game_id"], reply["host"]
+    
+    def agent_disconnected(self, agent_id: str):
+        self._connected.pop(agent_id, None)
+        self._send({"op": "disconnected", "agent_id": agent_id})
+    
+    def assign(self, agent_id: str, game_id: Optional[str], rating: Optional[Tuple[str, float]] = None):
+        """Record that this worker hosts the agent's game, of (category, average Elo) rating (or that it is over)."""
+        if game_id:
+            self._assigned[agent_id] = (game_id, rating)
+        else:
+            self._assigned.pop(agent_id, None)
+            self.legal_moves.discard(agent_id)
+        self._send({"op": "assign", "agent_id": agent_id, "game_id": game_id, "rating": rating})
+    
+    def deliver(self, agent_id: str, message):
+        """Send a frame (dict or pre-encoded JSON text) to an agent connected to another worker."""
+        self._send({"op": "deliver", "agent_id": agent_id, "message": message})
+    
+    def route(self, worker: str, event: dict):
+        self._send({"op": "route", "worker": worker, "event": event})
+    
+    async def locate(self, game_id: str) -> Optional[str]:
+        """The worker hosting a game, or None if no worker does."""
+        try:
+            reply = await self._request("locate", game_id=game_id)
+        except MatchmakingError:
+            return None
+        return reply["host"]
+    
+    async def top_games(self, category: str, count: int) -> list:
+        """IDs of the live games in a category with the highest average Elo, best first."""
+        try:
+            reply = await self._request("top", category=category, count=count)
+        except MatchmakingError:
+            return []
+        return reply["game_ids"]
+    
+    def watch(self, game_id: str, count: int, joined: bool):
+        """Report the spectators here of a game hosted elsewhere (joined: one is waiting for a first frame)."""
+        self._send({"op": "watch", "game_id": game_id, "count": count, "joined": joined})
+    
+    def lobby(self, event: dict):
+        """Send a change to the live games list, for the service to version and pass to every worker."""
+        if event["event"] == "game_started":
+            self._listed[event["game"]["id"]] = event
+        elif event["event"] == "game_ended":
+            self._listed.pop(event["game_id"], None)
+        self._send({"op": "lobby", "event": event})
+    
+    def ratings(self, rows: list):
+        """Send agents' rows after a game, for the service to pass to every worker."""
+        self._send({"op": "ratings", "agents": rows})
+    
+    def publish(self, game_id: str, message, state: bool = False):
+        """Send a spectator frame of a game hosted here, once, for every worker watching it."""
+        self._send({"op": "publish", "game_id": game_id, "message": message, "state": state})
+    
+    # === Connection ===
+    
+    @property
+    def connected(self) -> bool:
+        """Whether the connection to the service is up."""
+        return self._writer is not None and not self._writer.is_closing()
+    
+    def _send(self, message: dict):
+        if self._writer and not self._writer.is_closing():
+            self._writer.write(encode_line(message))
+            backlog = self._writer.transport.get_write_buffer_size()
+            if backlog > SEND_BUFFER_LIMIT:
+                # Reconnecting replays this worker's state, as after any lost connection
+                print(f"Matchmaking service stopped reading with {backlog} bytes unsent, reconnecting")
+                self._writer.transport.abort()
+    
+    async def _request(self, op: str, **fields) -> dict:
+        if not self._writer or self._writer.is_closing():
+            raise MatchmakingError("Matchmaking service is unavailable")
+        
+        self._next_id += 1
+        request_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        self._send({"op": op, "id": request_id, **fields})
+        try:
+            return await future
+        finally:
+            self._pending.pop(request_id, None)
+    
+    async def _run(self):
+        while True:
+            try:
+                reader, self._writer = await open_connection(self.address)
+            except OSError as e:
+                print(f"Matchmaking service unreachable at {self.address}: {e}")
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+            
+            print(f"Connected to matchmaking service at {self.address}")
+            self._send({"op": "hello", "worker": self.worker_id, "games": self.host_games, "token": self.token})
+            for agent_id, legal_moves in self._connected.items():
+                self._send({"op": "connected", "agent_id": agent_id, "legal_moves": legal_moves})
+            for agent_id, (game_id, rating) in self._assigned.items():
+                self._send({"op": "assign", "agent_id": agent_id, "game_id": game_id, "rating": rating})
+            for event in self._listed.values():
+                self._send({"op": "lobby", "event": event})
+            if self.on_connected:
+                self.on_connected()
+            
+            try:
+                async for line in reader:
+                    await self._dispatch(json.loads(line))
+            except (ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+                print(f"Matchmaking service connection error: {e}")
+            finally:
+                self._writer.close()
+                self._writer = None
+                await self._lost()
+            
+            await asyncio.sleep(RECONNECT_DELAY)
+    
+    async def _lost(self):
+        """The service dropped this worker's seeks along with the connection."""
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(MatchmakingError("Matchmaking service connection lost"))
+        
+        dropped = [s for seekers in self.seekers_by_agent.values() for s in seekers.values()]
+        self.seekers_by_agent.clear()
+        if self.on_dropped:
+            for seeker in dropped:
+                await self.on_dropped(seeker)
+    
+    def _notify(self, callback: Awaitable[None]):
+        task = asyncio.create_task(callback)
+        self._callbacks.add(task)
+        task.add_done_callback(self._callbacks.discard)
+    
+    async def _dispatch(self, message: dict):
+        op = message["op"]
+        
+        if op == "reply":
+            future = self._pending.get(message["id"])
+            if future and not future.done():
+                future.set_result(message)
+        
+        elif op == "stats":
+            self._stats = message["stats"]
+        
+        elif op == "match":
+            match = MatchResult(
+                seeker1=seeker_from_dict(message["seeker1"]),
+                seeker2=seeker_from_dict(message["seeker2"]),
+                category=message["category"],
+                game_id=message.get("game_id"),
+            )
+            for seeker in (match.seeker1, match.seeker2):
+                self._forget(seeker.agent_id, match.category)
+            if message["host"] == self.worker_id:
+                self.legal_moves.update(message["legal_moves"])
+                if self.on_match:
+                    self._notify(self.on_match(match))
+        
+        elif op == "widened":
+            seeker = self.get_seeker(message["seeker"]["agent_id"], message["seeker"]["category"])
+            if seeker:
+                seeker.status = SeekStatus(message["seeker"]["status"])
+                seeker.stage = message["seeker"]["stage"]
+                if self.on_widening:
+                    self._notify(self.on_widening(seeker, message["elo_range"]))
+        
+        elif op == "assign":
+            if self.on_assign:
+                self.on_assign(message["agent_id"], message["game_id"], message["host"])
+        
+        elif op == "deliver":
+            if self.on_deliver:
+                await self.on_deliver(message["agent_id"], message["message"])
+        
+        elif op == "route":
+            if self.on_route:
+                self._notify(self.on_route(message["event"]))
+        
+        elif op == "lobby":
+            if self.on_lobby:
+                self.on_lobby(message)
+        
+        elif op == "ratings":
+            if self.on_ratings:
+                self.on_ratings(message["agents"])
+    
+    def _forget(self, agent_id: str, category: str):
+        seekers = self.seekers_by_agent.get(agent_id)
+        if seekers:
+            seekers.pop(category, None)
+            if not seekers:
+                del self.seekers_by_agent[agent_id]
+
+
+async def serve(address: str):
+    """Run the matchmaking service until interrupted."""
+    settings = get_settings()
+    service = MatchmakingService(placement=settings.game_placement, token=settings.matchmaking_token)
+    service.queue.batch_interval = settings.matchmaking_batch_interval
+    service.queue.adaptive_widening = settings.matchmaking_adaptive_widening
+    
+    await service.start()
+    server = await start_server(service.handle_worker, address)
+    print(f"Matchmaking service listening on {address}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+if __name__ == "__main__":
+    address = sys.argv[1] if len(sys.argv) > 1 else get_settings().matchmaking_service
+    if not address:
+        sys.exit("Set MATCHMAKING_SERVICE (a unix socket path or host:port) or pass the address")
+    if not is_local(address) and not get_settings().matchmaking_token:
+        sys.exit(f"{address} is reachable from other machines: set MATCHMAKING_TOKEN on the service and workers")
+    try:
+        asyncio.run(serve(address))
+    except KeyboardInterrupt:
+        pass
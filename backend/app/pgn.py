@@ -0,0 +1,55 @@
+"""Incremental PGN movetext recording."""
+
+import chess
+from typing import Dict
+
+
+# Seven Tag Roster, always exported first and in this order
+ROSTER_TAGS = ("Event", "Site", "Date", "Round", "White", "Black", "Result")
+ROSTER_DEFAULTS = {"Round": "?", "Result": "*"}
+
+
+def format_clock(seconds: float) -> str:
+    """Format remaining time as a PGN %clk value (H:MM:SS)."""
+    seconds = max(0, int(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+class PgnRecorder:
+    """
+    Builds PGN movetext as moves are played.
+    
+    Produces the same single-line movetext as ``str(chess.pgn.Game)`` so the
+    finished PGN is ready at game end without replaying the game.
+    """
+    
+    __slots__ = ("movetext", "force_movenumber")
+    
+    def __init__(self):
+        self.movetext = bytearray()
+        self.force_movenumber = True
+    
+    def add_move(self, board: chess.Board, move: chess.Move):
+        """Record a move. Must be called before the move is pushed."""
+        if board.turn == chess.WHITE:
+            self.movetext += f"{board.fullmove_number}. ".encode()
+        elif self.force_movenumber:
+            self.movetext += f"{board.fullmove_number}... ".encode()
+        
+        self.movetext += board.san(move).encode() + b" "
+        self.force_movenumber = False
+    
+    def add_clock(self, seconds: float):
+        """Attach a %clk comment to the last recorded move."""
+        self.movetext += f"{{ [%clk {format_clock(seconds)}] }} ".encode()
+        self.force_movenumber = True
+    
+    def export(self, headers: Dict[str, str]) -> str:
+        """Render the full PGN with the given headers."""
+        tags = {tag: headers.get(tag, ROSTER_DEFAULTS.get(tag, "?")) for tag in ROSTER_TAGS}
+        tags.update((tag, value) for tag, value in headers.items() if tag not in tags)
+        
+        lines = [f"[{tag} \"{value}\"]" for tag, value in tags.items()]
+        return "\n".join(lines) + "\n\n" + self.movetext.decode() + tags["Result"]
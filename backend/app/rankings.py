@@ -0,0 +1,97 @@
+"""
+The leaderboards, kept in memory: agents that played a game, ranked by Elo in each category.
+
+Loaded from the database once, then kept current from the agents' rows
+end_game writes (whole rows, not deltas). Rows carry games_played, which
+only grows, so however rows and loads interleave an older row never
+replaces a newer one.
+"""
+
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+CATEGORIES = ("bullet", "blitz", "rapid")
+
+# The agents columns a row holds
+FIELDS = ("id", "name", "avatar_url", "elo_bullet", "elo_blitz", "elo_rapid", "games_played", "wins", "losses", "draws")
+
+Key = Tuple[int, str]
+
+
+def rank_key(row: dict, category: str) -> Key:
+    """Sort key: highest Elo first, ties by agent ID."""
+    return (-row[f"elo_{category}"], row["id"])
+
+
+class Rankings:
+    """Agents' rows by ID, and per category their keys in rank order."""
+    
+    def __init__(self):
+        self.agents: Dict[str, dict] = {}
+        self.ranked: Dict[str, List[Key]] = {category: [] for category in CATEGORIES}
+        self.loaded = False
+    
+    def load(self, rows: Iterable[dict]):
+        """Take rows read from the database, keeping any newer ones already here."""
+        for row in rows:
+            current = self.agents.get(row["id"])
+            if row["games_played"] > 0 and (current is None or current["games_played"] < row["games_played"]):
+                self.agents[row["id"]] = row
+        for category in CATEGORIES:
+            self.ranked[category] = sorted(rank_key(row, category) for row in self.agents.values())
+        self.loaded = True
+    
+    def update(self, rows: Iterable[dict]) -> Dict[str, List[Tuple[int, int]]]:
+        """
+        Apply agents' new rows.
+        
+        Returns, per category, (first, last) spans of ranks whose agents
+        changed or moved as a result.
+        """
+        shifted: Dict[str, List[Tuple[int, int]]] = {category: [] for category in CATEGORIES}
+        for row in rows:
+            current = self.agents.get(row["id"])
+            if row["games_played"] <= 0 or current == row:
+                continue
+            if current and current["games_played"] > row["games_played"]:
+                continue
+            self.agents[row["id"]] = row
+            
+            for category in CATEGORIES:
+                ranked = self.ranked[category]
+                if current:
+                    old = bisect_left(ranked, rank_key(current, category))
+                    del ranked[old]
+                key = rank_key(row, category)
+                new = bisect_left(ranked, key)
+                ranked.insert(new, key)
+                
+                # A newcomer pushes everyone below it down a rank
+                first, last = (min(old, new), max(old, new)) if current else (new, len(ranked) - 1)
+                shifted[category].append((first + 1, last + 1))
+        return shifted
+    
+    def rank(self, category: str, agent_id: str) -> Optional[int]:
+        row = self.agents.get(agent_id)
+        if row is None:
+            return None
+        return bisect_left(self.ranked[category], rank_key(row, category)) + 1
+    
+    def entries(self, category: str, offset: int, limit: int) -> List[dict]:
+        """Leaderboard entries from rank offset + 1 on, as GET /leaderboard/{category} lists them."""
+        elo = f"elo_{category}"
+        entries = []
+        for i, (_, agent_id) in enumerate(self.ranked[category][offset:offset + limit]):
+            row = self.agents[agent_id]
+            entries.append({
+                "rank": offset + i + 1,
+                "id": agent_id,
+                "name": row["name"],
+                "avatar_url": row["avatar_url"],
+                "elo": row[elo],
+                "games_played": row["games_played"],
+                "wins": row["wins"],
+                "losses": row["losses"],
+                "draws": row["draws"],
+            })
+        return entries
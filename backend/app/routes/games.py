@@ -1,48 +1,29 @@
 """Game endpoints."""
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Header, HTTPException, Query, Response
 from typing import Optional, Literal
 
 from ..database import get_db
+from ..websocket.lobby import handle_lobby_events, live_games
 
 router = APIRouter()
 
 
 # IMPORTANT: /games/live must come BEFORE /games/{game_id} to avoid route conflicts
 @router.get("/games/live")
-async def get_live_games():
-    """Get all currently active games."""
-    async with get_db() as db:
-        cursor = await db.execute(
-            """
-            SELECT g.id, g.category, g.status, g.started_at,
-                   g.white_agent_id, g.black_agent_id,
-                   w.name as white_name, w.avatar_url as white_avatar,
-                   w.elo_bullet as white_elo_bullet, w.elo_blitz as white_elo_blitz, w.elo_rapid as white_elo_rapid,
-                   b.name as black_name, b.avatar_url as black_avatar,
-                   b.elo_bullet as black_elo_bullet, b.elo_blitz as black_elo_blitz, b.elo_rapid as black_elo_rapid
-            FROM games g
-            JOIN agents w ON g.white_agent_id = w.id
-            JOIN agents b ON g.black_agent_id = b.id
-            WHERE g.status = 'active'
-            ORDER BY g.started_at DESC
-            """
-        )
-        games = await cursor.fetchall()
-        
-        result = []
-        for g in games:
-            game_dict = dict(g)
-            # Add correct Elo based on category
-            category = game_dict["category"]
-            game_dict["white_elo"] = game_dict.get(f"white_elo_{category}", 1200)
-            game_dict["black_elo"] = game_dict.get(f"black_elo_{category}", 1200)
-            result.append(game_dict)
-        
-        return {
-            "success": True,
-            "games": result,
-        }
+async def get_live_games(if_none_match: Optional[str] = Header(None)):
+    """Get all currently active games (from memory; 304 if the ETag still matches)."""
+    etag = live_games.etag
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+    return Response(live_games.body(), media_type="application/json", headers=headers)
+
+
+@router.get("/games/live/events")
+async def get_live_game_events(last_event_id: Optional[str] = Header(None)):
+    """Changes to the live games as Server-Sent Events, after the whole list."""
+    return await handle_lobby_events(last_event_id)
 
 
 @router.get("/games")
@@ -0,0 +1,160 @@
+"""Deadline scheduler for clock flags, disconnect forfeits and other timers."""
+
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+
+class DeadlineScheduler:
+    """
+    Fires callbacks at monotonic deadlines.
+    
+    Deadlines live in a heap and a single task sleeps until the earliest one,
+    so idle cost does not grow with the number of scheduled timers.
+    Rescheduling or cancelling a key leaves a stale heap entry behind that
+    is skipped when it comes up (and compacted away if they pile up).
+    
+    Callbacks may be plain functions or coroutine functions; coroutines are
+    run as tasks so a slow callback never delays the next deadline.
+    """
+    
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        
+        # Heap of (deadline, seq, key); only the entry whose seq matches _entries[key] is live
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._entries: Dict[Hashable, Tuple[float, int, Callable[[], Any]]] = {}
+        self._seq = itertools.count()
+        
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        
+        # Coroutine callbacks still running (the loop only keeps weak references to tasks)
+        self._running: Set[asyncio.Task] = set()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+    
+    async def start(self):
+        """Start the scheduler task."""
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop the scheduler task. Pending deadlines are kept."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    def schedule(self, key: Hashable, deadline: float, callback: Callable[[], Any]):
+        """Schedule (or reschedule) key to fire at an absolute clock() deadline."""
+        seq = next(self._seq)
+        self._entries[key] = (deadline, seq, callback)
+        
+        is_earliest = not self._heap or deadline < self._heap[0][0]
+        heapq.heappush(self._heap, (deadline, seq, key))
+        
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._compact()
+        
+        if is_earliest and self._wakeup is not None:
+            self._wakeup.set()
+    
+    def schedule_in(self, key: Hashable, delay: float, callback: Callable[[], Any]):
+        """Schedule (or reschedule) key to fire after delay seconds."""
+        self.schedule(key, self.clock() + delay, callback)
+    
+    def cancel(self, key: Hashable) -> bool:
+        """Cancel a pending deadline. Returns True if one was pending."""
+        return self._entries.pop(key, None) is not None
+    
+    def get_deadline(self, key: Hashable) -> Optional[float]:
+        """Get the pending deadline for a key, if any."""
+        entry = self._entries.get(key)
+        return entry[0] if entry else None
+    
+    def next_deadline(self) -> Optional[float]:
+        """Get the earliest live deadline, if any."""
+        while self._heap:
+            deadline, seq, key = self._heap[0]
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == seq:
+                return deadline
+            heapq.heappop(self._heap)
+        return None
+    
+    def run_due(self, now: Optional[float] = None) -> int:
+        """Fire every deadline at or before now. Returns the number fired."""
+        if now is None:
+            now = self.clock()
+        
+        fired = 0
+        while self._heap and self._heap[0][0] <= now:
+            deadline, seq, key = heapq.heappop(self._heap)
+            entry = self._entries.get(key)
+            if entry is None or entry[1] != seq:
+                continue  # Stale: rescheduled or cancelled
+            
+            del self._entries[key]
+            fired += 1
+            try:
+                result = entry[2]()
+                if asyncio.iscoroutine(result):
+                    task = asyncio.create_task(self._guard(key, result))
+                    self._running.add(task)
+                    task.add_done_callback(self._running.discard)
+            except Exception as e:
+                print(f"Scheduler callback error for {key}: {e}")
+        
+        return fired
+    
+    async def _guard(self, key: Hashable, coro):
+        try:
+            await coro
+        except Exception as e:
+            print(f"Scheduler callback error for {key}: {e}")
+    
+    def _compact(self):
+        """Drop stale heap entries."""
+        self._heap = [
+            (deadline, seq, key)
+            for deadline, seq, key in self._heap
+            if key in self._entries and self._entries[key][1] == seq
+        ]
+        heapq.heapify(self._heap)
+    
+    async def _run(self):
+        """Sleep until the earliest deadline (or an earlier one is added) and fire due entries."""
+        while True:
+            try:
+                self._wakeup.clear()
+                deadline = self.next_deadline()
+                
+                if deadline is None:
+                    await self._wakeup.wait()
+                    continue
+                
+                delay = deadline - self.clock()
+                if delay > 0:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                
+                self.run_due()
+            
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                print(f"Scheduler error: {e}")
+                await asyncio.sleep(0.1)
@@ -0,0 +1,82 @@
+"""
+Spectator relay: serves /watch for games played on the workers.
+
+Run one or more next to the workers, with the same MATCHMAKING_SERVICE:
+    
+    APP=app.spectator_relay:app PORT=8100 python start.py
+
+and send /watch/ traffic to them. A relay subscribes to each game its
+spectators watch through the matchmaking service and fans every frame out
+itself, so the worker running a game publishes one frame per move however
+many people watch it, and spends no time on spectator sockets. Relays are
+never given games to host.
+"""
+
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI, Header, WebSocket
+
+from .config import get_settings
+from .encoding import FastJSONResponse, encoder_name
+from .matchmaking import matchmaking
+from .matchmaking_service import MatchmakingClient
+from .websocket.manager import manager
+from .websocket.play import setup_matchmaking
+from .websocket.multiwatch import handle_multi_spectator
+from .websocket.spectator import handle_spectator, handle_spectator_events
+from .websocket.sse import end_streams
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application lifespan handler."""
+    if not isinstance(matchmaking, MatchmakingClient):
+        raise RuntimeError("A spectator relay needs MATCHMAKING_SERVICE set to the workers' service")
+    
+    print("Starting spectator relay...")
+    print(f"Encoding JSON with {encoder_name()}")
+    setup_matchmaking()
+    matchmaking.host_games = False
+    await matchmaking.start()
+    
+    yield
+    
+    print("Shutting down spectator relay...")
+    end_streams()
+    await matchmaking.stop()
+
+
+app = FastAPI(
+    title=f"{get_settings().app_name} spectator relay",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
+)
+
+
+@app.get("/health")
+async def health():
+    """Health check."""
+    return {
+        "status": "healthy",
+        "connected": matchmaking.connected,
+        "spectators": sum(len(s) for s in manager.spectators.values()) + sum(s.viewers for s in manager.streams.values()),
+    }
+
+
+@app.websocket("/watch")
+async def websocket_watch_many(websocket: WebSocket):
+    """WebSocket endpoint for spectators following several games."""
+    await handle_multi_spectator(websocket)
+
+
+@app.websocket("/watch/{game_id}")
+async def websocket_watch(websocket: WebSocket, game_id: str):
+    """WebSocket endpoint for spectators."""
+    await handle_spectator(websocket, game_id)
+
+
+@app.get("/watch/{game_id}/events")
+async def watch_events(game_id: str, last_event_id: Optional[str] = Header(None)):
+    """Server-Sent Events endpoint for spectators."""
+    return await handle_spectator_events(game_id, last_event_id)
@@ -0,0 +1,201 @@
+"""Incremental game-termination detection.
+
+Keeps a running Zobrist hash, a repetition table and a material signature
+alongside a ``chess.Board`` so that the end-of-game checks after each move
+do not depend on how long the game has been going.
+"""
+
+import chess
+from chess.polyglot import POLYGLOT_RANDOM_ARRAY
+from typing import Dict, Optional
+
+
+# Polyglot layout: 768 piece-square keys, 4 castling keys, 8 en passant file keys, 1 turn key
+CASTLING_KEYS = {
+    chess.H1: POLYGLOT_RANDOM_ARRAY[768],
+    chess.A1: POLYGLOT_RANDOM_ARRAY[768 + 1],
+    chess.H8: POLYGLOT_RANDOM_ARRAY[768 + 2],
+    chess.A8: POLYGLOT_RANDOM_ARRAY[768 + 3],
+}
+EP_KEYS = POLYGLOT_RANDOM_ARRAY[772:780]
+TURN_KEY = POLYGLOT_RANDOM_ARRAY[780]
+
+# Material signature: one 4-bit counter per (piece type, color)
+MATERIAL_SHIFT = {
+    (piece_type, color): 4 * ((piece_type - 1) * 2 + int(color))
+    for piece_type in chess.PIECE_TYPES
+    for color in chess.COLORS
+}
+
+# Pawns, rooks and queens (either color) always leave mating material on the board
+HEAVY_MASK = 0
+for _piece_type in (chess.PAWN, chess.ROOK, chess.QUEEN):
+    for _color in chess.COLORS:
+        HEAVY_MASK |= 0xF << MATERIAL_SHIFT[(_piece_type, _color)]
+
+
+def piece_key(piece_type: chess.PieceType, color: chess.Color, square: chess.Square) -> int:
+    """Get the Zobrist key for a piece on a square."""
+    return POLYGLOT_RANDOM_ARRAY[64 * ((piece_type - 1) * 2 + int(color)) + square]
+
+
+def castling_key(castling_rights: chess.Bitboard) -> int:
+    """Get the Zobrist key for a set of (clean) castling rights."""
+    key = 0
+    for square in chess.scan_forward(castling_rights):
+        key ^= CASTLING_KEYS.get(square, 0)
+    return key
+
+
+def ep_key(board: chess.Board) -> int:
+    """Get the Zobrist key for the en passant square, if a capture is actually legal."""
+    if board.ep_square is not None and board.has_legal_en_passant():
+        return EP_KEYS[chess.square_file(board.ep_square)]
+    return 0
+
+
+def material_signature(board: chess.Board) -> int:
+    """Pack piece counts per (type, color) into a single integer."""
+    signature = 0
+    for (piece_type, color), shift in MATERIAL_SHIFT.items():
+        signature += len(board.pieces(piece_type, color)) << shift
+    return signature
+
+
+class TerminationDetector:
+    """
+    Tracks the state needed to detect the end of a game in O(1) per ply.
+    
+    The repetition table only holds positions since the last irreversible
+    move, since no earlier position can ever occur again.
+    """
+    
+    __slots__ = ("piece_hash", "key", "material", "material_changed", "repetitions", "repeated")
+    
+    def __init__(self, board: Optional[chess.Board] = None):
+        self.reset(board if board is not None else chess.Board())
+    
+    def reset(self, board: chess.Board):
+        """Rebuild all tracked state from a board position."""
+        piece_hash = 0
+        for square, piece in board.piece_map().items():
+            piece_hash ^= piece_key(piece.piece_type, piece.color, square)
+        
+        self.piece_hash = piece_hash
+        self.material = material_signature(board)
+        self.material_changed = True
+        self.key = self._position_key(board)
+        self.repetitions: Dict[int, int] = {self.key: 1}
+        self.repeated = 0  # Number of positions seen at least twice
+    
+    def _position_key(self, board: chess.Board) -> int:
+        key = self.piece_hash ^ castling_key(board.clean_castling_rights()) ^ ep_key(board)
+        if board.turn == chess.WHITE:
+            key ^= TURN_KEY
+        return key
+    
+    def push(self, board: chess.Board, move: chess.Move):
+        """Push a legal move onto the board and update the tracked state."""
+        irreversible = board.is_irreversible(move)
+        color = board.turn
+        from_square = move.from_square
+        to_square = move.to_square
+        piece_type = board.piece_type_at(from_square)
+        
+        piece_hash = self.piece_hash
+        material = self.material
+        
+        if board.is_castling(move):
+            # python-chess may encode castling as king-takes-rook; normalize both forms
+            rank = chess.square_rank(from_square)
+            if board.is_kingside_castling(move):
+                rook_from, rook_to, king_to = chess.square(7, rank), chess.square(5, rank), chess.square(6, rank)
+            else:
+                rook_from, rook_to, king_to = chess.square(0, rank), chess.square(3, rank), chess.square(2, rank)
+            piece_hash ^= piece_key(chess.KING, color, from_square) ^ piece_key(chess.KING, color, king_to)
+            piece_hash ^= piece_key(chess.ROOK, color, rook_from) ^ piece_key(chess.ROOK, color, rook_to)
+        else:
+            if board.is_en_passant(move):
+                captured_square = to_square - 8 if color == chess.WHITE else to_square + 8
+                captured_type = chess.PAWN
+            else:
+                captured_square = to_square
+                captured_type = board.piece_type_at(to_square)
+            
+            if captured_type:
+                piece_hash ^= piece_key(captured_type, not color, captured_square)
+                material -= 1 << MATERIAL_SHIFT[(captured_type, not color)]
+            
+            piece_hash ^= piece_key(piece_type, color, from_square)
+            if move.promotion:
+                piece_hash ^= piece_key(move.promotion, color, to_square)
+                material -= 1 << MATERIAL_SHIFT[(chess.PAWN, color)]
+                material += 1 << MATERIAL_SHIFT[(move.promotion, color)]
+            else:
+                piece_hash ^= piece_key(piece_type, color, to_square)
+        
+        board.push(move)
+        
+        self.piece_hash = piece_hash
+        self.material_changed = material != self.material
+        self.material = material
+        self.key = key = self._position_key(board)
+        
+        if irreversible:
+            self.repetitions = {key: 1}
+            self.repeated = 0
+        else:
+            count = self.repetitions.get(key, 0) + 1
+            self.repetitions[key] = count
+            if count == 2:
+                self.repeated += 1
+    
+    def _repetition_reachable(self, board: chess.Board) -> bool:
+        """Check if a legal move reaches a position for the third time."""
+        # Only reversible moves can lead back to a position in the table. Those
+        # never change castling rights or create an en passant square, so the
+        # resulting key follows from the piece hash alone.
+        side_keys = castling_key(board.clean_castling_rights())
+        if board.turn == chess.BLACK:
+            side_keys ^= TURN_KEY
+        
+        color = board.turn
+        for move in board.generate_legal_moves():
+            if board.is_irreversible(move):
+                continue
+            piece_type = board.piece_type_at(move.from_square)
+            key = (self.piece_hash ^ side_keys ^
+                   piece_key(piece_type, color, move.from_square) ^
+                   piece_key(piece_type, color, move.to_square))
+            if self.repetitions.get(key, 0) >= 2:
+                return True
+        return False
+    
+    def check(self, board: chess.Board, has_legal_moves: Optional[bool] = None) -> Optional[str]:
+        """
+        Check whether the game is over after the last push.
+        
+        has_legal_moves can be passed in when the caller already generated
+        the legal moves for this position.
+        
+        Returns:
+            A termination value ("checkmate", "stalemate", ...) or None
+        """
+        if has_legal_moves is None:
+            has_legal_moves = any(board.generate_legal_moves())
+        
+        if not has_legal_moves:
+            return "checkmate" if board.is_check() else "stalemate"
+        
+        # Insufficient material can only appear after a capture or promotion
+        if self.material_changed and not self.material & HEAVY_MASK and board.is_insufficient_material():
+            return "insufficient"
+        
+        if self.repeated:
+            if self.repetitions[self.key] >= 3 or self._repetition_reachable(board):
+                return "repetition"
+        
+        if board.halfmove_clock >= 99 and board.can_claim_fifty_moves():
+            return "fifty_move"
+        
+        return None
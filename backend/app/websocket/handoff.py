@@ -0,0 +1,208 @@
+"""Hand active games, seekers and rate limits over to the next process on a restart."""
+
+import asyncio
+import json
+import os
+import time
+from dataclasses import asdict
+from typing import Dict, List, Optional
+
+from .manager import manager
+from . import lobby, play
+from .sse import end_streams
+from .play import abort_game, active_games, deadlines, restore_game, end_game
+from ..matchmaking import SeekStatus, matchmaking
+from ..rate_limiter import rate_limiter, AgentRateLimitState
+from ..game_engine import GameStatus
+from ..journal import JournaledGame
+from ..config import get_settings
+
+
+HANDOFF_VERSION = 1
+
+# Seeks handed over by the previous process, re-queued when their agent reconnects
+pending_seeks: Dict[str, List[dict]] = {}
+
+
+def export_state() -> dict:
+    """
+    Snapshot everything the next process needs to carry on.
+    
+    Clocks are read at the moment of the snapshot, so the player to move is
+    charged for their thinking time so far but not for the restart itself.
+    """
+    games = []
+    for game in active_games.values():
+        if game.status != GameStatus.ACTIVE:
+            continue
+        white_time, black_time = game.clock.get_current_times()
+        games.append({
+            "game_id": game.game_id,
+            "white_agent_id": game.white_agent_id,
+            "black_agent_id": game.black_agent_id,
+            "category": game.category,
+            "started_at": game.started_at.isoformat() if game.started_at else None,
+            "pgn_clock_comments": game.pgn_clock_comments,
+            "moves": game.moves,
+            "move_clocks": game.move_clocks,
+            "clock": [round(white_time, 3), round(black_time, 3)],
+        })
+    
+    seekers = [
+        {
+            "agent_id": s.agent_id,
+            "agent_name": s.agent_name,
+            "elo": s.elo,
+            "category": s.category,
+            "status": s.status.value,
+            "queued_at": s.queued_at,
+        }
+        for queue in matchmaking.queues.values()
+        for s in queue
+    ]
+    
+    return {
+        "version": HANDOFF_VERSION,
+        "exported_at": time.time(),
+        "games": games,
+        "seekers": seekers,
+        "rate_limits": [asdict(state) for state in rate_limiter.states.values()],
+    }
+
+
+def write_handoff(path: str, state: dict):
+    """Atomically write a handoff file."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, separators=(",", ":"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_handoff(path: str, max_age: float) -> Optional[dict]:
+    """Read and consume a handoff file. Returns None if there is none or it is unusable."""
+    if not os.path.exists(path):
+        return None
+    
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Could not read handoff file {path}: {e}")
+        state = None
+    
+    # Only the first process to start after a drain may take over
+    os.remove(path)
+    
+    if not state or state.get("version") != HANDOFF_VERSION:
+        return None
+    
+    age = time.time() - state.get("exported_at", 0)
+    if age > max_age:
+        print(f"Ignoring handoff from {age:.0f}s ago")
+        return None
+    
+    return state
+
+
+def is_draining() -> bool:
+    """Check if this process is handing over to the next one."""
+    return play.draining
+
+
+async def drain():
+    """
+    Stop taking seeks and moves, write the handoff file and send everyone to the next process.
+    
+    Agents and spectators are closed with 1012 (service restart) so clients
+    know to reconnect. Safe to call more than once.
+    """
+    # Event streams would otherwise keep the server waiting on them
+    end_streams()
+    
+    path = get_settings().handoff_path
+    if play.draining or not path:
+        return
+    play.draining = True
+    
+    # Nothing may flag, forfeit or get matched after the snapshot
+    await matchmaking.stop()
+    await deadlines.stop()
+    
+    state = export_state()
+    await asyncio.to_thread(write_handoff, path, state)
+    print(f"Handed over {len(state['games'])} games and {len(state['seekers'])} seekers")
+    
+    # Let queued frames go out first (each outbox gives up after a moment)
+    outboxes = [conn.outbox for conn in manager.agents.values()]
+    outboxes += [outbox for spectators in manager.spectators.values() for outbox in spectators.values()]
+    await asyncio.gather(*(outbox.close(code=1012, reason="Server restarting") for outbox in outboxes))
+
+
+async def take_over(path: str, max_age: float):
+    """Pick up the state handed over by the previous process, if any."""
+    state = await asyncio.to_thread(read_handoff, path, max_age)
+    if not state:
+        return
+    
+    restored = []
+    for entry in state["games"]:
+        record = JournaledGame(
+            game_id=entry["game_id"],
+            white_agent_id=entry["white_agent_id"],
+            black_agent_id=entry["black_agent_id"],
+            category=entry["category"],
+            started_at=entry["started_at"],
+            pgn_clock_comments=entry["pgn_clock_comments"],
+            moves=entry["moves"],
+            clocks=[tuple(c) if c else None for c in entry.get("move_clocks", [])] or [None] * len(entry["moves"]),
+        )
+        game = restore_game(record)
+        if not game:
+            await abort_game(record.game_id)
+            continue
+        
+        # The clock stays stopped until the player to move reconnects (see handle_agent_reconnect)
+        game.clock.white_time, game.clock.black_time = entry["clock"]
+        restored.append(game)
+    
+    for game in restored:
+        if game.status == GameStatus.ENDED:
+            await end_game(game)
+        else:
+            await lobby.game_started(game)
+    
+    for entry in state["rate_limits"]:
+        if entry["agent_id"] not in rate_limiter.states:
+            rate_limiter.states[entry["agent_id"]] = AgentRateLimitState(**entry)
+    
+    for entry in state["seekers"]:
+        pending_seeks.setdefault(entry["agent_id"], []).append(entry)
+    if pending_seeks:
+        # Seekers who don't come back within the usual reconnect window are dropped
+        deadlines.schedule_in(("handoff", "seeks"), get_settings().disconnect_forfeit_time, pending_seeks.clear)
+    
+    print(f"Took over {len(restored)} games and {len(state['seekers'])} seekers from the previous process")
+
+
+async def restore_seeks(agent_id: str):
+    """Re-queue an agent's handed-over seeks, keeping their original wait time."""
+    for entry in pending_seeks.pop(agent_id, []):
+        category = entry["category"]
+        if manager.get_agent_game(agent_id) or matchmaking.get_seeker(agent_id, category):
+            continue
+        
+        seeker = await matchmaking.add_seeker(
+            agent_id, entry["agent_name"], entry["elo"], category, queued_at=entry["queued_at"]
+        )
+        if seeker.status == SeekStatus.MATCHED:
+            continue
+        
+        await manager.send_to_agent(agent_id, {
+            "event": "queued",
+            "category": category,
+            "position": seeker.position,
+            "elo_range": list(seeker.get_elo_range()),
+            "restored": True,
+        })
@@ -0,0 +1,189 @@
+"""
+The leaderboards from memory, and their changes as Server-Sent Events.
+
+rankings is this process's copy of the leaderboards (see app.rankings),
+read from the database on first use. end_game hands it both players' new
+rows, here or, with a matchmaking service, through it to every worker.
+
+GET /leaderboard/{category}/events?top=N (or ?around=AGENT_ID&radius=K)
+streams a window of the leaderboard: a snapshot event with its entries,
+then a leaderboard event whenever ranks in it change, listing the entries
+that changed (with rank_change, positive for a climb, and elo_change
+against the window's previous event) and the IDs that left it. Each
+window is one shared stream however many watch it.
+"""
+
+import asyncio
+from typing import Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from ..database import get_db
+from ..encoding import dumps
+from ..rankings import FIELDS, Rankings
+from .manager import manager
+from .sse import GameStream, parse_last_event_id, sse_response
+
+# Largest windows a stream can follow
+MAX_TOP = 100
+MAX_RADIUS = 50
+
+rankings = Rankings()
+loading = asyncio.Lock()
+
+
+class Window:
+    """A followed stretch of one leaderboard: ("top", category, n) or ("around", category, agent_id, radius)."""
+    
+    __slots__ = ("key", "stream", "entries", "restated")
+    
+    def __init__(self, key: tuple):
+        self.key = key
+        self.stream = GameStream(f"leaderboard:{key}")
+        self.entries = window_entries(key)
+        
+        # Whether stream.state is the snapshot of these entries
+        self.restated = False
+
+
+windows: Dict[tuple, Window] = {}
+
+# Reloads under way (the loop only keeps weak references to tasks)
+reloads: Set[asyncio.Task] = set()
+
+
+async def ensure_loaded():
+    """Read the leaderboards from the database, the first time they are needed."""
+    async with loading:
+        if rankings.loaded:
+            return
+        async with get_db() as db:
+            cursor = await db.execute(f"SELECT {', '.join(FIELDS)} FROM agents WHERE games_played > 0")
+            rankings.load(dict(row) for row in await cursor.fetchall())
+
+
+def ratings_changed(rows: List[dict]):
+    """Players' rows after end_game wrote them: update the leaderboards here, or everywhere."""
+    if manager.relay is not None:
+        manager.relay.ratings(rows)
+    else:
+        on_ratings(rows)
+
+
+def on_ratings(rows: List[dict]):
+    """Apply new rows and push what changed to the windows followed here."""
+    shifted = rankings.update(rows)
+    for window in list(windows.values()):
+        spans = shifted[window.key[1]]
+        if not spans:
+            continue
+        
+        # Ranks outside every span kept their agents, so a window clear of them is unchanged
+        if window.key[0] == "top":
+            low, high = 1, window.key[2]
+        elif window.entries:
+            low, high = window.entries[0]["rank"], window.entries[-1]["rank"]
+        else:
+            low, high = 1, len(rankings.agents)
+        if any(first <= high and last >= low for first, last in spans):
+            refresh(window)
+
+
+def on_connected():
+    """Rows may have been missed while away from the matchmaking service: reload them."""
+    rankings.loaded = False
+    if windows:
+        task = asyncio.create_task(reload())
+        reloads.add(task)
+        task.add_done_callback(reloads.discard)
+
+
+async def reload():
+    await ensure_loaded()
+    for window in list(windows.values()):
+        refresh(window)
+
+
+def window_entries(key: tuple) -> List[dict]:
+    category = key[1]
+    if key[0] == "top":
+        return rankings.entries(category, 0, key[2])
+    rank = rankings.rank(category, key[2])
+    if rank is None:
+        return []
+    first = max(rank - key[3], 1)
+    return rankings.entries(category, first - 1, rank + key[3] - first + 1)
+
+
+def refresh(window: Window):
+    """Publish the window's changed entries, if any."""
+    entries = window_entries(window.key)
+    previous = {entry["id"]: entry for entry in window.entries}
+    changes = []
+    for entry in entries:
+        before = previous.pop(entry["id"], None)
+        if before == entry:
+            continue
+        change = dict(entry)
+        if before:
+            change["rank_change"] = before["rank"] - entry["rank"]
+            change["elo_change"] = entry["elo"] - before["elo"]
+        changes.append(change)
+    if not changes and not previous:
+        return
+    
+    window.entries = entries
+    window.restated = False
+    window.stream.publish(dumps({
+        "event": "leaderboard",
+        "category": window.key[1],
+        "total": len(rankings.agents),
+        "changes": changes,
+        "removed": list(previous),
+    }))
+
+
+def window_key(category: str, top: Optional[int], around: Optional[str], radius: int) -> Tuple:
+    if around:
+        if not 0 <= radius <= MAX_RADIUS:
+            raise HTTPException(status_code=400, detail=f"radius must be between 0 and {MAX_RADIUS}")
+        return ("around", category, around, radius)
+    if not top or not 1 <= top <= MAX_TOP:
+        raise HTTPException(status_code=400, detail=f"Give top (1 to {MAX_TOP}) or around")
+    return ("top", category, top)
+
+
+async def handle_leaderboard_events(
+    category: str, top: Optional[int], around: Optional[str], radius: int, last_event_id: Optional[str],
+) -> StreamingResponse:
+    """Handle a leaderboard viewer: a window's entries, then their changes."""
+    key = window_key(category, top, around, radius)
+    await ensure_loaded()
+    
+    async def events():
+        # Set up once streaming starts, so a client gone before then leaves nothing behind
+        window = windows.get(key)
+        if window is None:
+            window = windows[key] = Window(key)
+        
+        # The entries new viewers start from, encoded once per change someone asked for
+        if not window.restated:
+            window.stream.restate(dumps({
+                "event": "snapshot",
+                "category": category,
+                "total": len(rankings.agents),
+                "entries": window.entries,
+            }))
+            window.restated = True
+        
+        window.stream.viewers += 1
+        try:
+            async for chunk in window.stream.follow(parse_last_event_id(last_event_id)):
+                yield chunk
+        finally:
+            window.stream.viewers -= 1
+            if not window.stream.viewers and windows.get(key) is window:
+                del windows[key]
+    
+    return sse_response(events())
@@ -0,0 +1,137 @@
+"""
+The lobby: GET /games/live from memory, and its changes as Server-Sent Events.
+
+live_games is this process's copy of the live games list (see
+app.live_games). Games started or ended here and spectator count changes
+of games hosted here are recorded in it, or, with a matchmaking service,
+sent there to be versioned and handed back to every worker alike.
+
+GET /games/live/events streams each applied change (game_started,
+game_ended, spectators, each with its version) to lobby viewers, after a
+snapshot event with the whole list; a snapshot event also replaces the
+list whenever the versions restart.
+"""
+
+import asyncio
+from typing import Dict, Optional
+
+from fastapi.responses import StreamingResponse
+
+from ..config import get_settings
+from ..database import get_db
+from ..encoding import dumps
+from ..game_engine import ChessGame
+from ..live_games import LiveGames
+from .manager import manager
+from .sse import GameStream, parse_last_event_id, sse_response
+
+live_games = LiveGames()
+
+# Lobby viewers all follow this one stream
+stream = GameStream("lobby")
+stream_version: Optional[tuple] = None  # (epoch, version) of stream.state
+
+# Spectator counts not yet recorded, sent every lobby_spectator_interval
+pending_counts: Dict[str, int] = {}
+flush_handle: Optional[asyncio.TimerHandle] = None
+
+
+async def game_started(game: ChessGame):
+    """List a game that started (or was taken over) here."""
+    async with get_db() as db:
+        cursor = await db.execute(
+            "SELECT id, name, avatar_url, elo_bullet, elo_blitz, elo_rapid FROM agents WHERE id IN (?, ?)",
+            (game.white_agent_id, game.black_agent_id),
+        )
+        agents = {row["id"]: dict(row) for row in await cursor.fetchall()}
+    
+    entry = {
+        "id": game.game_id,
+        "category": game.category,
+        "status": "active",
+        "started_at": game.started_at.isoformat() if game.started_at else None,
+        "white_agent_id": game.white_agent_id,
+        "black_agent_id": game.black_agent_id,
+    }
+    for color, agent_id in (("white", game.white_agent_id), ("black", game.black_agent_id)):
+        agent = agents.get(agent_id, {})
+        entry[f"{color}_name"] = agent.get("name")
+        entry[f"{color}_avatar"] = agent.get("avatar_url")
+        for category in ("bullet", "blitz", "rapid"):
+            entry[f"{color}_elo_{category}"] = agent.get(f"elo_{category}", 1200)
+        entry[f"{color}_elo"] = entry[f"{color}_elo_{game.category}"]
+    entry["spectator_count"] = game.spectator_count
+    
+    record({"event": "game_started", "game": entry})
+
+
+def game_ended(game_id: str):
+    pending_counts.pop(game_id, None)
+    record({"event": "game_ended", "game_id": game_id})
+
+
+def count_spectators(game: ChessGame):
+    """Update a game's spectator count, and list the new count (batched) if it changed."""
+    game.spectator_count = manager.get_spectator_count(game.game_id)
+    listed = live_games.games.get(game.game_id)
+    if listed is None or listed["spectator_count"] == game.spectator_count:
+        pending_counts.pop(game.game_id, None)
+        return
+    
+    global flush_handle
+    pending_counts[game.game_id] = game.spectator_count
+    if flush_handle is None:
+        flush_handle = asyncio.get_running_loop().call_later(
+            get_settings().lobby_spectator_interval, flush_counts,
+        )
+
+
+def flush_counts():
+    global flush_handle
+    flush_handle = None
+    if pending_counts:
+        record({"event": "spectators", "counts": dict(pending_counts)})
+        pending_counts.clear()
+
+
+def record(event: dict):
+    """Record a change here, or have the matchmaking service version it for every worker."""
+    if manager.relay is not None:
+        manager.relay.lobby(event)
+        return
+    event = live_games.record(event)
+    if event:
+        stream.publish(dumps(event))
+
+
+def on_lobby(message: dict):
+    """A change versioned by the matchmaking service, or its whole list on (re)connecting."""
+    if "snapshot" in message:
+        live_games.load(message["snapshot"])
+        stream.publish(snapshot_event(), state=True)
+    elif live_games.apply(message["event"]):
+        stream.publish(dumps(message["event"]))
+
+
+def snapshot_event() -> str:
+    global stream_version
+    stream_version = (live_games.epoch, live_games.version)
+    return dumps({"event": "snapshot", **live_games.snapshot()})
+
+
+async def handle_lobby_events(last_event_id: Optional[str]) -> StreamingResponse:
+    """Handle a lobby viewer: the live games list, then its changes."""
+    
+    async def events():
+        # The list new viewers start from, encoded once per version someone asked for
+        if stream_version != (live_games.epoch, live_games.version):
+            stream.restate(snapshot_event())
+        
+        stream.viewers += 1
+        try:
+            async for chunk in stream.follow(parse_last_event_id(last_event_id)):
+                yield chunk
+        finally:
+            stream.viewers -= 1
+    
+    return sse_response(events())
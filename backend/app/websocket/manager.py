@@ -1,11 +1,32 @@
 """WebSocket connection manager."""
 
 import asyncio
-import json
-from typing import Dict, Set, Optional, Any
+from typing import Dict, Optional, Any, Set, Tuple, Union
 from fastapi import WebSocket
 from dataclasses import dataclass, field
 
+from ..config import get_settings
+from ..encoding import dumps
+from .outbox import Outbox
+from .protocol import JSON
+from .sse import GameStream
+
+
+# Outbound messages are either dicts or pre-encoded JSON text
+Message = Union[dict, str]
+
+
+def encode_message(message: Message) -> str:
+    """Encode a message to JSON text (once, however many sockets it goes to)."""
+    if isinstance(message, str):
+        return message
+    return dumps(message)
+
+
+def create_outbox(websocket: WebSocket, protocol: str = JSON) -> Outbox:
+    settings = get_settings()
+    return Outbox(websocket, settings.send_queue_limit, settings.slow_consumer_policy, protocol)
+
 
 @dataclass
 class AgentConnection:
@@ -13,7 +34,13 @@ class AgentConnection:
     agent_id: str
     agent_name: str
     websocket: WebSocket
+    outbox: Outbox
     current_game_id: Optional[str] = None
+    legal_moves: bool = False  # Include legal_moves in state events
+    
+    def send(self, message: Message, state: bool = False) -> bool:
+        """Queue a message for this connection without waiting for it to be sent."""
+        return self.outbox.send(message, state)
 
 
 @dataclass  
@@ -30,28 +57,49 @@ class ConnectionManager:
         # Agent connections: agent_id -> AgentConnection
         self.agents: Dict[str, AgentConnection] = {}
         
-        # Spectator connections: game_id -> Set[WebSocket]
-        self.spectators: Dict[str, Set[WebSocket]] = {}
+        # Spectator connections: game_id -> {websocket: outbox (or a GameView, on multi-game sockets)}
+        self.spectators: Dict[str, Dict[WebSocket, Outbox]] = {}
         
         # Reverse lookup: websocket -> agent_id (for cleanup)
         self.websocket_to_agent: Dict[WebSocket, str] = {}
+        
+        # Current game per agent, kept across disconnects so agents can reconnect into it
+        self.agent_games: Dict[str, str] = {}
+        
+        # With a shared matchmaking service: the client that relays frames and game
+        # assignments to other workers, and the worker hosting each game that is
+        # played by an agent connected here but runs elsewhere
+        self.relay = None
+        self.game_hosts: Dict[str, str] = {}
+        
+        # Spectators on other workers of games hosted here: game_id -> {worker: count}
+        self.remote_spectators: Dict[str, Dict[str, int]] = {}
+        
+        # Spectators here of games hosted on other workers, waiting for their first frame
+        self.joining: Dict[str, Set[WebSocket]] = {}
+        
+        # Server-Sent Events spectators: game_id -> the stream its viewers share
+        self.streams: Dict[str, GameStream] = {}
     
-    async def connect_agent(self, websocket: WebSocket, agent_id: str, agent_name: str) -> AgentConnection:
+    async def connect_agent(
+        self, websocket: WebSocket, agent_id: str, agent_name: str, legal_moves: bool = False,
+        protocol: str = JSON,
+    ) -> AgentConnection:
         """Connect an agent. WebSocket must already be accepted."""
         # Disconnect existing connection if any
         if agent_id in self.agents:
             old_conn = self.agents[agent_id]
-            try:
-                await old_conn.websocket.close(code=4000, reason="New connection")
-            except:
-                pass
+            old_conn.outbox.evict(code=4000, reason="New connection")
             if old_conn.websocket in self.websocket_to_agent:
                 del self.websocket_to_agent[old_conn.websocket]
         
         conn = AgentConnection(
             agent_id=agent_id,
             agent_name=agent_name,
-            websocket=websocket
+            websocket=websocket,
+            outbox=create_outbox(websocket, protocol),
+            current_game_id=self.agent_games.get(agent_id),
+            legal_moves=legal_moves,
         )
         self.agents[agent_id] = conn
         self.websocket_to_agent[websocket] = agent_id
@@ -63,7 +111,7 @@ class ConnectionManager:
         agent_id = self.websocket_to_agent.get(websocket)
         if agent_id:
             if agent_id in self.agents:
-                del self.agents[agent_id]
+                self.agents.pop(agent_id).outbox.discard()
             del self.websocket_to_agent[websocket]
         return agent_id
     
@@ -75,68 +123,146 @@ class ConnectionManager:
         """Check if an agent is connected."""
         return agent_id in self.agents
     
-    async def send_to_agent(self, agent_id: str, message: dict):
-        """Send a message to a specific agent."""
+    def wants_legal_moves(self, agent_id: str) -> bool:
+        """Check if an agent asked for legal moves in state events."""
+        conn = self.agents.get(agent_id)
+        if conn:
+            return conn.legal_moves
+        return self.relay is not None and agent_id in self.relay.legal_moves
+    
+    async def send_to_agent(self, agent_id: str, message: Message, state: bool = False):
+        """
+        Queue a message for a specific agent, via the worker it is connected to if not this one.
+        
+        state marks full state frames, which a lagging connection may coalesce.
+        """
+        if agent_id in self.agents or self.relay is None:
+            await self.deliver_to_agent(agent_id, message, state)
+        else:
+            self.relay.deliver(agent_id, message)
+    
+    async def deliver_to_agent(self, agent_id: str, message: Message, state: bool = False):
+        """Queue a message for an agent connected to this worker (dropped if it is not)."""
         conn = self.agents.get(agent_id)
         if conn:
-            try:
-                await conn.websocket.send_json(message)
-            except Exception as e:
-                print(f"Error sending to agent {agent_id}: {e}")
+            conn.send(message, state)
     
-    async def connect_spectator(self, websocket: WebSocket, game_id: str):
-        """Connect a spectator to a game."""
+    async def connect_spectator(self, websocket: WebSocket, game_id: str, protocol: str = JSON) -> Outbox:
+        """Connect a spectator to a game. Returns the outbox to send to it through."""
         await websocket.accept()
         
+        outbox = create_outbox(websocket, protocol)
+        self.add_spectator(websocket, game_id, outbox)
+        return outbox
+    
+    def add_spectator(self, websocket: WebSocket, game_id: str, outbox: Outbox):
+        """Send a game's spectator events to an accepted socket, through outbox."""
         if game_id not in self.spectators:
-            self.spectators[game_id] = set()
-        self.spectators[game_id].add(websocket)
+            self.spectators[game_id] = {}
+        self.spectators[game_id][websocket] = outbox
     
     async def disconnect_spectator(self, websocket: WebSocket, game_id: str):
         """Disconnect a spectator from a game."""
         if game_id in self.spectators:
-            self.spectators[game_id].discard(websocket)
+            outbox = self.spectators[game_id].pop(websocket, None)
+            if outbox:
+                outbox.discard()
             if not self.spectators[game_id]:
                 del self.spectators[game_id]
     
     def get_spectator_count(self, game_id: str) -> int:
-        """Get the number of spectators for a game."""
-        return len(self.spectators.get(game_id, set()))
+        """Get the number of spectators for a game, on this worker and the others."""
+        stream = self.streams.get(game_id)
+        return (
+            len(self.spectators.get(game_id, {}))
+            + (stream.viewers if stream else 0)
+            + sum(self.remote_spectators.get(game_id, {}).values())
+        )
     
-    async def broadcast_to_spectators(self, game_id: str, message: dict):
-        """Broadcast a message to all spectators of a game."""
-        spectator_set = self.spectators.get(game_id, set())
+    async def broadcast_to_spectators(self, game_id: str, message: Message, state: bool = False):
+        """
+        Queue a message for all spectators of a game. Never waits on a spectator's socket.
+        
+        The frame is published once for other workers with spectators of the
+        game, which fan it out to theirs, and once into the game's event stream.
+        """
+        spectators = self.spectators.get(game_id, {})
         dead_connections = []
         
-        for ws in spectator_set:
-            try:
-                await ws.send_json(message)
-            except Exception:
+        # Encode once for everyone
+        message = encode_message(message)
+        
+        for ws, outbox in spectators.items():
+            if not outbox.send(message, state):
                 dead_connections.append(ws)
         
-        # Clean up dead connections
+        # Clean up dead and evicted connections
         for ws in dead_connections:
-            spectator_set.discard(ws)
+            del spectators[ws]
+        
+        stream = self.streams.get(game_id)
+        if stream:
+            stream.publish(message, state)
+        
+        if game_id in self.remote_spectators:
+            self.relay.publish(game_id, message, state)
     
-    async def broadcast_to_game(self, game_id: str, message: dict, white_id: str, black_id: str):
-        """Broadcast a message to both players and all spectators of a game."""
+    async def broadcast_to_game(
+        self, game_id: str, message: Message, white_id: str, black_id: str,
+        legal_moves_message: Optional[Message] = None, first_id: Optional[str] = None,
+        state: bool = False, spectators: bool = True,
+    ):
+        """
+        Broadcast a message to both players and all spectators of a game.
+        
+        Players who asked for legal moves get legal_moves_message instead, if given.
+        first_id (the player to move) is served first, and both players' frames
+        get a chance to go out before any spectator's is queued. With
+        spectators off, only the players get the message.
+        """
+        message = encode_message(message)
+        
         # Send to players
-        await self.send_to_agent(white_id, message)
-        await self.send_to_agent(black_id, message)
+        players = (black_id, white_id) if first_id == black_id else (white_id, black_id)
+        for agent_id in players:
+            if legal_moves_message is not None and self.wants_legal_moves(agent_id):
+                await self.send_to_agent(agent_id, legal_moves_message, state)
+            else:
+                await self.send_to_agent(agent_id, message, state)
         
-        # Send to spectators
-        await self.broadcast_to_spectators(game_id, message)
+        # Let the players' writers run before the spectator fan-out
+        if spectators:
+            await asyncio.sleep(0)
+            await self.broadcast_to_spectators(game_id, message, state)
+    
+    def set_agent_game(self, agent_id: str, game_id: Optional[str], rating: Optional[Tuple[str, float]] = None):
+        """Set the current game for an agent, hosted by this worker (rating: its category and average Elo)."""
+        self._set_game(agent_id, game_id)
+        self.game_hosts.pop(agent_id, None)
+        if self.relay:
+            self.relay.assign(agent_id, game_id, rating)
     
-    def set_agent_game(self, agent_id: str, game_id: Optional[str]):
-        """Set the current game for an agent."""
+    def set_remote_game(self, agent_id: str, game_id: Optional[str], host: Optional[str]):
+        """Set the current game for an agent connected here, hosted by another worker."""
+        self._set_game(agent_id, game_id)
+        if game_id:
+            self.game_hosts[agent_id] = host
+        else:
+            self.game_hosts.pop(agent_id, None)
+    
+    def _set_game(self, agent_id: str, game_id: Optional[str]):
+        if game_id:
+            self.agent_games[agent_id] = game_id
+        else:
+            self.agent_games.pop(agent_id, None)
+        
         conn = self.agents.get(agent_id)
         if conn:
             conn.current_game_id = game_id
     
     def get_agent_game(self, agent_id: str) -> Optional[str]:
         """Get the current game for an agent."""
-        conn = self.agents.get(agent_id)
-        return conn.current_game_id if conn else None
+        return self.agent_games.get(agent_id)
 
 
 # Global connection manager instance
@@ -0,0 +1,266 @@
+"""
+One spectator socket for many games: /watch, with no game ID.
+
+Clients send
+    
+    {"action": "subscribe", "game_ids": [...]}
+    {"action": "unsubscribe", "game_ids": [...]}
+    {"action": "feed", "category": "blitz", "count": 8}   follow the top games (count 0: stop)
+    {"action": "snapshot", "game_id": ...}
+    {"action": "ping"}
+
+and get each game's spectator events, as on /watch/{game_id}, with a
+game_id field added. A feed keeps the socket subscribed to the live games
+of a category with the highest average Elo, re-ranked every
+spectator_feed_interval seconds; each change comes as a feed event
+listing them. Games drop out of a socket's subscriptions once they end.
+
+The socket has one outbox and one receive loop however many games it
+follows; each game only adds a GameView in the manager's spectators.
+"""
+
+import asyncio
+import heapq
+from typing import Dict, List, Optional, Set, Tuple
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from ..config import get_settings
+from ..game_engine import ChessGame
+from .lobby import count_spectators
+from .manager import Message, create_outbox, manager
+from .outbox import Outbox
+from .play import active_games
+from .protocol import (
+    UNSUPPORTED_PROTOCOL_CODE, FrameEncoder, last_message, parse_protocol, receive_message, tag,
+    unsupported_protocol_error,
+)
+from .spectator import find_game, join_frame, leave_game, request_join_frame
+
+CATEGORIES = ("bullet", "blitz", "rapid")
+
+# (category, count) -> sockets following that feed
+feeds: Dict[Tuple[str, int], Set["MultiSpectator"]] = {}
+feed_task: Optional[asyncio.Task] = None
+
+
+class GameView:
+    """One game on a multi-game socket: what the manager sends that game's events through."""
+    
+    __slots__ = ("spectator", "game_id", "game", "encoder")
+    
+    def __init__(self, spectator: "MultiSpectator", game_id: str, game: Optional[ChessGame]):
+        self.spectator = spectator
+        self.game_id = game_id
+        self.game = game  # If it runs here
+        self.encoder = FrameEncoder(spectator.outbox.encoder.protocol)
+    
+    def send(self, message: Message, state: bool = False) -> bool:
+        """Queue a message of this game, tagged with its ID. Returns False as Outbox.put() does."""
+        if not state and self.is_game_end(message):
+            self.spectator.ended(self.game_id)
+        frame, snapshot = self.encoder.encode(message)
+        return self.spectator.outbox.put(tag(frame, self.game_id), state, snapshot, self.game_id)
+    
+    def discard(self):
+        """Nothing to stop: the socket's outbox outlives the games it follows."""
+    
+    async def close(self, code: int = 1000, reason: str = ""):
+        """Close the whole socket (Outbox.close() only acts on the first of its games to ask)."""
+        await self.spectator.outbox.close(code, reason)
+    
+    @staticmethod
+    def is_game_end(message: Message) -> bool:
+        decoded = message if isinstance(message, dict) else last_message.decode(message)
+        return decoded.get("event") == "game_end"
+
+
+class MultiSpectator:
+    """A spectator socket following several games, some picked by the client and some by a feed."""
+    
+    def __init__(self, websocket: WebSocket, outbox: Outbox):
+        self.websocket = websocket
+        self.outbox = outbox
+        self.views: Dict[str, GameView] = {}
+        
+        # Games subscribed to by ID, which a feed never unsubscribes
+        self.pinned: Set[str] = set()
+        self.feed: Optional[Tuple[str, int]] = None
+        self.feed_games: List[str] = []
+        self.closed = False
+        
+        # Unsubscribes from ended games still running (the loop only keeps weak references to tasks)
+        self._leaving: Set[asyncio.Task] = set()
+    
+    async def subscribe(self, game_id: str, pinned: bool = True):
+        if pinned:
+            self.pinned.add(game_id)
+        if game_id in self.views or self.closed:
+            return
+        
+        game, live = await find_game(game_id)
+        if game_id in self.views or self.closed:
+            return  # Subscribed (by the feed, or the client) or closed while looking for the game
+        
+        settings = get_settings()
+        if len(self.views) >= settings.spectator_max_games:
+            self.outbox.send({
+                "event": "error",
+                "game_id": game_id,
+                "message": f"Following too many games (max {settings.spectator_max_games})",
+            })
+            return
+        
+        if not live:
+            self.pinned.discard(game_id)
+            self.outbox.send({"event": "error", "game_id": game_id, "message": "Game not found or has ended"})
+            return
+        
+        view = self.views[game_id] = GameView(self, game_id, game)
+        
+        # About one queued frame per game followed on top of the usual limit
+        self.outbox.limit = settings.send_queue_limit + len(self.views)
+        manager.add_spectator(self.websocket, game_id, view)
+        if game:
+            count_spectators(game)
+            view.send(join_frame(game), state=True)
+        else:
+            request_join_frame(self.websocket, game_id)
+    
+    async def unsubscribe(self, game_id: str):
+        self.pinned.discard(game_id)
+        view = self.views.pop(game_id, None)
+        if view:
+            await leave_game(self.websocket, game_id, view.game)
+    
+    def ended(self, game_id: str):
+        """A game followed here sent its game_end: stop following it once that is queued."""
+        if game_id in self.views:
+            task = asyncio.create_task(self.unsubscribe(game_id))
+            self._leaving.add(task)
+            task.add_done_callback(self._leaving.discard)
+    
+    def snapshot(self, game_id: str):
+        view = self.views.get(game_id)
+        if view is None:
+            self.outbox.send({"event": "error", "game_id": game_id, "message": "Not subscribed to this game"})
+        elif view.game:
+            view.send(view.game.get_state_frame({"game_id": game_id}), state=True)
+        else:
+            request_join_frame(self.websocket, game_id)
+    
+    async def set_feed(self, category: Optional[str], count: int):
+        """Follow the top count games of a category (count 0: stop following a feed)."""
+        if self.feed:
+            feeds[self.feed].discard(self)
+            if not feeds[self.feed]:
+                del feeds[self.feed]
+            self.feed = None
+        
+        if count:
+            self.feed = (category, count)
+            feeds.setdefault(self.feed, set()).add(self)
+            start_feeds()
+            await self.follow_feed(await top_games(category, count))
+        else:
+            await self.follow_feed([])
+    
+    async def follow_feed(self, game_ids: List[str]):
+        """Follow the feed's current games in place of its previous ones."""
+        if game_ids == self.feed_games:
+            return
+        previous, self.feed_games = self.feed_games, game_ids
+        for game_id in previous:
+            if game_id not in game_ids and game_id not in self.pinned:
+                await self.unsubscribe(game_id)
+        for game_id in game_ids:
+            await self.subscribe(game_id, pinned=False)
+        if self.feed:
+            self.outbox.send({"event": "feed", "category": self.feed[0], "game_ids": game_ids})
+    
+    async def close(self):
+        self.closed = True
+        await self.set_feed(None, 0)
+        for game_id in list(self.views):
+            await self.unsubscribe(game_id)
+        self.outbox.discard()
+
+
+async def top_games(category: str, count: int) -> List[str]:
+    """IDs of the live games in a category with the highest average Elo, best first."""
+    if manager.relay is not None:
+        return await manager.relay.top_games(category, count)
+    games = (game for game in active_games.values() if game.category == category)
+    return [game.game_id for game in heapq.nlargest(count, games, key=lambda game: game.average_elo)]
+
+
+def start_feeds():
+    global feed_task
+    if feed_task is None or feed_task.done():
+        feed_task = asyncio.create_task(run_feeds())
+
+
+async def run_feeds():
+    """Re-rank each followed feed, while any is followed."""
+    while feeds:
+        await asyncio.sleep(get_settings().spectator_feed_interval)
+        for feed, spectators in list(feeds.items()):
+            game_ids = await top_games(*feed)
+            for spectator in list(spectators):
+                await spectator.follow_feed(game_ids)
+
+
+async def handle_multi_spectator(websocket: WebSocket):
+    """Handle a spectator connection following several games."""
+    protocol = parse_protocol(websocket.query_params.get("protocol"))
+    if protocol is None:
+        await websocket.accept()
+        await websocket.send_json(unsupported_protocol_error())
+        await websocket.close(code=UNSUPPORTED_PROTOCOL_CODE)
+        return
+    
+    await websocket.accept()
+    spectator = MultiSpectator(websocket, create_outbox(websocket, protocol))
+    
+    try:
+        while True:
+            try:
+                data = await receive_message(websocket)
+            except WebSocketDisconnect:
+                break
+            
+            action = data.get("action")
+            
+            if action == "subscribe":
+                for game_id in data.get("game_ids") or []:
+                    await spectator.subscribe(str(game_id))
+            
+            elif action == "unsubscribe":
+                for game_id in data.get("game_ids") or []:
+                    await spectator.unsubscribe(str(game_id))
+            
+            elif action == "feed":
+                category = data.get("category")
+                count = data.get("count", 0)
+                if category not in CATEGORIES or not isinstance(count, int) or count < 0:
+                    spectator.outbox.send({
+                        "event": "error",
+                        "message": "A feed needs a category (bullet, blitz or rapid) and a count"
+                    })
+                else:
+                    await spectator.set_feed(category, min(count, get_settings().spectator_max_games))
+            
+            elif action == "snapshot":
+                spectator.snapshot(str(data.get("game_id")))
+            
+            elif action == "ping":
+                spectator.outbox.send({"event": "pong"})
+            
+            else:
+                spectator.outbox.send({
+                    "event": "error",
+                    "message": f"Unknown action: {action}"
+                })
+    
+    finally:
+        await spectator.close()
@@ -0,0 +1,138 @@
+"""Bounded per-websocket send queues, each drained by its own writer task."""
+
+import asyncio
+from collections import deque
+from typing import Deque, Optional, Tuple, Union
+
+from fastapi import WebSocket
+
+from .protocol import JSON, Frame, FrameEncoder
+
+
+# What to do when a consumer's queue is full
+DISCONNECT = "disconnect"  # Close the socket; the client reconnects and gets a fresh state
+COALESCE = "coalesce"  # Keep only the newest state frame queued, then disconnect if still full
+
+# Close code for consumers that fell too far behind
+SLOW_CONSUMER_CODE = 4008
+
+# Seconds to wait for queued frames to go out before closing a socket
+CLOSE_TIMEOUT = 2.0
+
+
+class Outbox:
+    """
+    Outbound frames for one websocket.
+    
+    put() never waits: frames are queued and written by the outbox's own
+    task, so a slow socket only ever delays itself. Past `limit` queued
+    frames the consumer is handled by `policy`. Under COALESCE, a state
+    frame replaces a state frame that is still queued (each is a full
+    snapshot, so the newest is all a lagging consumer needs); on delta
+    protocols a snapshot replaces the queued snapshot and move events alike.
+    Sockets watching several games coalesce each game's frames separately.
+    """
+    
+    def __init__(self, websocket: WebSocket, limit: int, policy: str = DISCONNECT, protocol: str = JSON):
+        self.websocket = websocket
+        self.limit = limit
+        self.policy = policy
+        self.encoder = FrameEncoder(protocol)
+        self.closed = False
+        
+        # (frame, the game of a state frame: "" on single-game sockets, None if not a state frame)
+        self._frames: Deque[Tuple[Frame, Optional[str]]] = deque()
+        self._ready = asyncio.Event()
+        self._task = asyncio.create_task(self._write_loop())
+        
+        # Closing an evicted socket (kept, as the loop only holds weak references to tasks)
+        self._closing: Optional[asyncio.Task] = None
+    
+    def __len__(self) -> int:
+        return len(self._frames)
+    
+    def send(self, message: Union[dict, str], state: bool = False) -> bool:
+        """Queue a message (a dict or JSON text) in the socket's protocol. Returns False as put() does."""
+        frame, snapshot = self.encoder.encode(message)
+        return self.put(frame, state, snapshot)
+    
+    def put(self, text: Frame, state: bool = False, snapshot: bool = True, game_id: str = "") -> bool:
+        """
+        Queue a frame. Returns False if the consumer is gone (or was just dropped for being slow).
+        
+        state marks frames of game state; snapshot, those that stand on their own;
+        game_id, the game they are for on sockets watching several.
+        """
+        if self.closed:
+            return False
+        
+        if state and snapshot and self.policy == COALESCE and self._frames:
+            self._frames = deque(frame for frame in self._frames if frame[1] != game_id)
+        
+        if len(self._frames) >= self.limit:
+            self.evict()
+            return False
+        
+        self._frames.append((text, game_id if state else None))
+        self._ready.set()
+        return True
+    
+    def evict(self, code: int = SLOW_CONSUMER_CODE, reason: str = "Too slow"):
+        """Close right away, dropping whatever is queued (by default: a consumer that fell too far behind)."""
+        self._shutdown()
+        if self._closing is None:
+            self._closing = asyncio.create_task(self._close_socket(code, reason))
+    
+    async def close(self, code: int = 1000, reason: str = ""):
+        """Send what is queued (for up to CLOSE_TIMEOUT), then close the socket."""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            await asyncio.wait_for(self._drained(), CLOSE_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+        self._shutdown()
+        await self._close_socket(code, reason)
+    
+    def discard(self):
+        """Stop writing, without closing the socket (it is already gone)."""
+        self._shutdown()
+        if self._closing is not None:
+            self._closing.cancel()
+    
+    def _shutdown(self):
+        self.closed = True
+        self._frames.clear()
+        self._task.cancel()
+    
+    async def _drained(self):
+        while self._frames and not self._task.done():
+            await asyncio.sleep(0.01)
+    
+    async def _close_socket(self, code: int, reason: str):
+        try:
+            await asyncio.wait_for(self.websocket.close(code=code, reason=reason), CLOSE_TIMEOUT)
+        except Exception:
+            pass
+    
+    async def _write_loop(self):
+        try:
+            while True:
+                while not self._frames:
+                    self._ready.clear()
+                    await self._ready.wait()
+                text, _ = self._frames[0]
+                if isinstance(text, bytes):
+                    await self.websocket.send_bytes(text)
+                else:
+                    await self.websocket.send_text(text)
+                # Only dequeued once sent, so close() can wait for it
+                if self._frames and self._frames[0][0] is text:
+                    self._frames.popleft()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # The socket is gone; the receive side cleans the connection up
+            self.closed = True
+            self._frames.clear()
@@ -4,23 +4,37 @@ import asyncio
 import json
 import random
 import time
+import chess
 from typing import Optional, Dict
 from datetime import datetime
 from fastapi import WebSocket, WebSocketDisconnect
 
+from . import leaderboard_feed, lobby
+from .lobby import count_spectators
 from .manager import manager
-from ..matchmaking import matchmaking, MatchResult, Seeker
+from ..matchmaking import matchmaking, MatchResult, Seeker, SeekStatus
+from ..matchmaking_service import MatchmakingClient, MatchmakingError
 from ..game_engine import ChessGame, GameStatus, GameResult, Termination
 from ..rate_limiter import rate_limiter
 from ..elo import calculate_elo_change, apply_elo_floor
 from ..database import get_db
+from ..config import get_settings
+from ..scheduler import DeadlineScheduler
+from ..journal import journal, load_journal, game_records, JournaledGame
+from ..rankings import FIELDS as RANKING_FIELDS
 
 
 # Active games: game_id -> ChessGame
 active_games: Dict[str, ChessGame] = {}
 
-# Disconnect monitoring task
-disconnect_monitor_task: Optional[asyncio.Task] = None
+# Clock flags and disconnect forfeits: (game_id, "flag") / (game_id, "forfeit", color) -> deadline
+deadlines = DeadlineScheduler()
+
+# Set while handing state over to the next process; no new seeks or moves are taken
+draining = False
+
+# When each hot game last sent its spectators a state frame (deadlines clock)
+spectator_frame_at: Dict[str, float] = {}
 
 
 async def authenticate_agent(websocket: WebSocket) -> Optional[dict]:
@@ -57,8 +71,14 @@ async def authenticate_agent(websocket: WebSocket) -> Optional[dict]:
     return None
 
 
-async def handle_seek(agent_id: str, agent_name: str, category: str, elo: int) -> dict:
-    """Handle a seek request."""
+async def handle_seek(agent_id: str, agent_name: str, category: str, elo: int) -> Optional[dict]:
+    """Handle a seek request. Returns None if it was matched at once (the match event says so)."""
+    if draining:
+        return {
+            "event": "error",
+            "message": "Server is restarting, reconnect and seek again"
+        }
+    
     # Check rate limit
     can_seek, reason, retry_after = rate_limiter.check_can_seek(agent_id, category)
     if not can_seek:
@@ -83,7 +103,16 @@ async def handle_seek(agent_id: str, agent_name: str, category: str, elo: int) -
         }
     
     # Add to queue
-    seeker = await matchmaking.add_seeker(agent_id, agent_name, elo, category)
+    try:
+        seeker = await matchmaking.add_seeker(agent_id, agent_name, elo, category)
+    except MatchmakingError as e:
+        return {
+            "event": "error",
+            "message": str(e)
+        }
+    
+    if seeker.status == SeekStatus.MATCHED:
+        return None
     
     return {
         "event": "queued",
@@ -111,6 +140,12 @@ async def handle_cancel_seek(agent_id: str, category: str) -> dict:
 
 async def handle_move(agent_id: str, move: str) -> Optional[dict]:
     """Handle a move request. Returns error dict if move fails, None on success."""
+    host = manager.game_hosts.get(agent_id)
+    if host:
+        # The game runs on another worker, which reports any error itself
+        matchmaking.route(host, {"type": "move", "agent_id": agent_id, "move": move})
+        return None
+    
     game_id = manager.get_agent_game(agent_id)
     if not game_id or game_id not in active_games:
         return {
@@ -120,6 +155,12 @@ async def handle_move(agent_id: str, move: str) -> Optional[dict]:
     
     game = active_games[game_id]
     
+    if draining:
+        return {
+            "event": "error",
+            "message": "Server is restarting, reconnect to continue the game"
+        }
+    
     # Check if it's this agent's turn
     if not game.is_agent_turn(agent_id):
         return {
@@ -131,19 +172,29 @@ async def handle_move(agent_id: str, move: str) -> Optional[dict]:
     success, error = game.make_move(move)
     
     if not success:
+        if game.status == GameStatus.ENDED:
+            await end_game(game)  # Flagged before the move arrived
         return {
             "event": "error",
             "message": error or "Invalid move"
         }
     
-    # Broadcast state update
-    state = game.get_state_dict()
-    state["event"] = "state"
+    schedule_flag(game)
+    journal.record_move(game_id, move, game.clock.white_time, game.clock.black_time)
     
+    # Broadcast state update; spectators of a hot game get the latest state at a capped rate instead
+    count_spectators(game)
+    coalesce = game.spectator_count >= get_settings().spectator_coalesce_threshold
     await manager.broadcast_to_game(
-        game_id, state,
-        game.white_agent_id, game.black_agent_id
+        game_id, game.get_state_frame(),
+        game.white_agent_id, game.black_agent_id,
+        legal_moves_message=game.get_state_frame(legal_moves=True) if game.status == GameStatus.ACTIVE else None,
+        first_id=game.black_agent_id if agent_id == game.white_agent_id else game.white_agent_id,
+        state=True,
+        spectators=not coalesce,
     )
+    if coalesce:
+        schedule_spectator_frame(game)
     
     # Check if game ended
     if game.status == GameStatus.ENDED:
@@ -156,7 +207,7 @@ async def create_game(match: MatchResult):
     """Create a new game from a match."""
     import secrets
     
-    game_id = secrets.token_urlsafe(12)
+    game_id = match.game_id or secrets.token_urlsafe(12)
     
     # Randomly assign colors
     if random.random() < 0.5:
@@ -171,14 +222,16 @@ async def create_game(match: MatchResult):
         game_id=game_id,
         white_agent_id=white_id,
         black_agent_id=black_id,
-        category=match.category
+        category=match.category,
+        pgn_clock_comments=get_settings().pgn_clock_comments,
+        average_elo=(white_elo + black_elo) / 2,
     )
     
     active_games[game_id] = game
     
     # Update connection state
-    manager.set_agent_game(white_id, game_id)
-    manager.set_agent_game(black_id, game_id)
+    manager.set_agent_game(white_id, game_id, (game.category, game.average_elo))
+    manager.set_agent_game(black_id, game_id, (game.category, game.average_elo))
     
     # Save to database
     async with get_db() as db:
@@ -195,6 +248,12 @@ async def create_game(match: MatchResult):
     
     # Start the game
     game.start()
+    schedule_flag(game)
+    await lobby.game_started(game)
+    journal.record_start(
+        game_id, white_id, black_id, match.category,
+        game.started_at.isoformat(), game.pgn_clock_comments,
+    )
     
     # Get time control info
     tc = game.clock
@@ -204,14 +263,17 @@ async def create_game(match: MatchResult):
     }
     
     # Send game_start to both players
-    await manager.send_to_agent(white_id, {
+    white_start = {
         "event": "game_start",
         "game_id": game_id,
         "color": "white",
         "opponent": {"id": black_id, "name": black_name, "elo": black_elo},
         "fen": game.get_fen(),
         "time_control": time_control
-    })
+    }
+    if manager.wants_legal_moves(white_id):
+        white_start["legal_moves"] = list(game.get_legal_moves())
+    await manager.send_to_agent(white_id, white_start)
     
     await manager.send_to_agent(black_id, {
         "event": "game_start",
@@ -229,6 +291,34 @@ async def end_game(game: ChessGame):
     """End a game and update ratings."""
     game_id = game.game_id
     
+    # Only finalize once, whichever of move/flag/forfeit got here first
+    if active_games.get(game_id) is not game:
+        return
+    del active_games[game_id]
+    
+    deadlines.cancel((game_id, "flag"))
+    deadlines.cancel((game_id, "forfeit", chess.WHITE))
+    deadlines.cancel((game_id, "forfeit", chess.BLACK))
+    
+    try:
+        await record_result(game)
+    finally:
+        # Even if the result could not be recorded, the players are free to play again
+        manager.remote_spectators.pop(game_id, None)
+        lobby.game_ended(game_id)
+        manager.set_agent_game(game.white_agent_id, None)
+        manager.set_agent_game(game.black_agent_id, None)
+
+
+async def record_result(game: ChessGame):
+    """Rate a game that just left active_games, store it and tell everyone how it ended."""
+    game_id = game.game_id
+    
+    # Spectators of a hot game still get the final position before game_end
+    if deadlines.cancel((game_id, "spectators")):
+        await send_spectator_frame(game)
+    spectator_frame_at.pop(game_id, None)
+    
     # Get Elos before
     async with get_db() as db:
         cursor = await db.execute(
@@ -352,6 +442,17 @@ async def end_game(game: ChessGame):
         )
         
         await db.commit()
+        
+        # Both players' rows as written, for the leaderboards kept in memory
+        cursor = await db.execute(
+            f"SELECT {', '.join(RANKING_FIELDS)} FROM agents WHERE id IN (?, ?)",
+            (game.white_agent_id, game.black_agent_id),
+        )
+        rows = [dict(row) for row in await cursor.fetchall()]
+    
+    leaderboard_feed.ratings_changed(rows)
+    
+    journal.record_end(game_id)
     
     # Send game_end to both players
     result_str = game.result.value if game.result else "unknown"
@@ -384,28 +485,21 @@ async def end_game(game: ChessGame):
         "black_elo_change": black_change
     })
     
-    # Clean up
-    manager.set_agent_game(game.white_agent_id, None)
-    manager.set_agent_game(game.black_agent_id, None)
-    del active_games[game_id]
-    
     print(f"Game {game_id} ended: {result_str} by {termination_str}")
 
 
 async def handle_agent_disconnect(agent_id: str):
     """Handle an agent disconnecting."""
     game_id = manager.get_agent_game(agent_id)
+    host = manager.game_hosts.get(agent_id)
     
-    if game_id and game_id in active_games:
+    if host:
+        matchmaking.route(host, {"type": "disconnect", "agent_id": agent_id})
+    elif game_id and game_id in active_games:
         game = active_games[game_id]
         
         # Record disconnect time
-        if agent_id == game.white_agent_id:
-            game.white_disconnect_time = time.time()
-            game.white_connected = False
-        else:
-            game.black_disconnect_time = time.time()
-            game.black_connected = False
+        mark_disconnected(game, chess.WHITE if agent_id == game.white_agent_id else chess.BLACK)
         
         # Notify opponent
         opponent_id = game.black_agent_id if agent_id == game.white_agent_id else game.white_agent_id
@@ -415,28 +509,72 @@ async def handle_agent_disconnect(agent_id: str):
     
     # Remove from matchmaking queues
     await matchmaking.remove_all_seeks(agent_id)
+    if isinstance(matchmaking, MatchmakingClient):
+        matchmaking.agent_disconnected(agent_id)
+
+
+async def handle_agent_connect(agent_id: str, legal_moves: bool):
+    """With a shared matchmaking service, find out which worker runs the agent's game, if any."""
+    if not isinstance(matchmaking, MatchmakingClient):
+        return
+    
+    game_id, host = await matchmaking.agent_connected(agent_id, legal_moves)
+    if host and host != matchmaking.worker_id:
+        manager.set_remote_game(agent_id, game_id, host)
+    elif agent_id in manager.game_hosts:
+        manager.set_remote_game(agent_id, None, None)
+
+
+async def handle_snapshot(agent_id: str) -> Optional[dict]:
+    """Send an agent the full state of its game, for clients that lost track of the position."""
+    game_id = manager.get_agent_game(agent_id)
+    host = manager.game_hosts.get(agent_id)
+    
+    if host:
+        matchmaking.route(host, {"type": "snapshot", "agent_id": agent_id})
+    elif game_id and game_id in active_games:
+        await manager.send_to_agent(agent_id, active_games[game_id].get_state_frame(
+            legal_moves=manager.wants_legal_moves(agent_id)
+        ), state=True)
+    else:
+        return {
+            "event": "error",
+            "message": "Not in a game"
+        }
+    return None
 
 
 async def handle_agent_reconnect(agent_id: str):
     """Handle an agent reconnecting."""
     game_id = manager.get_agent_game(agent_id)
+    host = manager.game_hosts.get(agent_id)
     
-    if game_id and game_id in active_games:
+    if host:
+        matchmaking.route(host, {"type": "reconnect", "agent_id": agent_id})
+    elif game_id and game_id in active_games:
         game = active_games[game_id]
         
         # Clear disconnect time
         if agent_id == game.white_agent_id:
             game.white_disconnect_time = None
             game.white_connected = True
+            color = chess.WHITE
         else:
             game.black_disconnect_time = None
             game.black_connected = True
+            color = chess.BLACK
+        
+        deadlines.cancel((game_id, "forfeit", color))
+        
+        # A recovered or handed-over game holds the clock until the player to move is back
+        if game.clock.last_move_time is None and game.clock.active_color == color and game.status == GameStatus.ACTIVE:
+            game.clock.start()
+            schedule_flag(game)
         
         # Send current state
-        state = game.get_state_dict()
-        state["event"] = "state"
-        state["reconnected"] = True
-        await manager.send_to_agent(agent_id, state)
+        await manager.send_to_agent(agent_id, game.get_state_frame(
+            {"reconnected": True}, legal_moves=manager.wants_legal_moves(agent_id)
+        ), state=True)
         
         # Notify opponent
         opponent_id = game.black_agent_id if agent_id == game.white_agent_id else game.white_agent_id
@@ -445,51 +583,145 @@ async def handle_agent_reconnect(agent_id: str):
         })
 
 
-async def disconnect_monitor():
-    """Monitor disconnected players and forfeit after timeout."""
-    DISCONNECT_TIMEOUT = 120  # 2 minutes
+def mark_disconnected(game: ChessGame, color: chess.Color):
+    """Record a player as disconnected and start their forfeit countdown."""
+    if color == chess.WHITE:
+        game.white_disconnect_time = time.time()
+        game.white_connected = False
+    else:
+        game.black_disconnect_time = time.time()
+        game.black_connected = False
     
-    while True:
-        try:
-            now = time.time()
-            games_to_end = []
-            
-            for game_id, game in active_games.items():
-                if game.status != GameStatus.ACTIVE:
-                    continue
-                
-                # Check white disconnect
-                if game.white_disconnect_time:
-                    if now - game.white_disconnect_time >= DISCONNECT_TIMEOUT:
-                        games_to_end.append((game, True))  # True = white disconnected
-                        continue
-                
-                # Check black disconnect
-                if game.black_disconnect_time:
-                    if now - game.black_disconnect_time >= DISCONNECT_TIMEOUT:
-                        games_to_end.append((game, False))  # False = black disconnected
-                        continue
-                
-                # Also check for timeout (clock ran out)
-                timed_out = game.clock.is_timeout()
-                if timed_out is not None:
-                    game._end_by_timeout(timed_out)
-                    games_to_end.append((game, None))  # None = timeout, not disconnect
-            
-            for game, white_disconnected in games_to_end:
-                if white_disconnected is not None:
-                    import chess
-                    color = chess.WHITE if white_disconnected else chess.BLACK
-                    game.end_by_disconnect(color)
-                await end_game(game)
-            
-            await asyncio.sleep(1)  # Check every second
-            
-        except asyncio.CancelledError:
-            break
-        except Exception as e:
-            print(f"Disconnect monitor error: {e}")
-            await asyncio.sleep(1)
+    game_id = game.game_id
+    deadlines.schedule_in(
+        (game_id, "forfeit", color),
+        get_settings().disconnect_forfeit_time,
+        lambda: on_forfeit_deadline(game_id, color),
+    )
+
+
+def schedule_spectator_frame(game: ChessGame):
+    """Send a hot game's spectators its latest state, at most spectator_max_fps times a second."""
+    key = (game.game_id, "spectators")
+    if key in deadlines:
+        return  # The pending frame will pick this move up
+    
+    interval = 1 / get_settings().spectator_max_fps
+    delay = spectator_frame_at.get(game.game_id, float("-inf")) + interval - deadlines.clock()
+    deadlines.schedule_in(key, max(delay, 0.0), lambda: send_spectator_frame(game))
+
+
+async def send_spectator_frame(game: ChessGame):
+    spectator_frame_at[game.game_id] = deadlines.clock()
+    await manager.broadcast_to_spectators(game.game_id, game.get_state_frame(), state=True)
+
+
+def schedule_flag(game: ChessGame):
+    """(Re)schedule the flag deadline for the player to move."""
+    remaining = game.clock.time_until_flag()
+    if remaining is None or game.status != GameStatus.ACTIVE:
+        return
+    game_id = game.game_id
+    deadlines.schedule_in((game_id, "flag"), remaining, lambda: on_flag_deadline(game_id))
+
+
+async def on_flag_deadline(game_id: str):
+    """Called when the player to move should have run out of time."""
+    game = active_games.get(game_id)
+    if not game or game.status != GameStatus.ACTIVE:
+        return
+    
+    timed_out = game.clock.is_timeout()
+    if timed_out is None:
+        # Woke up a hair early (the game clock uses wall time)
+        schedule_flag(game)
+        return
+    
+    game._end_by_timeout(timed_out)
+    await end_game(game)
+
+
+async def on_forfeit_deadline(game_id: str, color: chess.Color):
+    """Called when a disconnected player has been gone for too long."""
+    game = active_games.get(game_id)
+    if not game or game.status != GameStatus.ACTIVE:
+        return
+    
+    game.end_by_disconnect(color)
+    await end_game(game)
+
+
+def journal_snapshot() -> list[dict]:
+    """Journal records recreating every active game (for compaction)."""
+    records = []
+    for game in active_games.values():
+        records.extend(game_records(
+            game.game_id, game.white_agent_id, game.black_agent_id, game.category,
+            game.started_at.isoformat() if game.started_at else None,
+            game.pgn_clock_comments, game.moves,
+            game.clock.white_time, game.clock.black_time, game.move_clocks,
+        ))
+    return records
+
+
+def restore_game(record: JournaledGame) -> Optional[ChessGame]:
+    """Rebuild a recorded game and register it, with both players disconnected."""
+    game = ChessGame(
+        game_id=record.game_id,
+        white_agent_id=record.white_agent_id,
+        black_agent_id=record.black_agent_id,
+        category=record.category,
+        pgn_clock_comments=record.pgn_clock_comments,
+    )
+    
+    if not all(game.replay_move(m, c) for m, c in zip(record.moves, record.clocks)):
+        return None
+    
+    game.resume(datetime.fromisoformat(record.started_at) if record.started_at else None)
+    active_games[game.game_id] = game
+    manager.set_agent_game(game.white_agent_id, game.game_id, (game.category, game.average_elo))
+    manager.set_agent_game(game.black_agent_id, game.game_id, (game.category, game.average_elo))
+    
+    # Nobody is connected yet; both sides get the usual time to come back
+    mark_disconnected(game, chess.WHITE)
+    mark_disconnected(game, chess.BLACK)
+    return game
+
+
+async def abort_game(game_id: str):
+    """End the row of a recorded game that could not be rebuilt, so it isn't left active."""
+    print(f"Could not replay recorded game {game_id}, aborting it")
+    async with get_db() as db:
+        await db.execute(
+            "UPDATE games SET status = 'ended', termination = ?, ended_at = ? WHERE id = ? AND status = 'active'",
+            (Termination.ABORTED.value, datetime.utcnow().isoformat(), game_id)
+        )
+        await db.commit()
+
+
+async def recover_games(path: str):
+    """Rebuild games that were still running when the process last stopped."""
+    recovered = []
+    
+    for record in load_journal(path).values():
+        if record.game_id in active_games:
+            continue  # Already handed over with exact clocks
+        
+        # The clock starts again, and the flag is scheduled, when the player to move reconnects
+        game = restore_game(record)
+        if game:
+            recovered.append(game)
+        else:
+            await abort_game(record.game_id)
+    
+    for game in recovered:
+        if game.status == GameStatus.ENDED:
+            await end_game(game)
+        else:
+            await lobby.game_started(game)
+    
+    if recovered:
+        print(f"Recovered {len(recovered)} active games from the journal")
 
 
 async def on_match_found(match: MatchResult):
@@ -506,29 +738,80 @@ async def on_search_widened(seeker: Seeker, elo_range: list):
     })
 
 
+async def on_seek_dropped(seeker: Seeker):
+    """Callback when the matchmaking service loses a seek (it restarted or lost this worker)."""
+    await manager.send_to_agent(seeker.agent_id, {
+        "event": "seek_cancelled",
+        "category": seeker.category
+    })
+
+
+async def handle_routed(event: dict):
+    """
+    Handle an event from another worker: from the worker holding the connection
+    of a player in a game hosted here, or about spectators on either end.
+    """
+    if event["type"] in ("watchers", "spectate"):
+        from .spectator import handle_remote_spectators
+        await handle_remote_spectators(event)
+        return
+    
+    agent_id = event["agent_id"]
+    if event["type"] == "move":
+        error = await handle_move(agent_id, event["move"])
+        if error:
+            await manager.send_to_agent(agent_id, error)
+    elif event["type"] == "disconnect":
+        await handle_agent_disconnect(agent_id)
+    elif event["type"] == "reconnect":
+        await handle_agent_reconnect(agent_id)
+    elif event["type"] == "snapshot":
+        error = await handle_snapshot(agent_id)
+        if error:
+            await manager.send_to_agent(agent_id, error)
+
+
 def setup_matchmaking():
     """Set up matchmaking callbacks."""
     matchmaking.on_match = on_match_found
     matchmaking.on_widening = on_search_widened
+    settings = get_settings()
+    matchmaking.batch_interval = settings.matchmaking_batch_interval
+    matchmaking.adaptive_widening = settings.matchmaking_adaptive_widening
+    
+    if isinstance(matchmaking, MatchmakingClient):
+        matchmaking.on_dropped = on_seek_dropped
+        matchmaking.on_route = handle_routed
+        matchmaking.on_deliver = manager.deliver_to_agent
+        matchmaking.on_assign = manager.set_remote_game
+        matchmaking.on_lobby = lobby.on_lobby
+        matchmaking.on_ratings = leaderboard_feed.on_ratings
+        matchmaking.on_connected = leaderboard_feed.on_connected
+        manager.relay = matchmaking
 
 
 async def start_background_tasks():
     """Start background tasks."""
-    global disconnect_monitor_task
+    settings = get_settings()
+    
+    await deadlines.start()
+    
+    if settings.handoff_path:
+        from .handoff import take_over
+        await take_over(settings.handoff_path, settings.handoff_max_age)
+    
+    if settings.journal_path:
+        await recover_games(settings.journal_path)
+        await journal.open(settings.journal_path, settings.journal_fsync, settings.journal_compact_bytes)
+        journal.snapshot_source = journal_snapshot
+        await journal.compact(journal_snapshot())
     
     setup_matchmaking()
     await matchmaking.start()
-    disconnect_monitor_task = asyncio.create_task(disconnect_monitor())
 
 
 async def stop_background_tasks():
     """Stop background tasks."""
-    global disconnect_monitor_task
-    
     await matchmaking.stop()
-    if disconnect_monitor_task:
-        disconnect_monitor_task.cancel()
-        try:
-            await disconnect_monitor_task
-        except asyncio.CancelledError:
-            pass
+    await deadlines.stop()
+    await journal.close()
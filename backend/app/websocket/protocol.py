@@ -0,0 +1,196 @@
+"""
+Wire protocols, chosen per connection with ?protocol= on /play and /watch.
+    
+    json     every event as JSON text, state events carrying the full position (the default)
+    delta    after one full state event, each move as a move event: the move, the ply it
+             reached and both clocks (plus legal_moves for agents that asked for them)
+    msgpack  as delta, with every event sent as a binary msgpack frame
+
+A delta connection gets a full state event (a snapshot) whenever a move
+event would not follow on from what it was last sent: on connecting, after
+frames were skipped, and when the client asks for one with a `snapshot`
+action after losing track of the position.
+"""
+
+from typing import Dict, Optional, Tuple, Union
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from ..encoding import dumps, loads
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+JSON = "json"
+DELTA = "delta"
+MSGPACK = "msgpack"
+PROTOCOLS = (JSON, DELTA, MSGPACK)
+
+# Close code for a protocol this server cannot speak
+UNSUPPORTED_PROTOCOL_CODE = 4002
+
+# Every state event starts with this (see ChessGame.get_state_frame)
+STATE_PREFIX = '{"event":"state",'
+
+Frame = Union[str, bytes]
+
+
+def supported_protocols() -> Tuple[str, ...]:
+    """The protocols this server can speak (msgpack only with the msgpack package installed)."""
+    return tuple(p for p in PROTOCOLS if p != MSGPACK or msgpack is not None)
+
+
+def parse_protocol(value: Optional[str]) -> Optional[str]:
+    """The protocol named by a query parameter (JSON if none), or None if unsupported here."""
+    protocol = (value or JSON).lower()
+    if protocol not in supported_protocols():
+        return None
+    return protocol
+
+
+def unsupported_protocol_error() -> dict:
+    return {"event": "error", "message": f"Unsupported protocol. Use: {', '.join(supported_protocols())}"}
+
+
+def state_ply(state: dict) -> int:
+    """Half-moves played, from a state event's move_number and to_move."""
+    return 2 * (state["move_number"] - 1) + (state["to_move"] == "black")
+
+
+class LastMessage:
+    """
+    The last pre-encoded message a delta connection was given, decoded and re-encoded.
+    
+    A broadcast hands every socket the same string, so keeping just the last
+    one means it is parsed and re-encoded once, not once per spectator.
+    """
+    
+    def __init__(self):
+        self.source: Optional[str] = None
+        self.message: dict = {}
+        self.frames: Dict[Tuple[str, str], Frame] = {}
+    
+    def decode(self, source: str) -> dict:
+        if source is not self.source:
+            self.source = source
+            self.message = loads(source)
+            self.frames = {}
+        return self.message
+    
+    def frame(self, kind: str, protocol: str) -> Frame:
+        """The message as a full ("snapshot") or "move" event in a protocol's framing."""
+        key = (kind, protocol)
+        if key not in self.frames:
+            if kind == "move":
+                self.frames[key] = encode(move_event(self.message), protocol)
+            elif protocol == MSGPACK:
+                self.frames[key] = encode(self.message, protocol)
+            else:
+                self.frames[key] = self.source
+        return self.frames[key]
+
+
+def move_event(state: dict) -> dict:
+    """The move event for a state event: the move, the ply it reached and both clocks."""
+    event = {
+        "event": "move",
+        "ply": state_ply(state),
+        "move": state["last_move"],
+        "clock_white": state["clock_white"],
+        "clock_black": state["clock_black"],
+    }
+    if "legal_moves" in state:
+        event["legal_moves"] = state["legal_moves"]
+    return event
+
+
+def encode(message: dict, protocol: str) -> Frame:
+    """A message in a protocol's framing."""
+    if protocol == MSGPACK:
+        return msgpack.packb(message)
+    return dumps(message)
+
+
+class FrameEncoder:
+    """Turns outbound messages into frames for one connection, tracking the ply it was last sent."""
+    
+    __slots__ = ("protocol", "ply")
+    
+    def __init__(self, protocol: str = JSON):
+        self.protocol = protocol
+        self.ply: Optional[int] = None
+    
+    def encode(self, message: Union[dict, str]) -> Tuple[Frame, bool]:
+        """Encode a dict or pre-encoded JSON text. Returns the frame and whether it is a full snapshot."""
+        if self.protocol == JSON:
+            return (message if isinstance(message, str) else dumps(message)), True
+        
+        if isinstance(message, str):
+            decoded = last_message.decode(message)
+            if message.startswith(STATE_PREFIX):
+                return self._state(decoded)
+            event = decoded.get("event")
+            frame = last_message.frame("snapshot", self.protocol)
+        else:
+            event = message.get("event")
+            frame = encode(message, self.protocol)
+        
+        # Move events follow on from the game's starting position
+        if event == "game_start":
+            self.ply = 0
+        elif event == "game_end":
+            self.ply = None
+        return frame, False
+    
+    def _state(self, state: dict) -> Tuple[Frame, bool]:
+        ply = state_ply(state)
+        follows = self.ply is not None and ply == self.ply + 1 and state["last_move"] is not None
+        self.ply = ply
+        if follows:
+            return last_message.frame("move", self.protocol), False
+        return last_message.frame("snapshot", self.protocol), True
+
+
+def tag(frame: Frame, game_id: str) -> Frame:
+    """
+    A frame with the game's ID added, for sockets watching several games.
+    
+    A broadcast hands every socket the same frame, so the last one tagged
+    is kept and reused.
+    """
+    global last_tagged
+    if last_tagged[0] is frame and last_tagged[1] == game_id:
+        return last_tagged[2]
+    
+    if isinstance(frame, bytes):
+        message = msgpack.unpackb(frame)
+        message.setdefault("game_id", game_id)
+        tagged = msgpack.packb(message)
+    elif '"game_id":' in frame:
+        tagged = frame
+    else:
+        tagged = f'{frame[:-1]},"game_id":{dumps(game_id)}}}'
+    
+    last_tagged = (frame, game_id, tagged)
+    return tagged
+
+
+async def receive_message(websocket: WebSocket) -> dict:
+    """Receive a client message: JSON text, or a msgpack binary frame."""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    if message.get("bytes") is not None:
+        if msgpack is None:
+            raise ValueError("Binary frames need msgpack")
+        return msgpack.unpackb(message["bytes"])
+    return loads(message["text"])
+
+
+last_message = LastMessage()
+
+# (frame, game_id, tagged frame) from the last tag() call
+last_tagged: Tuple[Optional[Frame], str, Frame] = (None, "", "")
@@ -1,16 +1,46 @@
 """WebSocket handler for spectators."""
 
-from fastapi import WebSocket, WebSocketDisconnect
+from typing import Optional, Tuple
 
-from .manager import manager
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from ..game_engine import ChessGame
+from .lobby import count_spectators
+from .manager import encode_message, manager
 from .play import active_games
+from .protocol import UNSUPPORTED_PROTOCOL_CODE, parse_protocol, receive_message, unsupported_protocol_error
+from .sse import GameStream, parse_last_event_id, sse_response
+
+
+def join_frame(game: ChessGame) -> str:
+    """The state event a spectator gets first: the position, and who is playing what."""
+    return game.get_state_frame({
+        "game_id": game.game_id,
+        "white_agent_id": game.white_agent_id,
+        "black_agent_id": game.black_agent_id,
+        "category": game.category,
+        "spectator_count": game.spectator_count,
+    })
+
+
+async def find_game(game_id: str) -> Tuple[Optional[ChessGame], bool]:
+    """The game if it runs here, and whether it is live here or on another worker."""
+    
+    # Games run on one worker each; the others forward their frames
+    game = active_games.get(game_id)
+    host = None
+    if game is None and manager.relay is not None:
+        host = await manager.relay.locate(game_id)
+    return game, game is not None or host is not None
 
 
 async def handle_spectator(websocket: WebSocket, game_id: str):
     """Handle a spectator connection."""
+    game, live = await find_game(game_id)
     
     # Check if game exists
-    if game_id not in active_games:
+    if not live:
         await websocket.accept()
         await websocket.send_json({
             "event": "error",
@@ -19,35 +49,145 @@ async def handle_spectator(websocket: WebSocket, game_id: str):
         await websocket.close()
         return
     
-    game = active_games[game_id]
+    protocol = parse_protocol(websocket.query_params.get("protocol"))
+    if protocol is None:
+        await websocket.accept()
+        await websocket.send_json(unsupported_protocol_error())
+        await websocket.close(code=UNSUPPORTED_PROTOCOL_CODE)
+        return
     
     # Connect spectator
-    await manager.connect_spectator(websocket, game_id)
+    outbox = await manager.connect_spectator(websocket, game_id, protocol)
     
     try:
         # Send current state
-        state = game.get_state_dict()
-        state["event"] = "state"
-        state["game_id"] = game_id
-        state["white_agent_id"] = game.white_agent_id
-        state["black_agent_id"] = game.black_agent_id
-        state["category"] = game.category
-        state["spectator_count"] = manager.get_spectator_count(game_id)
-        
-        await websocket.send_json(state)
+        if game:
+            count_spectators(game)
+            outbox.send(join_frame(game), state=True)
+        else:
+            request_join_frame(websocket, game_id)
         
         # Keep connection alive and handle messages
         while True:
             try:
-                # Just keep the connection alive, spectators don't send meaningful messages
-                data = await websocket.receive_json()
+                # Spectators only send pings and snapshot requests
+                data = await receive_message(websocket)
                 
                 # Handle ping/pong
                 if data.get("action") == "ping":
-                    await websocket.send_json({"event": "pong"})
-                    
+                    outbox.send({"event": "pong"})
+                
+                # Full state for clients that lost track of the position
+                elif data.get("action") == "snapshot":
+                    if game:
+                        outbox.send(game.get_state_frame({"game_id": game_id}), state=True)
+                    else:
+                        request_join_frame(websocket, game_id)
+            
             except WebSocketDisconnect:
                 break
-                
+    
     finally:
-        await manager.disconnect_spectator(websocket, game_id)
+        await leave_game(websocket, game_id, game)
+
+
+async def leave_game(websocket: WebSocket, game_id: str, game: Optional[ChessGame]):
+    """Stop sending a game's events to a spectator socket (game: the game, if it runs here)."""
+    await manager.disconnect_spectator(websocket, game_id)
+    if game:
+        count_spectators(game)
+    else:
+        manager.joining.get(game_id, set()).discard(websocket)
+        manager.relay.watch(game_id, manager.get_spectator_count(game_id), joined=False)
+        if game_id not in manager.spectators:
+            manager.joining.pop(game_id, None)
+
+
+async def handle_spectator_events(game_id: str, last_event_id: Optional[str]) -> StreamingResponse:
+    """Handle a Server-Sent Events spectator: a read-only stream of the game's spectator events."""
+    game = active_games.get(game_id)
+    if game_id not in manager.streams:
+        game, live = await find_game(game_id)
+        if not live:
+            raise HTTPException(status_code=404, detail="Game not found or has ended")
+    
+    async def events():
+        # Set up once streaming starts, so a client gone before then leaves nothing behind
+        stream = manager.streams.get(game_id)
+        if stream is None:
+            stream = manager.streams[game_id] = GameStream(game_id)
+            if game:
+                stream.publish(join_frame(game), state=True)
+        
+        stream.viewers += 1
+        count_viewers(game, game_id, joined=stream.state is None)
+        try:
+            async for chunk in stream.follow(parse_last_event_id(last_event_id)):
+                yield chunk
+        finally:
+            stream.viewers -= 1
+            if not stream.viewers and manager.streams.get(game_id) is stream:
+                del manager.streams[game_id]
+            count_viewers(game, game_id, joined=False)
+    
+    return sse_response(events())
+
+
+def count_viewers(game: Optional[ChessGame], game_id: str, joined: bool):
+    """Update a game's spectator count after a Server-Sent Events viewer came or went."""
+    if game:
+        count_spectators(game)
+    elif manager.relay is not None:
+        manager.relay.watch(game_id, manager.get_spectator_count(game_id), joined=joined)
+
+
+def request_join_frame(websocket: WebSocket, game_id: str):
+    """Ask the worker hosting a game for a spectator's first frame."""
+    manager.joining.setdefault(game_id, set()).add(websocket)
+    manager.relay.watch(game_id, manager.get_spectator_count(game_id), joined=True)
+
+
+async def handle_remote_spectators(event: dict):
+    """
+    Handle spectators of a game watched on one worker and hosted on another.
+    
+    The host keeps a spectator count per watching worker and publishes every
+    frame once, for the matchmaking service to pass to each of them
+    ("spectate"); "joined" frames go only to the spectators waiting for
+    their first frame.
+    """
+    game_id = event["game_id"]
+    
+    if event["type"] == "watchers":
+        game = active_games.get(game_id)
+        if game is None:
+            message = {"event": "error", "message": "Game not found or has ended"}
+        else:
+            counts = manager.remote_spectators.setdefault(game_id, {})
+            if event["count"]:
+                counts[event["worker"]] = event["count"]
+            else:
+                counts.pop(event["worker"], None)
+                if not counts:
+                    del manager.remote_spectators[game_id]
+            count_spectators(game)
+            message = join_frame(game)
+        
+        if event["joined"]:
+            manager.relay.route(event["worker"], {
+                "type": "spectate", "game_id": game_id, "message": message, "state": True, "joined": True,
+            })
+    
+    elif event.get("joined"):
+        stream = manager.streams.get(game_id)
+        if stream and stream.state is None:
+            stream.publish(encode_message(event["message"]), state=isinstance(event["message"], str))
+        
+        spectators = manager.spectators.get(game_id, {})
+        for websocket in manager.joining.pop(game_id, set()):
+            outbox = spectators.get(websocket)
+            if outbox:
+                outbox.send(event["message"], state=True)
+    
+    else:
+        await manager.broadcast_to_spectators(game_id, event["message"], event["state"])
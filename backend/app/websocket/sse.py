@@ -0,0 +1,193 @@
+"""
+Server-Sent Events for spectators: GET /watch/{game_id}/events.
+
+Each watched game keeps one GameStream: its recent spectator events, each
+encoded once as an SSE chunk that every viewer is handed as is. A viewer
+has no send queue of its own; one that falls behind the buffer skips
+ahead to the latest state. Events carry increasing IDs, so a reconnecting
+browser resumes after its Last-Event-ID (or from the latest state, if
+that is no longer buffered).
+
+On servers implementing ASGI HTTP 2.4, which raise OSError from send()
+once the client is gone, a viewer is just the coroutine sending its
+response. Older servers drop such sends silently, so there each viewer
+also has a task waiting for the disconnect. Either way a viewer holds
+less memory than a spectator websocket, but costs about as much CPU per
+event: one wake-up and one send (see benchmarks/bench_sse.py).
+
+The lobby (GET /games/live/events) and leaderboard windows are more such
+streams. end_streams() ends them all, so a draining or stopping server
+isn't held up by viewers that would otherwise stay connected forever.
+"""
+
+import asyncio
+import weakref
+from collections import deque
+from itertools import islice
+from typing import AsyncIterator, Deque, Optional, Tuple
+
+from fastapi.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from ..encoding import loads
+from .protocol import STATE_PREFIX
+
+# Events kept per game for viewers catching up or resuming
+STREAM_BUFFER = 32
+
+# Seconds between keep-alive comments while a game is quiet (and how soon a gone viewer is noticed)
+KEEPALIVE_INTERVAL = 15.0
+
+# Milliseconds browsers wait before reconnecting
+RETRY_MS = 1000
+
+# Every stream, for end_streams(); set once they have all been ended
+all_streams: "weakref.WeakSet[GameStream]" = weakref.WeakSet()
+streams_ended = False
+
+
+class GameStream:
+    """Recent spectator events of one game, as SSE chunks shared by all its viewers."""
+    
+    def __init__(self, game_id: str):
+        self.game_id = game_id
+        self.viewers = 0
+        self.ended = False
+        
+        # (event id, chunk), oldest first; ids increase by one
+        self.events: Deque[Tuple[int, bytes]] = deque(maxlen=STREAM_BUFFER)
+        self.last_id = 0
+        
+        # The latest state event, where new viewers (and ones too far behind) start
+        self.state: Optional[bytes] = None
+        
+        # Viewers wait on one event, and one timer per game wakes them all for keep-alives
+        self._published = asyncio.Event()
+        self._keepalive: Optional[asyncio.TimerHandle] = None
+        all_streams.add(self)
+    
+    def publish(self, text: str, state: bool = False):
+        """Add an event (JSON text) for every viewer; a game_end or error event is the last."""
+        self.last_id += 1
+        chunk = f"id: {self.last_id}\ndata: {text}\n\n".encode()
+        self.events.append((self.last_id, chunk))
+        if state or text.startswith(STATE_PREFIX):
+            self.state = chunk
+        elif loads(text).get("event") in ("game_end", "error"):
+            self.ended = True
+        self._wake()
+    
+    def _wake(self):
+        """Wake every viewer, and restart the keep-alive timer while there are any."""
+        self._published.set()
+        self._published = asyncio.Event()
+        if self._keepalive:
+            self._keepalive.cancel()
+            self._keepalive = None
+        if self.viewers and not self.ended:
+            self._keepalive = asyncio.get_running_loop().call_later(KEEPALIVE_INTERVAL, self._wake)
+    
+    def end(self):
+        """End every viewer's stream once it has sent what is buffered."""
+        self.ended = True
+        self._wake()
+    
+    def restate(self, text: str):
+        """Replace the state new viewers start from, without sending it to current ones."""
+        self.state = f"id: {self.last_id}\ndata: {text}\n\n".encode()
+    
+    async def follow(self, last_event_id: Optional[int] = None) -> AsyncIterator[bytes]:
+        """The chunks for one viewer: resumed after last_event_id if still buffered, else from the latest state."""
+        if streams_ended:
+            return
+        
+        # Where to start, taken together with the state before anything is sent
+        first_id = self.events[0][0] if self.events else self.last_id + 1
+        state = None
+        if last_event_id is not None and first_id - 1 <= last_event_id <= self.last_id:
+            cursor = last_event_id
+        else:
+            cursor = self.last_id
+            state = self.state
+        
+        yield f"retry: {RETRY_MS}\n\n".encode()
+        if state:
+            yield state
+        
+        if self._keepalive is None:
+            self._wake()
+        
+        while True:
+            if cursor == self.last_id:
+                if self.ended:
+                    return
+                await self._published.wait()
+                if cursor == self.last_id:
+                    yield b": keep-alive\n\n"
+                continue
+            
+            first_id = self.events[0][0]
+            if cursor < first_id - 1:
+                # Fell behind the buffer: skip to the latest state
+                cursor = self.last_id
+                if self.state:
+                    yield self.state
+                continue
+            
+            # Ids are consecutive, so the events not yet sent are the buffer's tail
+            for event_id, chunk in list(islice(self.events, cursor - first_id + 1, None)):
+                cursor = event_id
+                yield chunk
+
+
+def parse_last_event_id(value: Optional[str]) -> Optional[int]:
+    """The Last-Event-ID header as an event id, if it is one."""
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+def end_streams():
+    """End every event stream, and any started from now on (the server is going away)."""
+    global streams_ended
+    streams_ended = True
+    for stream in list(all_streams):
+        stream.end()
+
+
+class EventStreamResponse(StreamingResponse):
+    """A viewer's event stream, sent without a disconnect listener where the server allows it."""
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        spec_version = tuple(map(int, scope.get("asgi", {}).get("spec_version", "2.0").split(".")))
+        watcher = None
+        if spec_version < (2, 4):
+            watcher = asyncio.create_task(self._watch(receive, asyncio.current_task()))
+        
+        try:
+            await self.stream_response(send)
+        except OSError:
+            pass  # The viewer is gone
+        except asyncio.CancelledError:
+            if watcher is None or watcher.cancelled() or not watcher.done():
+                raise
+            asyncio.current_task().uncancel()  # The viewer is gone (see _watch)
+        finally:
+            if watcher:
+                watcher.cancel()
+            await self.body_iterator.aclose()
+    
+    @staticmethod
+    async def _watch(receive: Receive, task: asyncio.Task):
+        """Stop sending once the client disconnects (servers before ASGI HTTP 2.4)."""
+        while (await receive())["type"] != "http.disconnect":
+            pass
+        task.cancel()
+
+
+def sse_response(body: AsyncIterator[bytes]) -> StreamingResponse:
+    return EventStreamResponse(body, media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # Don't let nginx hold events back
+    })
@@ -0,0 +1,95 @@
+"""
+Compare greedy (match on insert) and batch (NumPy) matchmaking on the same arrivals.
+
+Streams Poisson seek arrivals with a skewed Elo distribution into one
+category on a virtual clock, for both modes. Greedy matches each seeker
+the moment it arrives; batch pairs the whole queue once per --interval.
+Reports the Elo gap of the pairs, time to match and the CPU spent per
+batch pass (or on the arrivals of one interval, for greedy).
+
+Usage (from backend/):
+    python -m benchmarks.bench_batch_matching [--rates 20 200 2000] [--seconds 120] [--interval 1]
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from app.matchmaking import MatchmakingQueue
+
+
+def percentile(values: list, p: float) -> float:
+    return values[min(int(len(values) * p), len(values) - 1)] if values else 0.0
+
+
+async def simulate(batch: bool, rate: float, seconds: float, interval: float, seed: int) -> dict:
+    rng = random.Random(seed)
+    now = 0.0
+    mm = MatchmakingQueue(clock=lambda: now)
+    mm.batch_interval = interval if batch else 0.0
+    
+    gaps, waits = [], []
+    make_match = mm._make_match
+    
+    def record(category, seeker1, seeker2):
+        gaps.append(abs(seeker1.elo - seeker2.elo))
+        waits.append(seeker1.get_wait_time(now))
+        waits.append(seeker2.get_wait_time(now))
+        make_match(category, seeker1, seeker2)
+    mm._make_match = record
+    
+    cpu = []
+    next_arrival = rng.expovariate(rate)
+    agent = 0
+    while now < seconds:
+        tick_end = now + interval
+        start = time.process_time()
+        
+        while next_arrival < tick_end:
+            now = next_arrival
+            mm.timers.run_due(now)
+            elo = int(rng.gauss(1200, 250)) if rng.random() < 0.9 else rng.randint(100, 2800)
+            await mm.add_seeker(f"agent{agent}", "", max(elo, 100), "blitz")
+            agent += 1
+            next_arrival += rng.expovariate(rate)
+        
+        now = tick_end
+        mm.timers.run_due(now)
+        if batch:
+            mm.match_batch("blitz")
+        
+        cpu.append(time.process_time() - start)
+    
+    gaps.sort()
+    waits.sort()
+    return {
+        "matches": len(gaps),
+        "gap_mean": statistics.mean(gaps) if gaps else 0.0,
+        "gap_p90": percentile(gaps, 0.9),
+        "wait_p50": percentile(waits, 0.5),
+        "wait_p90": percentile(waits, 0.9),
+        "left": len(mm.queues["blitz"]),
+        "cpu_ms": statistics.mean(cpu) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rates", type=float, nargs="+", default=[20, 200, 2000], help="Seeks per second")
+    parser.add_argument("--seconds", type=float, default=120)
+    parser.add_argument("--interval", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    
+    for rate in args.rates:
+        for label, batch in (("greedy", False), ("batch", True)):
+            r = asyncio.run(simulate(batch, rate, args.seconds, args.interval, args.seed))
+            print(f"{label:>7} {rate:>6.0f}/s: {r['matches']:>7} matches, gap mean {r['gap_mean']:>6.1f} "
+                  f"p90 {r['gap_p90']:>4}, wait p50 {r['wait_p50']:>5.2f}s p90 {r['wait_p90']:>5.2f}s, "
+                  f"{r['left']:>3} left, CPU {r['cpu_ms']:>7.2f} ms per {args.interval:g}s")
+
+
+if __name__ == "__main__":
+    main()
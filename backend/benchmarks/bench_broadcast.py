@@ -0,0 +1,120 @@
+"""
+Benchmark the cost of broadcasting one event to spectators.
+
+Times delivering a move state frame and a game_end event (with the full
+PGN of a 120-ply game) to N spectators, reported per 1000 spectators:
+
+    per-socket json   every socket encodes the dict itself (send_json), in turn
+    once, json        encoded once with the standard library, then queued per socket
+    once, fast        encoded once with orjson (if installed), then queued per socket
+
+The sockets are in-memory stand-ins, so this is the server's own cost of a
+broadcast: encoding, queueing and the writer tasks handing frames over.
+
+Usage (from backend/):
+    python -m benchmarks.bench_broadcast [--spectators 1000 10000] [--rounds 20]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from app import encoding
+from app.game_engine import ChessGame
+from app.websocket.manager import ConnectionManager
+
+
+class CountingSocket:
+    """Websocket stand-in that counts the frames handed to it."""
+    
+    delivered = 0
+    
+    async def accept(self):
+        pass
+    
+    async def close(self, code: int = 1000, reason: str = ""):
+        pass
+    
+    async def send_text(self, text: str):
+        CountingSocket.delivered += 1
+    
+    async def send_json(self, data):
+        await self.send_text(json.dumps(data, separators=(",", ":"), ensure_ascii=False))
+
+
+def sample_events(seed: int) -> dict:
+    """A mid-game state event and a game_end event, as dicts."""
+    rng = random.Random(seed)
+    game = ChessGame(game_id="bench", white_agent_id="w", black_agent_id="b", category="blitz")
+    game.start()
+    for _ in range(120):
+        moves = list(game.board.legal_moves)
+        if not moves:
+            break
+        game.make_move(rng.choice(moves).uci())
+    state = json.loads(game.get_state_frame({"spectator_count": 1000}))
+    game_end = {
+        "event": "game_end",
+        "game_id": game.game_id,
+        "result": "1-0",
+        "termination": "resignation",
+        "pgn": game.get_pgn(),
+        "elo_changes": {"white": {"before": 1432, "after": 1441}, "black": {"before": 1418, "after": 1409}},
+    }
+    return {"state": state, "game_end": game_end}
+
+
+async def per_socket_json(manager: ConnectionManager, message: dict):
+    """The original broadcast: send_json (and so json.dumps) on every socket, one after another."""
+    for ws in manager.spectators["game"]:
+        await ws.send_json(message)
+
+
+async def run(n: int, message: dict, mode: str, rounds: int) -> float:
+    """Seconds per broadcast to n spectators, delivery included."""
+    manager = ConnectionManager()
+    for _ in range(n):
+        outbox = await manager.connect_spectator(CountingSocket(), "game")
+        outbox.limit = rounds + 1
+    
+    start = time.perf_counter()
+    for _ in range(rounds):
+        target = CountingSocket.delivered + n
+        if mode == "per-socket json":
+            await per_socket_json(manager, message)
+        elif mode == "once, json":
+            await manager.broadcast_to_spectators("game", json.dumps(message, separators=(",", ":"), ensure_ascii=False))
+        else:
+            await manager.broadcast_to_spectators("game", message)
+        while CountingSocket.delivered < target:
+            await asyncio.sleep(0)
+    elapsed = (time.perf_counter() - start) / rounds
+    
+    for outbox in manager.spectators["game"].values():
+        outbox.discard()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--spectators", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    
+    events = sample_events(args.seed)
+    fast = "orjson" if encoding.orjson else "json (orjson not installed)"
+    for name, message in events.items():
+        size = len(encoding.dumps(message))
+        for n in args.spectators:
+            for mode in ("per-socket json", "once, json", "once, fast"):
+                seconds = asyncio.run(run(n, message, mode, args.rounds))
+                print(f"{name:>8} ({size:>5} bytes) {n:>6} spectators, {mode:<15}: "
+                      f"{seconds * 1000 / n * 1000:>7.3f} ms per 1000 spectators")
+    print(f"fast encoder: {fast}")
+
+
+if __name__ == "__main__":
+    main()
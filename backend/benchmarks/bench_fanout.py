@@ -0,0 +1,118 @@
+"""
+Benchmark move-to-opponent latency against spectator count.
+
+Broadcasts move frames to a game with N spectators, some of them on slow
+links (each send to them takes --slow-ms), and measures how long the
+opponent waits for the frame and how long the broadcast call itself takes
+(the moving player's handler, and so its next move, waits that long). The
+legacy broadcast awaited every socket in turn; the queued one hands each
+socket's frames to its own writer task.
+
+Usage (from backend/):
+    python -m benchmarks.bench_fanout [--spectators 0 100 1000 10000] [--slow 0.05] [--slow-ms 50]
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from app.websocket.manager import ConnectionManager, encode_message
+
+
+class FakeSocket:
+    """Websocket stand-in; a slow one takes delay seconds per send."""
+    
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.received_at = None
+        self.frames = 0
+    
+    async def accept(self):
+        pass
+    
+    async def close(self, code: int = 1000, reason: str = ""):
+        pass
+    
+    async def send_text(self, text: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.frames += 1
+        self.received_at = time.perf_counter()
+    
+    async def send_json(self, data):
+        await self.send_text(encode_message(data))
+
+
+async def legacy_broadcast(manager: ConnectionManager, game_id: str, message, white_id: str, black_id: str):
+    """The previous broadcast_to_game: every socket awaited in turn."""
+    message = encode_message(message)
+    for agent_id in (white_id, black_id):
+        await manager.agents[agent_id].websocket.send_text(message)
+    for ws in manager.spectators.get(game_id, {}):
+        await ws.send_text(message)
+
+
+async def run(spectators: int, slow: float, slow_ms: float, moves: int, legacy: bool, seed: int) -> dict:
+    rng = random.Random(seed)
+    manager = ConnectionManager()
+    white, black = FakeSocket(), FakeSocket()
+    await manager.connect_agent(white, "white", "white")
+    await manager.connect_agent(black, "black", "black")
+    for _ in range(spectators):
+        await manager.connect_spectator(FakeSocket(slow_ms / 1000 if rng.random() < slow else 0.0), "game")
+    
+    frame = {"event": "state", "fen": "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1", "pgn": "1. e4 *"}
+    latencies, calls = [], []
+    for _ in range(moves):
+        black.received_at = None
+        start = time.perf_counter()
+        if legacy:
+            await legacy_broadcast(manager, "game", frame, "white", "black")
+        else:
+            await manager.broadcast_to_game("game", frame, "white", "black", first_id="black", state=True)
+        calls.append(time.perf_counter() - start)
+        while black.received_at is None:
+            await asyncio.sleep(0)
+        latencies.append(black.received_at - start)
+        # Moves arrive a little apart, as in a real game
+        await asyncio.sleep(0.005)
+    
+    left = len(manager.spectators.get("game", {}))
+    for outboxes in manager.spectators.values():
+        for outbox in outboxes.values():
+            outbox.discard()
+    for conn in manager.agents.values():
+        conn.outbox.discard()
+    
+    return {
+        "latency_ms": statistics.median(latencies) * 1000,
+        "latency_max_ms": max(latencies) * 1000,
+        "call_ms": statistics.median(calls) * 1000,
+        "spectators_left": left,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--spectators", type=int, nargs="+", default=[0, 100, 1000, 10000])
+    parser.add_argument("--slow", type=float, default=0.05, help="Fraction of spectators on slow links")
+    parser.add_argument("--slow-ms", type=float, default=50)
+    parser.add_argument("--moves", type=int, default=20)
+    parser.add_argument("--legacy-max", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    
+    for n in args.spectators:
+        for label, legacy in (("queued", False), ("legacy", True)):
+            if legacy and n > args.legacy_max:
+                continue
+            r = asyncio.run(run(n, args.slow, args.slow_ms, args.moves, legacy, args.seed))
+            print(f"{label:>7} {n:>6} spectators: opponent gets the move in {r['latency_ms']:>8.3f} ms "
+                  f"(max {r['latency_max_ms']:>8.3f}), mover blocked {r['call_ms']:>8.3f} ms, "
+                  f"{r['spectators_left']} spectators kept")
+
+
+if __name__ == "__main__":
+    main()
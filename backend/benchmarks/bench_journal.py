@@ -0,0 +1,82 @@
+"""
+Benchmark move throughput with and without the move journal.
+
+Plays random moves in many concurrent games on one event loop, the way
+handle_move does, and records each one in the journal. The journal's writer
+task group-commits in the background, so the difference should be small
+even with fsync enabled.
+
+Usage (from backend/):
+    python -m benchmarks.bench_journal [--games 200] [--plies 60] [--no-fsync]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from app.game_engine import ChessGame, GameStatus
+from app.journal import MoveJournal, load_journal
+
+
+async def play(games: int, plies: int, journal: MoveJournal, seed: int) -> tuple[int, float]:
+    rng = random.Random(seed)
+    active = []
+    for i in range(games):
+        game = ChessGame(f"game{i}", f"w{i}", f"b{i}", "rapid")
+        game.start()
+        journal.record_start(game.game_id, game.white_agent_id, game.black_agent_id, game.category, None)
+        active.append(game)
+    
+    moves = 0
+    start = time.perf_counter()
+    for _ in range(plies):
+        for game in active:
+            if game.status != GameStatus.ACTIVE:
+                continue
+            uci = rng.choice(list(game.get_legal_moves()))
+            game.make_move(uci)
+            journal.record_move(game.game_id, uci, game.clock.white_time, game.clock.black_time)
+            moves += 1
+        # Yield like a real server would between incoming messages
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+    
+    return moves, elapsed
+
+
+async def run(games: int, plies: int, fsync: bool, seed: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.journal")
+        
+        unjournaled = MoveJournal()  # never opened: record() is a no-op
+        moves, base = await play(games, plies, unjournaled, seed)
+        print(f"{'unjournaled':>12}: {moves / base:>9.0f} moves/sec")
+        
+        journal = MoveJournal()
+        await journal.open(path, fsync=fsync)
+        moves, journaled = await play(games, plies, journal, seed)
+        await journal.close()
+        print(f"{'journaled':>12}: {moves / journaled:>9.0f} moves/sec "
+              f"({(journaled / base - 1) * 100:+.1f}% time, fsync={'on' if fsync else 'off'}, "
+              f"{os.path.getsize(path) / moves:.0f} bytes/move)")
+        
+        recovered = load_journal(path)
+        print(f"{'recovery':>12}: {len(recovered)} live games read back")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--plies", type=int, default=60)
+    parser.add_argument("--no-fsync", action="store_true")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    
+    asyncio.run(run(args.games, args.plies, not args.no_fsync, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark the leaderboards: SQLite queries per request vs the in-memory ranks.
+
+Fills a scratch database with --agents agents that have played, then
+times --requests calls of GET /leaderboard/blitz?limit=50 as it used to
+run (a COUNT and an ORDER BY over agents) and as it runs now, and the
+cost of one finished game for a worker: applying both players' new rows
+with --windows leaderboard streams open (top 10s and around-agent
+windows), which is all the polling clients used to re-query for.
+
+Usage (from backend/):
+    python -m benchmarks.bench_leaderboard [--agents 1000 10000] [--requests 500] [--windows 100]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+# The queries GET /leaderboard/{category} ran on every request
+COUNT_QUERY = "SELECT COUNT(*) as count FROM agents WHERE games_played > 0"
+ENTRIES_QUERY = """
+    SELECT id, name, avatar_url, elo_blitz as elo,
+           games_played, wins, losses, draws
+    FROM agents
+    WHERE games_played > 0
+    ORDER BY elo_blitz DESC
+    LIMIT ? OFFSET ?
+"""
+
+
+def setup_database(path: str, agents: int):
+    from app import database
+    database.DATABASE_PATH = path
+    asyncio.run(database.init_db())
+    db = sqlite3.connect(path)
+    db.executemany(
+        "INSERT INTO agents (id, name, moltbook_key_hash, moltchess_api_key, created_at, games_played, elo_blitz)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(f"bot{i}", f"bot{i}", f"hash{i}", f"key{i}", "2026-01-01T00:00:00", 10, random.randint(800, 2400))
+         for i in range(agents)],
+    )
+    db.commit()
+    db.close()
+
+
+async def query_leaderboard() -> dict:
+    from app.database import get_db
+    async with get_db() as db:
+        cursor = await db.execute(COUNT_QUERY)
+        total = (await cursor.fetchone())["count"]
+        cursor = await db.execute(ENTRIES_QUERY, (50, 0))
+        entries = [{"rank": i + 1, **dict(row)} for i, row in enumerate(await cursor.fetchall())]
+        return {"success": True, "category": "blitz", "total": total, "entries": entries}
+
+
+async def run(agents: int, requests: int, windows: int) -> dict:
+    from app.encoding import FastJSONResponse
+    from app.routes.leaderboard import get_leaderboard
+    from app.websocket import leaderboard_feed
+    
+    await leaderboard_feed.ensure_loaded()
+    for i in range(windows):
+        if i % 2:
+            key = ("around", "blitz", f"bot{random.randrange(agents)}", 10)
+        else:
+            key = ("top", "blitz", 10 + i % 5)
+        if key not in leaderboard_feed.windows:
+            leaderboard_feed.windows[key] = leaderboard_feed.Window(key)
+    
+    async def sqlite_request():
+        FastJSONResponse(await query_leaderboard())
+    
+    async def memory_request():
+        FastJSONResponse(await get_leaderboard("blitz", 50, 0))
+    
+    timings = {}
+    for name, request in (("sqlite", sqlite_request), ("memory", memory_request)):
+        start = time.perf_counter()
+        for _ in range(requests):
+            await request()
+        timings[name] = (time.perf_counter() - start) / requests * 1e6
+    
+    # Both players' rows after each of --requests games, made up front
+    latest = dict(leaderboard_feed.rankings.agents)
+    games = []
+    for _ in range(requests):
+        rows = []
+        for agent_id in random.sample(list(latest), 2):
+            row = latest[agent_id] = dict(latest[agent_id])
+            row["elo_blitz"] += random.randint(-16, 16)
+            row["games_played"] += 1
+            rows.append(row)
+        games.append(rows)
+    
+    start = time.perf_counter()
+    for rows in games:
+        leaderboard_feed.on_ratings(rows)
+    timings["game"] = (time.perf_counter() - start) / requests * 1e6
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--windows", type=int, default=100)
+    args = parser.parse_args()
+    
+    os.environ.update(JOURNAL_PATH="")
+    for agents in args.agents:
+        from app.websocket import leaderboard_feed
+        leaderboard_feed.rankings.__init__()
+        leaderboard_feed.windows.clear()
+        setup_database(os.path.join(tempfile.mkdtemp(), "leaderboard.db"), agents)
+        r = asyncio.run(run(agents, args.requests, args.windows))
+        print(f"{agents:>6} agents: SQLite {r['sqlite']:>8.1f} us, in memory {r['memory']:>6.1f} us per request; "
+              f"{r['game']:>6.1f} us per finished game with {args.windows} windows open")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark GET /games/live: the SQLite join it used to run vs the in-memory list.
+
+Fills a scratch database with --games active games (and their agents),
+lists them in the lobby, then times --requests calls of: the join over
+games and agents that /games/live ran on every request, the endpoint now
+(the list encoded once per version), and the endpoint answering a client
+whose ETag is current (304).
+
+Usage (from backend/):
+    python -m benchmarks.bench_lobby [--games 100 1000] [--requests 500]
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+
+# The query /games/live ran on every request
+LIVE_GAMES_QUERY = """
+    SELECT g.id, g.category, g.status, g.started_at,
+           g.white_agent_id, g.black_agent_id,
+           w.name as white_name, w.avatar_url as white_avatar,
+           w.elo_bullet as white_elo_bullet, w.elo_blitz as white_elo_blitz, w.elo_rapid as white_elo_rapid,
+           b.name as black_name, b.avatar_url as black_avatar,
+           b.elo_bullet as black_elo_bullet, b.elo_blitz as black_elo_blitz, b.elo_rapid as black_elo_rapid
+    FROM games g
+    JOIN agents w ON g.white_agent_id = w.id
+    JOIN agents b ON g.black_agent_id = b.id
+    WHERE g.status = 'active'
+    ORDER BY g.started_at DESC
+"""
+
+
+def setup_database(path: str, games: int):
+    from app import database
+    database.DATABASE_PATH = path
+    asyncio.run(database.init_db())
+    db = sqlite3.connect(path)
+    db.executemany(
+        "INSERT INTO agents (id, name, moltbook_key_hash, moltchess_api_key, created_at) VALUES (?, ?, ?, ?, ?)",
+        [(f"bot{i}", f"bot{i}", f"hash{i}", f"key{i}", "2026-01-01T00:00:00") for i in range(2 * games)],
+    )
+    db.executemany(
+        "INSERT INTO games (id, white_agent_id, black_agent_id, category, status, started_at)"
+        " VALUES (?, ?, ?, 'blitz', 'active', ?)",
+        [(f"game{i}", f"bot{2 * i}", f"bot{2 * i + 1}", f"2026-01-01T00:{i // 60 % 60:02}:{i % 60:02}")
+         for i in range(games)],
+    )
+    db.commit()
+    db.close()
+
+
+async def query_live_games() -> dict:
+    from app.database import get_db
+    async with get_db() as db:
+        cursor = await db.execute(LIVE_GAMES_QUERY)
+        result = []
+        for g in await cursor.fetchall():
+            game_dict = dict(g)
+            category = game_dict["category"]
+            game_dict["white_elo"] = game_dict.get(f"white_elo_{category}", 1200)
+            game_dict["black_elo"] = game_dict.get(f"black_elo_{category}", 1200)
+            result.append(game_dict)
+        return {"success": True, "games": result}
+
+
+async def run(games: int, requests: int) -> dict:
+    from app.encoding import FastJSONResponse
+    from app.game_engine import ChessGame
+    from app.routes.games import get_live_games
+    from app.websocket import lobby
+    
+    for i in range(games):
+        game = ChessGame(game_id=f"game{i}", white_agent_id=f"bot{2 * i}", black_agent_id=f"bot{2 * i + 1}",
+                         category="blitz")
+        game.start()
+        await lobby.game_started(game)
+    
+    async def sqlite_request():
+        FastJSONResponse(await query_live_games())
+    
+    etag = lobby.live_games.etag
+    timings = {}
+    for name, request in (
+        ("sqlite", sqlite_request),
+        ("memory", lambda: get_live_games(None)),
+        ("not_modified", lambda: get_live_games(etag)),
+    ):
+        start = time.perf_counter()
+        for _ in range(requests):
+            await request()
+        timings[name] = (time.perf_counter() - start) / requests * 1e6
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+    
+    os.environ.update(JOURNAL_PATH="")
+    for games in args.games:
+        setup_database(os.path.join(tempfile.mkdtemp(), "lobby.db"), games)
+        r = asyncio.run(run(games, args.requests))
+        print(f"{games:>5} live games: SQLite join {r['sqlite']:>8.1f} us, in memory {r['memory']:>6.1f} us, "
+              f"304 {r['not_modified']:>5.1f} us per request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Benchmark matchmaking ticks with large queues.
+
+Dumps N seekers into one category at once (like a bot fleet starting up)
+and times how long it takes to match them, then one more arrival into the
+leftover queue, then queue position lookups and removals. The indexed queue
+matches on insert; the legacy list-backed queue needs a 500 ms tick (its
+O(n^2) pair scan) to do the same, and is run up to --legacy-max seekers.
+
+Usage (from backend/):
+    python -m benchmarks.bench_matchmaking [--sizes 10000 100000] [--legacy-max 10000]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from app.matchmaking import MatchmakingQueue, Seeker, SeekStatus
+
+
+def accepts_each_other(seeker1: Seeker, seeker2: Seeker) -> bool:
+    """The legacy pair test: different agents, each within the other's current Elo range."""
+    if seeker1.agent_id == seeker2.agent_id:
+        return False
+    range1 = seeker1.get_elo_range()
+    range2 = seeker2.get_elo_range()
+    return range1[0] <= seeker2.elo <= range1[1] and range2[0] <= seeker1.elo <= range2[1]
+
+
+class LegacyQueue(MatchmakingQueue):
+    """The previous list-backed queue: O(n^2) pair scan, list.index and list.remove."""
+    
+    def __init__(self):
+        super().__init__()
+        self.queues = {"bullet": [], "blitz": [], "rapid": []}
+    
+    async def add_seeker(self, agent_id, agent_name, elo, category, queued_at=None):
+        seeker = Seeker(agent_id=agent_id, agent_name=agent_name, elo=elo, category=category, band="")
+        self.queues[category].append(seeker)
+        seeker.position = len(self.queues[category])
+        self.seekers_by_agent.setdefault(agent_id, {})[category] = seeker
+        return seeker
+    
+    async def remove_seeker(self, agent_id, category):
+        seeker = self.seekers_by_agent.get(agent_id, {}).pop(category, None)
+        if seeker is None:
+            return False
+        if seeker in self.queues[category]:
+            self.queues[category].remove(seeker)
+        return True
+    
+    def get_queue_position(self, agent_id, category):
+        seeker = self.get_seeker(agent_id, category)
+        if seeker and seeker in self.queues[category]:
+            return self.queues[category].index(seeker) + 1
+        return 0
+    
+    async def _process_queue(self, category):
+        queue = self.queues[category]
+        if len(queue) < 2:
+            return
+        
+        for seeker in queue:
+            wait_time = seeker.get_wait_time()
+            if wait_time >= 60 and seeker.status != SeekStatus.WIDENING_2:
+                seeker.status = SeekStatus.WIDENING_2
+            elif wait_time >= 30 and seeker.status == SeekStatus.SEARCHING:
+                seeker.status = SeekStatus.WIDENING_1
+        
+        matches_to_make = []
+        matched_indices = set()
+        for i, seeker1 in enumerate(queue):
+            if i in matched_indices:
+                continue
+            for j, seeker2 in enumerate(queue):
+                if j <= i or j in matched_indices:
+                    continue
+                if accepts_each_other(seeker1, seeker2):
+                    matches_to_make.append((seeker1, seeker2))
+                    matched_indices.add(i)
+                    matched_indices.add(j)
+                    break
+        
+        # Keep the matched pairs out (the original rebuilt the list once per match)
+        for seeker1, seeker2 in matches_to_make:
+            queue = [s for s in queue if s is not seeker1 and s is not seeker2]
+            for seeker in (seeker1, seeker2):
+                self.seekers_by_agent.get(seeker.agent_id, {}).pop(category, None)
+        self.queues[category] = queue
+
+
+async def settle(mm: MatchmakingQueue):
+    """Run the legacy tick; the indexed queue has already matched on insert."""
+    if isinstance(mm, LegacyQueue):
+        await mm._process_queue("blitz")
+
+
+async def run(cls, n: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    mm = cls()
+    elos = [
+        # Skewed toward the starting rating, with a long tail either side
+        max(int(rng.gauss(1200, 250)) if rng.random() < 0.9 else rng.randint(100, 2800), 100)
+        for _ in range(n)
+    ]
+    
+    start = time.perf_counter()
+    for i, elo in enumerate(elos):
+        await mm.add_seeker(f"agent{i}", f"agent{i}", elo, "blitz")
+    await settle(mm)
+    burst = time.perf_counter() - start
+    left = len(mm.queues["blitz"])
+    
+    start = time.perf_counter()
+    await mm.add_seeker("late", "late", 1200, "blitz")
+    await settle(mm)
+    steady = time.perf_counter() - start
+    
+    # Position lookups and cancels on a full queue (filled without matching)
+    mm = cls()
+    for i in range(n):
+        seeker = Seeker(agent_id=f"agent{i}", agent_name="", elo=rng.randint(100, 2800), category="blitz", band="")
+        if isinstance(mm, LegacyQueue):
+            mm.queues["blitz"].append(seeker)
+        else:
+            mm.queues["blitz"].add(seeker)
+        mm.seekers_by_agent[seeker.agent_id] = {"blitz": seeker}
+    ids = [f"agent{i}" for i in rng.sample(range(n), min(1000, n))]
+    start = time.perf_counter()
+    for agent_id in ids:
+        mm.get_queue_position(agent_id, "blitz")
+    position = (time.perf_counter() - start) / len(ids)
+    start = time.perf_counter()
+    for agent_id in ids:
+        await mm.remove_seeker(agent_id, "blitz")
+    remove = (time.perf_counter() - start) / len(ids)
+    
+    return {"burst": burst, "left": left, "steady": steady, "position": position, "remove": remove}
+
+
+def report(label: str, n: int, r: dict):
+    print(f"{label:>8} n={n:<7} burst {r['burst'] * 1000:>10.1f} ms ({r['left']} left unmatched), "
+          f"next arrival {r['steady'] * 1000:>8.3f} ms, "
+          f"position {r['position'] * 1e6:>8.1f} us, remove {r['remove'] * 1e6:>8.1f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--legacy-max", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    
+    for n in args.sizes:
+        report("indexed", n, asyncio.run(run(MatchmakingQueue, n, args.seed)))
+        if n <= args.legacy_max:
+            report("legacy", n, asyncio.run(run(LegacyQueue, n, args.seed)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark memory held per active game at different game lengths.
+
+Builds a batch of ChessGame objects, plays the same random moves into each
+and measures the allocated bytes with tracemalloc. For comparison it also
+measures the history the old representation kept per game: an untrimmed
+chess.Board move stack plus a list of UCI strings.
+
+Usage (from backend/):
+    python -m benchmarks.bench_memory [--games 500]
+"""
+
+import argparse
+import random
+import tracemalloc
+
+import chess
+
+from app.game_engine import ChessGame
+
+
+def random_line(rng: random.Random, plies: int) -> list[str]:
+    """Random moves for a game that is still running after the given number of plies."""
+    while True:
+        board = chess.Board()
+        moves = []
+        while len(moves) < plies and not board.is_game_over(claim_draw=True):
+            move = rng.choice(list(board.legal_moves))
+            board.push(move)
+            moves.append(move.uci())
+        if not board.is_game_over(claim_draw=True):
+            return moves
+
+
+def measure(build, count: int) -> float:
+    """Return bytes allocated per object built by build()."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [build() for _ in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return (after - before) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    
+    rng = random.Random(args.seed)
+    
+    print(f"{'plies':>6} {'bytes/game':>11} {'games/GB':>10} {'old history bytes':>18}")
+    for plies in (0, 40, 120, 300):
+        line = random_line(rng, plies)
+        
+        def build_game():
+            game = ChessGame("x" * 16, "w" * 36, "b" * 36, "blitz")
+            game.start()
+            for uci in line:
+                game.make_move(uci)
+            return game
+        
+        def build_old_history():
+            board = chess.Board()
+            moves = []
+            for uci in line:
+                board.push(chess.Move.from_uci(uci))
+                moves.append(uci)
+            return board, moves
+        
+        per_game = measure(build_game, args.games)
+        old_history = measure(build_old_history, args.games)
+        print(f"{plies:>6} {per_game:>11.0f} {2**30 / per_game:>10.0f} {old_history:>18.0f}")
+
+
+if __name__ == "__main__":
+    main()
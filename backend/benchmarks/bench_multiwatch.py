@@ -0,0 +1,127 @@
+"""
+Benchmark multi-board spectators: a socket per game vs one socket for all.
+
+Runs --games games in this process, each watched by --screens "TV wall"
+screens: first with one /watch/{game_id} socket per game per screen, then
+with one /watch socket per screen subscribed to every game. Reports the
+connections, tasks and memory the screens hold, and the CPU time to get a
+move in every game to every screen.
+
+Usage (from backend/):
+    python -m benchmarks.bench_multiwatch [--screens 100] [--games 32] [--plies 10]
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import time
+import tracemalloc
+
+
+class CountingSocket:
+    """Websocket stand-in that counts the frames sent to it, and receives what it is told to."""
+    
+    def __init__(self, counter: dict, messages: list = ()):
+        self.query_params = {}
+        self.counter = counter
+        self._inbox = asyncio.Queue()
+        for message in messages:
+            self._inbox.put_nowait({"type": "websocket.receive", "text": json.dumps(message)})
+    
+    async def accept(self):
+        pass
+    
+    async def close(self, code: int = 1000, reason: str = ""):
+        self._inbox.put_nowait({"type": "websocket.disconnect", "code": 1000})
+    
+    async def send_text(self, text: str):
+        self.counter["frames"] += 1
+    
+    async def receive(self):
+        return await self._inbox.get()
+
+
+async def run(multi: bool, screens: int, games: int, plies: int) -> dict:
+    from app.game_engine import ChessGame
+    from app.websocket import play
+    from app.websocket.manager import manager
+    from app.websocket.multiwatch import handle_multi_spectator
+    from app.websocket.spectator import handle_spectator
+    
+    running = []
+    for i in range(games):
+        game = ChessGame(game_id=f"bench{i}", white_agent_id=f"w{i}", black_agent_id=f"b{i}", category="blitz")
+        game.start()
+        play.active_games[game.game_id] = game
+        running.append(game)
+    game_ids = [game.game_id for game in running]
+    counter = {"frames": 0}
+    
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tasks_before = len(asyncio.all_tasks())
+    if multi:
+        sockets = [CountingSocket(counter, [{"action": "subscribe", "game_ids": game_ids}]) for _ in range(screens)]
+        tasks = [asyncio.create_task(handle_multi_spectator(s)) for s in sockets]
+    else:
+        sockets = [CountingSocket(counter) for _ in range(screens * games)]
+        tasks = [asyncio.create_task(handle_spectator(s, game_ids[i % games])) for i, s in enumerate(sockets)]
+    while counter["frames"] < screens * games:
+        await asyncio.sleep(0.01)
+    gc.collect()
+    memory = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    task_count = len(asyncio.all_tasks()) - tasks_before
+    
+    cpu = 0.0
+    for ply in range(plies):
+        target = counter["frames"] + screens * games
+        start = time.process_time()
+        for game in running:
+            game.make_move(next(iter(game.board.legal_moves)).uci())
+            await manager.broadcast_to_game(
+                game.game_id, game.get_state_frame(), game.white_agent_id, game.black_agent_id, state=True,
+            )
+        while counter["frames"] < target:
+            await asyncio.sleep(0)
+        cpu += time.process_time() - start
+    
+    for socket in sockets:
+        await socket.close()
+    await asyncio.gather(*tasks)
+    for game_id in game_ids:
+        del play.active_games[game_id]
+    return {
+        "connections": len(sockets),
+        "tasks": task_count,
+        "memory_kib": memory / screens / 1024,
+        "cpu_ms": cpu / plies * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--screens", type=int, default=100)
+    parser.add_argument("--games", type=int, default=32)
+    parser.add_argument("--plies", type=int, default=10)
+    args = parser.parse_args()
+    
+    os.environ.update(
+        JOURNAL_PATH="",
+        # Every move goes out, however many watch
+        SPECTATOR_COALESCE_THRESHOLD=str(10 ** 9),
+    )
+    
+    print(f"{args.screens} screens watching {args.games} games each:")
+    for multi in (False, True):
+        r = asyncio.run(run(multi, args.screens, args.games, args.plies))
+        kind = "one /watch socket per screen" if multi else "a socket per game"
+        print(f"  {kind:<29}: {r['connections']:>6} connections, {r['tasks']:>6} tasks, "
+              f"{r['memory_kib']:>7.1f} KiB per screen, {r['cpu_ms']:>7.2f} ms CPU per move in every game")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark game finalization: replaying moves into chess.pgn.Game vs. PgnRecorder.
+
+Reports the cost of producing the PGN text at game end for different game
+lengths. The recorder pays its (constant) SAN cost while the game is played,
+so only export() is timed for it.
+
+Usage (from backend/):
+    python -m benchmarks.bench_pgn [--games 200]
+"""
+
+import argparse
+import random
+import time
+
+import chess
+import chess.pgn
+
+from app.pgn import PgnRecorder
+
+
+def random_game(rng: random.Random, plies: int) -> list[chess.Move]:
+    board = chess.Board()
+    moves = []
+    while len(moves) < plies and not board.is_game_over():
+        move = rng.choice(list(board.legal_moves))
+        board.push(move)
+        moves.append(move)
+    return moves
+
+
+def legacy_pgn(moves: list[chess.Move], headers: dict) -> str:
+    game = chess.pgn.Game()
+    for tag, value in headers.items():
+        game.headers[tag] = value
+    node = game
+    for move in moves:
+        node = node.add_variation(move)
+    return str(game)
+
+
+def record(moves: list[chess.Move]) -> PgnRecorder:
+    board = chess.Board()
+    recorder = PgnRecorder()
+    for move in moves:
+        recorder.add_move(board, move)
+        board.push(move)
+    return recorder
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    
+    rng = random.Random(args.seed)
+    headers = {"Event": "MoltChess Arena", "Site": "moltchess.io", "White": "w", "Black": "b", "Result": "1/2-1/2"}
+    
+    print(f"{'plies':>6} {'legacy ms/game':>15} {'recorder ms/game':>17}")
+    for plies in (40, 120, 300, 600):
+        games = [random_game(rng, plies) for _ in range(args.games)]
+        recorders = [record(moves) for moves in games]
+        
+        start = time.perf_counter()
+        for moves in games:
+            legacy_pgn(moves, headers)
+        legacy = (time.perf_counter() - start) / len(games)
+        
+        start = time.perf_counter()
+        for recorder in recorders:
+            recorder.export(headers)
+        incremental = (time.perf_counter() - start) / len(games)
+        
+        print(f"{plies:>6} {legacy * 1000:>15.3f} {incremental * 1000:>17.4f}")
+
+
+if __name__ == "__main__":
+    main()
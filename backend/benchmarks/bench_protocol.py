@@ -0,0 +1,118 @@
+"""
+Benchmark the wire protocols: bytes and client parse time per move.
+
+Plays a random game, sending each move's state event through one socket per
+protocol (json, delta, msgpack; msgpack only if installed), and reports the
+average frame size, how long the client takes to decode a frame, and the
+server's cost of broadcasting a move to --spectators sockets.
+
+Usage (from backend/):
+    python -m benchmarks.bench_protocol [--plies 120] [--spectators 1000]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from app.game_engine import ChessGame
+from app.websocket.manager import ConnectionManager
+from app.websocket.protocol import PROTOCOLS, msgpack, parse_protocol
+
+
+class RecordingSocket:
+    """Websocket stand-in that keeps the frames handed to it."""
+    
+    def __init__(self, keep: bool = True):
+        self.keep = keep
+        self.frames = []
+    
+    async def accept(self):
+        pass
+    
+    async def close(self, code: int = 1000, reason: str = ""):
+        pass
+    
+    async def send_text(self, text: str):
+        if self.keep:
+            self.frames.append(text)
+    
+    async def send_bytes(self, data: bytes):
+        if self.keep:
+            self.frames.append(data)
+
+
+def decode(frame):
+    if isinstance(frame, bytes):
+        return msgpack.unpackb(frame)
+    return json.loads(frame)
+
+
+async def run(protocol: str, plies: int, spectators: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    manager = ConnectionManager()
+    game = ChessGame(game_id="bench", white_agent_id="w", black_agent_id="b", category="bullet")
+    game.start()
+    
+    client = RecordingSocket()
+    outbox = await manager.connect_spectator(client, "bench", protocol)
+    outbox.limit = plies + 2
+    outbox.send(game.get_state_frame({"game_id": "bench"}), state=True)
+    for _ in range(spectators - 1):
+        other = await manager.connect_spectator(RecordingSocket(keep=False), "bench", protocol)
+        other.limit = plies + 2
+    
+    broadcast = 0.0
+    moves = 0
+    for _ in range(plies):
+        legal = list(game.board.legal_moves)
+        if not legal:
+            break
+        game.make_move(rng.choice(legal).uci())
+        frame = game.get_state_frame()
+        start = time.perf_counter()
+        await manager.broadcast_to_spectators("bench", frame, state=True)
+        broadcast += time.perf_counter() - start
+        moves += 1
+        await asyncio.sleep(0)
+    while len(outbox):
+        await asyncio.sleep(0)
+    
+    # The first frame is the snapshot on joining; the rest are moves
+    frames = client.frames[1:]
+    start = time.perf_counter()
+    for _ in range(20):
+        for frame in frames:
+            decode(frame)
+    parse = (time.perf_counter() - start) / 20 / len(frames)
+    
+    for outboxes in manager.spectators.values():
+        for o in outboxes.values():
+            o.discard()
+    
+    return {
+        "bytes": sum(len(f) for f in frames) / len(frames),
+        "parse_us": parse * 1e6,
+        "broadcast_ms": broadcast / moves * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--plies", type=int, default=120)
+    parser.add_argument("--spectators", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    
+    for protocol in PROTOCOLS:
+        if parse_protocol(protocol) is None:
+            print(f"{protocol:>8}: not available")
+            continue
+        r = asyncio.run(run(protocol, args.plies, args.spectators, args.seed))
+        print(f"{protocol:>8}: {r['bytes']:>6.1f} bytes per move, client decodes in {r['parse_us']:>5.2f} us, "
+              f"broadcast to {args.spectators} spectators {r['broadcast_ms']:>6.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
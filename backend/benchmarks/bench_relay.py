@@ -0,0 +1,188 @@
+"""
+Benchmark the CPU a game's worker spends on spectators, local vs on relays.
+
+Runs one game in this process (the worker hosting it) and plays --plies
+moves, --interval seconds apart, to --spectators spectators: first all
+connected to this process, then split over --relays spectator relay
+processes subscribed through the matchmaking service. Reports this
+process's CPU time per move, and how many frames the spectators got.
+
+Usage (from backend/):
+    python -m benchmarks.bench_relay [--spectators 1000 20000] [--relays 2] [--plies 20]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+class CountingSocket:
+    """Websocket stand-in that counts the frames sent to it and never sends anything."""
+    
+    def __init__(self):
+        self.query_params = {}
+        self.frames = 0
+        self._closed = asyncio.Event()
+    
+    async def accept(self):
+        pass
+    
+    async def close(self, code: int = 1000, reason: str = ""):
+        self._closed.set()
+    
+    async def send_text(self, text: str):
+        self.frames += 1
+    
+    async def receive(self):
+        await self._closed.wait()
+        return {"type": "websocket.disconnect", "code": 1000}
+
+
+async def run_relay(spectators: int, game_id: str):
+    """A spectator relay process with spectators watching game_id; prints frames received once stdin closes."""
+    from app.matchmaking import matchmaking
+    from app.websocket.play import setup_matchmaking
+    from app.websocket.spectator import handle_spectator
+    
+    setup_matchmaking()
+    matchmaking.host_games = False
+    await matchmaking.start()
+    while not matchmaking.connected:
+        await asyncio.sleep(0.05)
+    
+    sockets = [CountingSocket() for _ in range(spectators)]
+    for socket in sockets:
+        asyncio.create_task(handle_spectator(socket, game_id))
+    print("ready", flush=True)
+    
+    await asyncio.get_running_loop().run_in_executor(None, sys.stdin.read)
+    print(json.dumps({"frames": sum(s.frames for s in sockets)}), flush=True)
+    os._exit(0)
+
+
+async def play_moves(game, plies: int, interval: float) -> float:
+    """Play moves on the hosted game; returns this process's CPU seconds per move."""
+    from app.websocket.manager import manager
+    
+    await asyncio.sleep(0.5)
+    start = time.process_time()
+    for ply in range(plies):
+        move = next(iter(game.board.legal_moves)).uci()
+        game.make_move(move)
+        await manager.broadcast_to_game(
+            game.game_id, game.get_state_frame(), game.white_agent_id, game.black_agent_id, state=True,
+        )
+        await asyncio.sleep(interval)
+    await asyncio.sleep(0.5)
+    return (time.process_time() - start) / plies
+
+
+async def run_host(spectators: int, relays: int, plies: int, interval: float) -> dict:
+    from app.game_engine import ChessGame
+    from app.matchmaking import matchmaking
+    from app.websocket import play
+    from app.websocket.manager import manager
+    
+    game = ChessGame(game_id="bench", white_agent_id="w", black_agent_id="b", category="blitz")
+    game.start()
+    play.active_games[game.game_id] = game
+    manager.remote_spectators.clear()
+    
+    if not relays:
+        sockets = [CountingSocket() for _ in range(spectators)]
+        tasks = [asyncio.create_task(play_spectator(s, game.game_id)) for s in sockets]
+        while manager.get_spectator_count(game.game_id) < spectators:
+            await asyncio.sleep(0.05)
+        cpu = await play_moves(game, plies, interval)
+        for socket in sockets:
+            await socket.close()
+        await asyncio.gather(*tasks)
+        return {"cpu_ms": cpu * 1000, "frames": sum(s.frames for s in sockets)}
+    
+    play.setup_matchmaking()
+    await matchmaking.start()
+    while not matchmaking.connected:
+        await asyncio.sleep(0.05)
+    manager.set_agent_game(game.white_agent_id, game.game_id)
+    manager.set_agent_game(game.black_agent_id, game.game_id)
+    await asyncio.sleep(0.2)
+    
+    procs = []
+    for r in range(relays):
+        share = spectators // relays + (r < spectators % relays)
+        procs.append(await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "benchmarks.bench_relay", "--relay", str(share),
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        ))
+    for proc in procs:
+        await read_line(proc, "ready")
+    while manager.get_spectator_count(game.game_id) < spectators:
+        await asyncio.sleep(0.05)
+    
+    cpu = await play_moves(game, plies, interval)
+    frames = 0
+    for proc in procs:
+        proc.stdin.close()
+        frames += json.loads(await read_line(proc, "{"))["frames"]
+        await proc.wait()
+    await matchmaking.stop()
+    return {"cpu_ms": cpu * 1000, "frames": frames}
+
+
+async def read_line(proc, prefix: str) -> str:
+    """The relay's next output line starting with prefix (skipping its log lines)."""
+    while True:
+        line = (await proc.stdout.readline()).decode()
+        if not line or line.startswith(prefix):
+            return line
+
+
+async def play_spectator(socket: CountingSocket, game_id: str):
+    from app.websocket.spectator import handle_spectator
+    await handle_spectator(socket, game_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--spectators", type=int, nargs="+", default=[1000, 20000])
+    parser.add_argument("--relays", type=int, default=2)
+    parser.add_argument("--plies", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.2)
+    parser.add_argument("--relay", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.relay is not None:
+        asyncio.run(run_relay(args.relay, "bench"))
+        return
+    
+    tmp = tempfile.mkdtemp()
+    os.environ.update(
+        MATCHMAKING_SERVICE=os.path.join(tmp, "matchmaking.sock"),
+        JOURNAL_PATH="",
+        HANDOFF_PATH="",
+        # Every move goes out, however many watch
+        SPECTATOR_COALESCE_THRESHOLD=str(10 ** 9),
+    )
+    service = subprocess.Popen([sys.executable, "-m", "app.matchmaking_service"], stdout=subprocess.DEVNULL)
+    while not os.path.exists(os.environ["MATCHMAKING_SERVICE"]):
+        time.sleep(0.05)
+    
+    try:
+        for n in args.spectators:
+            for relays in (0, args.relays):
+                r = asyncio.run(run_host(n, relays, args.plies, args.interval))
+                where = f"on {relays} relays" if relays else "in-process"
+                print(f"{n:>6} spectators {where:<14}: {r['cpu_ms']:>8.2f} ms of the game worker's CPU per move, "
+                      f"{r['frames'] / n:>5.1f} frames per spectator")
+    finally:
+        service.terminate()
+        service.wait()
+
+
+if __name__ == "__main__":
+    main()
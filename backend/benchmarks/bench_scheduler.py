@@ -0,0 +1,87 @@
+"""
+Benchmark the deadline scheduler that replaced the 1-second disconnect/flag scan.
+
+Schedules one flag deadline per simulated game, spread over a few seconds,
+and reports how late each fired and how much CPU the process used while
+waiting. Each game also reschedules a few times before its deadline, the
+way a move does on Clock.switch.
+
+Usage (from backend/):
+    python -m benchmarks.bench_scheduler [--games 50000] [--spread 3]
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from app.scheduler import DeadlineScheduler
+
+
+async def run(games: int, spread: float, reschedules: int, seed: int):
+    rng = random.Random(seed)
+    scheduler = DeadlineScheduler()
+    await scheduler.start()
+    
+    lateness = []
+    done = asyncio.Event()
+    
+    def make_callback(deadline: float):
+        def fire():
+            lateness.append(time.monotonic() - deadline)
+            if len(lateness) == games:
+                done.set()
+        return fire
+    
+    for game in range(games):
+        # Earlier deadlines that later get pushed back, like a clock after a move
+        for _ in range(reschedules):
+            deadline = time.monotonic() + rng.uniform(0, spread)
+            scheduler.schedule(game, deadline, make_callback(deadline))
+        deadline = time.monotonic() + spread + rng.uniform(0, spread)
+        scheduler.schedule(game, deadline, make_callback(deadline))
+    
+    cpu_start = time.process_time()
+    wall_start = time.monotonic()
+    await done.wait()
+    cpu = time.process_time() - cpu_start
+    wall = time.monotonic() - wall_start
+    await scheduler.stop()
+    
+    lateness.sort()
+    ms = [x * 1000 for x in lateness]
+    print(f"{games} deadlines over {wall:.1f}s, CPU {cpu:.2f}s ({cpu / wall * 100:.1f}% of one core)")
+    print(f"lateness ms: median {statistics.median(ms):.2f}, "
+          f"p99 {ms[int(len(ms) * 0.99)]:.2f}, max {ms[-1]:.2f}")
+
+
+async def idle(games: int, seconds: float):
+    """CPU used while many deadlines are pending but none are due."""
+    scheduler = DeadlineScheduler()
+    await scheduler.start()
+    now = time.monotonic()
+    for game in range(games):
+        scheduler.schedule(game, now + 3600 + game, lambda: None)
+    
+    cpu_start = time.process_time()
+    await asyncio.sleep(seconds)
+    cpu = time.process_time() - cpu_start
+    await scheduler.stop()
+    print(f"idle with {games} pending deadlines: {cpu * 1000:.1f} ms CPU over {seconds:.0f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=50000)
+    parser.add_argument("--spread", type=float, default=3.0)
+    parser.add_argument("--reschedules", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    
+    asyncio.run(run(args.games, args.spread, args.reschedules, args.seed))
+    asyncio.run(idle(args.games, 2.0))
+
+
+if __name__ == "__main__":
+    main()
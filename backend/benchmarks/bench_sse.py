@@ -0,0 +1,159 @@
+"""
+Benchmark the cost of a spectator: websocket vs Server-Sent Events.
+
+Runs one game in this process with --viewers spectators watching it, first
+over websockets (/watch/{game_id}), then over Server-Sent Events
+(/watch/{game_id}/events), and plays --plies moves to them. Reports the
+memory each viewer holds once connected, and the CPU time (and wall time)
+to get a move to every viewer.
+
+Usage (from backend/):
+    python -m benchmarks.bench_sse [--viewers 1000 10000] [--plies 20]
+"""
+
+import argparse
+import asyncio
+import gc
+import os
+import time
+import tracemalloc
+
+
+class CountingSocket:
+    """Websocket stand-in that counts the frames sent to it and never sends anything."""
+    
+    def __init__(self, counter: dict):
+        self.query_params = {}
+        self.counter = counter
+        self._closed = asyncio.Event()
+    
+    async def accept(self):
+        pass
+    
+    async def close(self, code: int = 1000, reason: str = ""):
+        self._closed.set()
+    
+    async def send_text(self, text: str):
+        self.counter["frames"] += 1
+    
+    async def receive(self):
+        await self._closed.wait()
+        return {"type": "websocket.disconnect", "code": 1000}
+
+
+class CountingStream:
+    """ASGI server stand-in for one event stream: counts the events sent, until closed."""
+    
+    # What servers implementing ASGI 2.4 say; the response then runs no disconnect listener
+    SCOPE = {"type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}}
+    
+    def __init__(self, counter: dict):
+        self.counter = counter
+        self.closed = False
+    
+    async def send(self, message: dict):
+        if self.closed:
+            raise OSError("viewer gone")
+        if message["type"] == "http.response.body" and message.get("body", b"").startswith(b"id:"):
+            self.counter["frames"] += 1
+    
+    async def receive(self):
+        await asyncio.Event().wait()
+
+
+async def connect_websockets(game_id: str, viewers: int, counter: dict):
+    from app.websocket.spectator import handle_spectator
+    
+    sockets = [CountingSocket(counter) for _ in range(viewers)]
+    tasks = [asyncio.create_task(handle_spectator(s, game_id)) for s in sockets]
+    
+    async def close():
+        for socket in sockets:
+            await socket.close()
+        await asyncio.gather(*tasks)
+    
+    return tasks, close
+
+
+async def connect_streams(game_id: str, viewers: int, counter: dict):
+    from app.websocket.spectator import handle_spectator_events
+    
+    streams = [CountingStream(counter) for _ in range(viewers)]
+    tasks = []
+    for stream in streams:
+        response = await handle_spectator_events(game_id, None)
+        tasks.append(asyncio.create_task(response(CountingStream.SCOPE, stream.receive, stream.send)))
+    
+    async def close():
+        from app.websocket.manager import manager
+        for stream in streams:
+            stream.closed = True
+        # Viewers notice on their next event, as with a real server
+        manager.streams[game_id].publish('{"event":"game_end"}')
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    return tasks, close
+
+
+async def run(kind: str, viewers: int, plies: int) -> dict:
+    from app.game_engine import ChessGame
+    from app.websocket import play
+    from app.websocket.manager import manager
+    
+    game = ChessGame(game_id="bench", white_agent_id="w", black_agent_id="b", category="blitz")
+    game.start()
+    play.active_games[game.game_id] = game
+    counter = {"frames": 0}
+    connect = connect_websockets if kind == "websocket" else connect_streams
+    
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tasks, close = await connect(game.game_id, viewers, counter)
+    while counter["frames"] < viewers:
+        await asyncio.sleep(0.01)
+    gc.collect()
+    memory = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    
+    cpu = wall = 0.0
+    for ply in range(plies):
+        target = counter["frames"] + viewers
+        move = next(iter(game.board.legal_moves)).uci()
+        game.make_move(move)
+        
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        await manager.broadcast_to_game(
+            game.game_id, game.get_state_frame(), game.white_agent_id, game.black_agent_id, state=True,
+        )
+        while counter["frames"] < target:
+            await asyncio.sleep(0)
+        cpu += time.process_time() - cpu_start
+        wall += time.perf_counter() - wall_start
+    
+    await close()
+    del play.active_games[game.game_id]
+    return {"bytes": memory / viewers, "cpu_ms": cpu / plies * 1000, "wall_ms": wall / plies * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--viewers", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--plies", type=int, default=20)
+    args = parser.parse_args()
+    
+    os.environ.update(
+        JOURNAL_PATH="",
+        # Every move goes out, however many watch
+        SPECTATOR_COALESCE_THRESHOLD=str(10 ** 9),
+    )
+    
+    for n in args.viewers:
+        for kind in ("websocket", "sse"):
+            r = asyncio.run(run(kind, n, args.plies))
+            print(f"{n:>6} {kind:<9} viewers: {r['bytes'] / 1024:>6.1f} KiB each, "
+                  f"{r['cpu_ms']:>8.2f} ms CPU ({r['wall_ms']:>8.2f} ms wall) to deliver a move to all")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark game-end detection: full python-chess checks vs. TerminationDetector.
+
+Replays the same pre-generated games through both paths and reports moves/sec.
+Shuffling games (knights and kings going back and forth without repeating a
+position three times) are the worst case for the old path, since every
+repetition check walks back through the whole move stack.
+
+Usage (from backend/):
+    python -m benchmarks.bench_termination [--games 20] [--plies 300]
+"""
+
+import argparse
+import random
+import time
+
+import chess
+
+from app.termination import TerminationDetector
+
+
+def legacy_check(board: chess.Board):
+    """The checks ChessGame._check_game_end used to run after every move."""
+    if board.is_checkmate():
+        return "checkmate"
+    if board.is_stalemate():
+        return "stalemate"
+    if board.is_insufficient_material():
+        return "insufficient"
+    if board.can_claim_threefold_repetition():
+        return "repetition"
+    if board.can_claim_fifty_moves():
+        return "fifty_move"
+    return None
+
+
+def generate_game(rng: random.Random, max_plies: int, shuffle_bias: float) -> list[chess.Move]:
+    """Play random moves, preferring quiet moves, until the game ends or max_plies."""
+    board = chess.Board()
+    detector = TerminationDetector(board)
+    moves = []
+    
+    while len(moves) < max_plies:
+        legal = list(board.legal_moves)
+        quiet = [m for m in legal if not board.is_irreversible(m)]
+        move = rng.choice(quiet) if quiet and rng.random() < shuffle_bias else rng.choice(legal)
+        detector.push(board, move)
+        moves.append(move)
+        if detector.check(board):
+            break
+    
+    return moves
+
+
+def run_legacy(games: list[list[chess.Move]]) -> int:
+    plies = 0
+    for moves in games:
+        board = chess.Board()
+        for move in moves:
+            board.push(move)
+            legacy_check(board)
+            plies += 1
+    return plies
+
+
+def run_incremental(games: list[list[chess.Move]]) -> int:
+    plies = 0
+    for moves in games:
+        board = chess.Board()
+        detector = TerminationDetector(board)
+        for move in moves:
+            detector.push(board, move)
+            detector.check(board)
+            plies += 1
+    return plies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--plies", type=int, default=300)
+    parser.add_argument("--shuffle-bias", type=float, default=0.9)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    
+    rng = random.Random(args.seed)
+    games = [generate_game(rng, args.plies, args.shuffle_bias) for _ in range(args.games)]
+    total = sum(len(g) for g in games)
+    print(f"{len(games)} games, {total} plies (avg {total / len(games):.0f} plies/game)")
+    
+    for name, runner in (("legacy", run_legacy), ("incremental", run_incremental)):
+        start = time.perf_counter()
+        plies = runner(games)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>12}: {plies / elapsed:>10.0f} moves/sec ({elapsed * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
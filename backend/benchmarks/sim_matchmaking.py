@@ -0,0 +1,241 @@
+"""
+Offline matchmaking simulator.
+
+Feeds synthetic seek and cancel streams into the real MatchmakingQueue on a
+virtual clock, as a discrete-event simulation: arrivals, cancels, widening
+timers and (in batch mode) batch passes are processed in time order, so
+minutes of traffic run in seconds.
+
+Arrival patterns:
+    poisson   steady arrivals at --rate seeks/sec
+    bursty    a quarter of --rate as background, plus bot fleets of
+              --fleet-size seeks landing within a second, every
+              --fleet-every seconds on average, all rated close together
+
+Elo distributions:
+    normal    N(1200, 250)
+    skewed    mostly low-rated, with a thin high-rated tail (outliers)
+    bimodal   two populations around 900 and 1600
+
+Reports time to match (overall, for outliers and per Elo band), Elo gap of
+the pairs, how often searches widened, cancels, and CPU spent per simulated
+second. --fixed-widening turns off adaptive widening, for comparison.
+
+Usage (from backend/):
+    python -m benchmarks.sim_matchmaking [--arrivals bursty] [--elo skewed] [--rate 50]
+        [--seconds 600] [--patience 120] [--batch 1.0] [--fixed-widening]
+"""
+
+import argparse
+import asyncio
+import heapq
+import itertools
+import random
+import statistics
+import time
+from collections import Counter
+
+from app.elo import get_elo_band
+from app.matchmaking import MatchmakingQueue, Seeker, SeekStatus, STAGES, STAGE_INDEX
+
+
+class RecordingQueue(MatchmakingQueue):
+    """MatchmakingQueue that records each match as it is made."""
+    
+    def __init__(self, clock):
+        super().__init__(clock=clock)
+        self.matches: list[tuple] = []  # (wait1, wait2, gap, stage1, stage2, elo1, elo2)
+    
+    def _make_match(self, category: str, seeker1: Seeker, seeker2: Seeker):
+        now = self.clock()
+        self.matches.append((
+            seeker1.get_wait_time(now), seeker2.get_wait_time(now), abs(seeker1.elo - seeker2.elo),
+            STAGE_INDEX[seeker1.status], STAGE_INDEX[seeker2.status], seeker1.elo, seeker2.elo,
+        ))
+        super()._make_match(category, seeker1, seeker2)
+
+
+def elo_sampler(kind: str, rng: random.Random):
+    def normal():
+        return rng.gauss(1200, 250)
+    
+    def skewed():
+        r = rng.random()
+        if r < 0.85:
+            return rng.gauss(1000, 150)
+        if r < 0.97:
+            return rng.gauss(1500, 150)
+        return rng.uniform(2000, 2800)
+    
+    def bimodal():
+        return rng.gauss(900, 120) if rng.random() < 0.6 else rng.gauss(1600, 120)
+    
+    sample = {"normal": normal, "skewed": skewed, "bimodal": bimodal}[kind]
+    return lambda: max(int(sample()), 100)
+
+
+def arrival_times(args, rng: random.Random) -> list[tuple[float, float | None]]:
+    """Arrival times, each with a fleet Elo centre (or None for the general population)."""
+    arrivals = []
+    if args.arrivals == "poisson":
+        t = rng.expovariate(args.rate)
+        while t < args.seconds:
+            arrivals.append((t, None))
+            t += rng.expovariate(args.rate)
+    else:
+        background = args.rate / 4
+        t = rng.expovariate(background)
+        while t < args.seconds:
+            arrivals.append((t, None))
+            t += rng.expovariate(background)
+        t = rng.expovariate(1 / args.fleet_every)
+        while t < args.seconds:
+            centre = rng.uniform(800, 2000)
+            arrivals.extend((t + rng.random(), centre) for _ in range(args.fleet_size))
+            t += rng.expovariate(1 / args.fleet_every)
+    arrivals.sort()
+    return arrivals
+
+
+def percentiles(values: list, ps=(0.5, 0.9, 0.99)) -> str:
+    if not values:
+        return "n/a"
+    values = sorted(values)
+    return " ".join(f"p{int(p * 100)} {values[min(int(len(values) * p), len(values) - 1)]:.1f}" for p in ps)
+
+
+async def simulate(args) -> None:
+    rng = random.Random(args.seed)
+    now = 0.0
+    mm = RecordingQueue(clock=lambda: now)
+    mm.batch_interval = args.batch
+    mm.adaptive_widening = not args.fixed_widening
+    if args.batch and not mm.batching:
+        print("NumPy is not installed; simulating greedy matching instead")
+    
+    sample_elo = elo_sampler(args.elo, rng)
+    arrivals = arrival_times(args, rng)
+    
+    # Pending cancels: (time, seq, agent_id)
+    cancels: list[tuple[float, int, str]] = []
+    seq = itertools.count()
+    
+    cancelled_stages = Counter()
+    cpu_per_second = Counter()
+    events = 0
+    next_batch = args.batch if mm.batching else float("inf")
+    i = 0
+    
+    while True:
+        candidates = [
+            arrivals[i][0] if i < len(arrivals) else float("inf"),
+            cancels[0][0] if cancels else float("inf"),
+            mm.timers.next_deadline() or float("inf"),
+            next_batch,
+        ]
+        t = min(candidates)
+        if t > args.seconds:
+            break
+        now = t
+        start = time.process_time()
+        kind = candidates.index(t)
+        
+        if kind == 0:
+            _, centre = arrivals[i]
+            elo = max(int(rng.gauss(centre, 50)), 100) if centre is not None else sample_elo()
+            agent_id = f"agent{i}"
+            i += 1
+            seeker = await mm.add_seeker(agent_id, agent_id, elo, "blitz")
+            if args.patience and seeker.status != SeekStatus.MATCHED:
+                heapq.heappush(cancels, (now + rng.expovariate(1 / args.patience), next(seq), agent_id))
+        elif kind == 1:
+            _, _, agent_id = heapq.heappop(cancels)
+            seeker = mm.get_seeker(agent_id, "blitz")
+            if seeker:
+                cancelled_stages[STAGE_INDEX[seeker.status]] += 1
+                await mm.remove_seeker(agent_id, "blitz")
+        elif kind == 2:
+            mm.timers.run_due(now)
+        else:
+            mm.match_batch("blitz")
+            next_batch += args.batch
+        
+        cpu_per_second[int(now)] += time.process_time() - start
+        events += 1
+    
+    report(args, mm, len(arrivals), cancelled_stages, cpu_per_second, events)
+
+
+def report(args, mm: RecordingQueue, arrived: int, cancelled_stages: Counter, cpu_per_second: Counter, events: int):
+    matches = mm.matches
+    waits = [w for m in matches for w in m[:2]]
+    gaps = [m[2] for m in matches]
+    stages = Counter(s for m in matches for s in m[3:5])
+    matched = 2 * len(matches)
+    cancelled = sum(cancelled_stages.values())
+    
+    print(f"{args.arrivals} arrivals, {args.elo} Elo, {args.rate:g}/s for {args.seconds:g}s, "
+          f"{'batch every %gs' % args.batch if mm.batching else 'greedy'}, "
+          f"{'adaptive' if mm.adaptive_widening else 'fixed'} widening")
+    print(f"  seekers:        {arrived} arrived, {matched} matched, {cancelled} cancelled, "
+          f"{len(mm.queues['blitz'])} still queued")
+    print(f"  time to match:  {percentiles(waits)} (seconds)")
+    
+    # Seekers rated far from everyone else are the ones who wait longest
+    elos = sorted(e for m in matches for e in m[5:])
+    if elos:
+        median = elos[len(elos) // 2]
+        outliers = [m[i] for m in matches for i in (0, 1) if abs(m[5 + i] - median) > 400]
+        print(f"  outliers:       {len(outliers)} matched more than 400 from the median {median}, "
+              f"time to match {percentiles(outliers)}")
+    by_band = {}
+    for m in matches:
+        for i in (0, 1):
+            by_band.setdefault(get_elo_band(m[5 + i]), []).append(m[i])
+    for band in ("bronze", "silver", "gold"):
+        if band in by_band:
+            print(f"  {band + ':':<15} {len(by_band[band])} matched, time to match {percentiles(by_band[band])}")
+    print(f"  Elo gap:        mean {statistics.mean(gaps) if gaps else 0:.1f}, {percentiles(gaps)}")
+    
+    buckets = Counter(min(g // 100, 5) for g in gaps)
+    histogram = ", ".join(
+        f"{b * 100}-{b * 100 + 99}: {buckets[b] / len(gaps) * 100:.1f}%" if b < 5 else f"500+: {buckets[b] / len(gaps) * 100:.1f}%"
+        for b in range(6)
+    ) if gaps else "n/a"
+    print(f"  gap histogram:  {histogram}")
+    
+    if matched:
+        print("  matched at:     " + ", ".join(
+            f"{STAGES[s].value} {stages[s] / matched * 100:.1f}%" for s in range(len(STAGES))
+        ))
+    if cancelled:
+        print("  cancelled at:   " + ", ".join(
+            f"{STAGES[s].value} {cancelled_stages[s] / cancelled * 100:.1f}%" for s in range(len(STAGES))
+        ))
+    
+    cpu = [cpu_per_second.get(s, 0.0) for s in range(int(args.seconds))]
+    total = sum(cpu)
+    print(f"  CPU:            {total * 1000:.0f} ms total, per simulated second mean "
+          f"{statistics.mean(cpu) * 1000:.2f} ms max {max(cpu) * 1000:.2f} ms, "
+          f"{total / max(events, 1) * 1e6:.1f} us per event")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--arrivals", choices=["poisson", "bursty"], default="poisson")
+    parser.add_argument("--elo", choices=["normal", "skewed", "bimodal"], default="normal")
+    parser.add_argument("--rate", type=float, default=5.0, help="Seeks per second")
+    parser.add_argument("--seconds", type=float, default=600)
+    parser.add_argument("--patience", type=float, default=120, help="Mean seconds before a seeker cancels (0 = never)")
+    parser.add_argument("--fleet-size", type=int, default=500)
+    parser.add_argument("--fleet-every", type=float, default=120)
+    parser.add_argument("--batch", type=float, default=0, help="Batch matching interval (0 = greedy on insert)")
+    parser.add_argument("--fixed-widening", action="store_true", help="Widen at the fixed 30s/60s thresholds")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    
+    asyncio.run(simulate(args))
+
+
+if __name__ == "__main__":
+    main()
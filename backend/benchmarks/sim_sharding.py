@@ -0,0 +1,217 @@
+"""
+Simulate games sharded over several worker processes on one machine.
+
+Starts the matchmaking service and --workers worker processes on a unix
+socket, with --agents random-move bots spread over the workers (each also
+watching its own games as a spectator). Games are placed by hashing their
+IDs (or with --placement seeker, on the first seeker's worker), so most
+moves and spectator frames cross processes through the service. Runs for
+--seconds and reports the moves played, how many of them were relayed to
+another worker, and the spectator frames delivered.
+
+Move throughput scales with the worker count only as far as there are
+cores for the workers (and the service) to run on.
+
+Usage (from backend/):
+    python -m benchmarks.sim_sharding [--workers 1 2 4] [--agents 40] [--seconds 10]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import chess
+
+
+class FakeWebSocket:
+    """Websocket stand-in that hands each received frame to a callback."""
+    
+    def __init__(self, on_frame=None):
+        self.on_frame = on_frame
+        self.query_params = {}
+        self.frames = 0
+        self._closed = asyncio.Event()
+    
+    async def accept(self):
+        pass
+    
+    async def close(self, code: int = 1000, reason: str = ""):
+        self._closed.set()
+    
+    async def send_text(self, text: str):
+        self.frames += 1
+        if self.on_frame:
+            self.on_frame(json.loads(text))
+    
+    async def send_json(self, data):
+        await self.send_text(json.dumps(data))
+    
+    async def receive(self):
+        await self._closed.wait()
+        return {"type": "websocket.disconnect", "code": 1000}
+
+
+class Bot:
+    """An agent playing random legal moves as soon as it is its turn, and seeking again after each game."""
+    
+    def __init__(self, agent_id: str, rng: random.Random, stats: dict):
+        self.agent_id = agent_id
+        self.rng = rng
+        self.stats = stats
+        self.color = None
+        self.websocket = FakeWebSocket(self.on_frame)
+    
+    def on_frame(self, frame: dict):
+        event = frame.get("event")
+        if event == "game_start":
+            self.color = frame["color"]
+            self.stats["games"] += 1
+            asyncio.create_task(self.watch(frame["game_id"]))
+            if self.color == "white":
+                self.move(frame["fen"])
+        elif event == "state" and frame["to_move"] == self.color:
+            self.move(frame["fen"])
+        elif event == "game_end":
+            self.color = None
+            asyncio.create_task(self.seek())
+    
+    def move(self, fen: str):
+        board = chess.Board(fen)
+        moves = list(board.legal_moves)
+        if moves:
+            asyncio.create_task(self.play(self.rng.choice(moves).uci()))
+    
+    async def play(self, move: str):
+        from app.websocket import play
+        from app.websocket.manager import manager
+        
+        relayed = self.agent_id in manager.game_hosts
+        if await play.handle_move(self.agent_id, move) is None:
+            self.stats["moves"] += 1
+            self.stats["relayed"] += relayed
+    
+    async def seek(self):
+        from app.websocket import play
+        await play.handle_seek(self.agent_id, self.agent_id, "bullet", 1200)
+    
+    async def watch(self, game_id: str):
+        """Spectate the game from this worker (black only, so each game is watched once here)."""
+        from app.websocket.spectator import handle_spectator
+        
+        if self.color != "black":
+            return
+        spectator = FakeWebSocket()
+        task = asyncio.create_task(handle_spectator(spectator, game_id))
+        while self.color == "black" and not task.done():
+            await asyncio.sleep(0.1)
+        self.stats["spectator_frames"] += spectator.frames
+        await spectator.close()
+
+
+async def run_worker(agent_ids: list, seconds: float, seed: int):
+    from app.rate_limiter import rate_limiter
+    from app.websocket import play
+    from app.websocket.manager import manager
+    
+    # Bots seek again as soon as a game ends
+    rate_limiter.COOLDOWNS = {"bullet": 0}
+    rate_limiter.LOSS_STREAK_THRESHOLD = 1000000
+    
+    await play.start_background_tasks()
+    while not play.matchmaking.connected:
+        await asyncio.sleep(0.05)
+    
+    rng = random.Random(seed)
+    stats = {"moves": 0, "relayed": 0, "games": 0, "spectator_frames": 0}
+    for agent_id in agent_ids:
+        bot = Bot(agent_id, rng, stats)
+        await play.handle_agent_connect(agent_id, False)
+        await manager.connect_agent(bot.websocket, agent_id, agent_id)
+        await bot.seek()
+    
+    await asyncio.sleep(seconds)
+    stats["hosted"] = len(play.active_games)
+    print(json.dumps(stats), flush=True)
+    os._exit(0)
+
+
+def setup_database(path: str, agents: int):
+    from app import database
+    database.DATABASE_PATH = path
+    asyncio.run(database.init_db())
+    db = sqlite3.connect(path)
+    db.executemany(
+        "INSERT INTO agents (id, name, moltbook_key_hash, moltchess_api_key, created_at) VALUES (?, ?, ?, ?, ?)",
+        [(f"bot{i}", f"bot{i}", f"hash{i}", f"key{i}", "2026-01-01T00:00:00") for i in range(agents)],
+    )
+    db.commit()
+    db.close()
+
+
+def run(workers: int, agents: int, seconds: float, placement: str, seed: int) -> dict:
+    tmp = tempfile.mkdtemp()
+    env = dict(
+        os.environ,
+        DATABASE_PATH=os.path.join(tmp, "sim.db"),
+        MATCHMAKING_SERVICE=os.path.join(tmp, "matchmaking.sock"),
+        GAME_PLACEMENT=placement,
+        JOURNAL_PATH="",
+        HANDOFF_PATH="",
+    )
+    os.environ.update(env)
+    setup_database(env["DATABASE_PATH"], agents)
+    
+    service = subprocess.Popen([sys.executable, "-m", "app.matchmaking_service"], env=env, stdout=subprocess.DEVNULL)
+    while not os.path.exists(env["MATCHMAKING_SERVICE"]):
+        time.sleep(0.05)
+    
+    procs = []
+    for w in range(workers):
+        agent_ids = [f"bot{i}" for i in range(w, agents, workers)]
+        procs.append(subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.sim_sharding", "--worker", ",".join(agent_ids),
+             "--seconds", str(seconds), "--seed", str(seed + w)],
+            env=env, stdout=subprocess.PIPE, text=True,
+        ))
+    
+    totals = {"moves": 0, "relayed": 0, "games": 0, "spectator_frames": 0, "hosted": 0}
+    for proc in procs:
+        lines = proc.communicate()[0].strip().splitlines()
+        stats = json.loads(lines[-1])
+        for key in totals:
+            totals[key] += stats[key]
+    service.terminate()
+    service.wait()
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--agents", type=int, default=40)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--placement", choices=["hash", "seeker"], default="hash")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.worker:
+        asyncio.run(run_worker(args.worker.split(","), args.seconds, args.seed))
+        return
+    
+    for workers in args.workers:
+        r = run(workers, args.agents, args.seconds, args.placement, args.seed)
+        print(f"{workers} workers: {r['moves'] / args.seconds:>7.1f} moves/s "
+              f"({r['relayed'] / max(r['moves'], 1):>4.0%} relayed), {r['games']:>4} game starts, "
+              f"{r['spectator_frames']:>6} spectator frames, {r['hosted']} games in progress")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,37 @@
+import asyncio
 import os
 import uvicorn
 
+
+# The game server; APP=app.spectator_relay:app runs a spectator relay instead
+WORKER_APP = "app.main:app"
+
+
+class Server(uvicorn.Server):
+    """uvicorn server that ends event streams and drains games to the handoff file before closing connections."""
+    
+    draining = False
+    
+    def handle_exit(self, sig, frame):
+        if self.draining or self.should_exit:
+            return super().handle_exit(sig, frame)
+        
+        self.draining = True
+        asyncio.get_event_loop().call_soon_threadsafe(self.start_drain, sig, frame)
+    
+    def start_drain(self, sig, frame):
+        from app.websocket.sse import end_streams
+        
+        # uvicorn waits for every response to finish, and event streams never would
+        end_streams()
+        if self.config.app != WORKER_APP:
+            return super().handle_exit(sig, frame)
+        
+        from app.websocket.handoff import drain
+        task = asyncio.create_task(drain())
+        task.add_done_callback(lambda _: super(Server, self).handle_exit(sig, frame))
+
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run("app.main:app", host="0.0.0.0", port=port)
+    Server(uvicorn.Config(os.environ.get("APP", WORKER_APP), host="0.0.0.0", port=port)).run()
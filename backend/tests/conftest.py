@@ -0,0 +1,8 @@
+"""Keep tests off the real database, journal and handoff file."""
+
+import os
+import tempfile
+
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "test.db")
+os.environ["JOURNAL_PATH"] = ""
+os.environ["HANDOFF_PATH"] = ""
@@ -0,0 +1,84 @@
+"""Batch pairing: valid matchings, and no worse than matching greedily on insert."""
+
+import asyncio
+import random
+
+import pytest
+
+from app import batch_matching
+from app.batch_matching import pair_seekers
+from app.matchmaking import MatchmakingQueue
+
+pytestmark = pytest.mark.skipif(not batch_matching.available, reason="needs NumPy")
+
+
+def assert_valid(pairs, elos, widths):
+    used = [i for pair in pairs for i in pair]
+    assert len(used) == len(set(used))
+    for i, j in pairs:
+        assert i != j
+        gap = abs(elos[i] - elos[j])
+        assert all(widths[k] is None or gap <= widths[k] for k in (i, j))
+
+
+def test_random_queues_get_valid_matchings():
+    rng = random.Random(5)
+    for _ in range(50):
+        n = rng.randint(0, 300)
+        elos = [int(rng.gauss(1200, 300)) for _ in range(n)]
+        widths = [rng.choice((200, 400, None)) for _ in range(n)]
+        waits = [rng.uniform(0, 90) for _ in range(n)]
+        assert_valid(pair_seekers(elos, widths, waits), elos, widths)
+
+
+def test_passes_are_capped(monkeypatch):
+    # A pass that only ever finds one pair would otherwise run n/2 times
+    pair_neighbours = batch_matching._pair_neighbours
+    calls = []
+    
+    def one_pair(*args):
+        calls.append(True)
+        return pair_neighbours(*args)[:1]
+    monkeypatch.setattr(batch_matching, "_pair_neighbours", one_pair)
+    
+    elos = list(range(1000, 1400, 10))
+    pairs = pair_seekers(elos, [200] * len(elos), [0.0] * len(elos))
+    assert len(calls) == len(pairs) == batch_matching.MAX_PASSES
+    assert_valid(pairs, elos, [200] * len(elos))
+
+
+def matches(elos, batch: bool):
+    """Elo gaps of the pairs made from the same arrivals, greedily on insert or in one batch."""
+    async def run():
+        mm = MatchmakingQueue(clock=lambda: 0.0)
+        mm.batch_interval = 1.0 if batch else 0.0
+        gaps = []
+        make_match = mm._make_match
+        
+        def record(category, seeker1, seeker2):
+            gaps.append(abs(seeker1.elo - seeker2.elo))
+            make_match(category, seeker1, seeker2)
+        mm._make_match = record
+        
+        for i, elo in enumerate(elos):
+            await mm.add_seeker(f"agent{i}", "", elo, "blitz")
+        if batch:
+            mm.match_batch("blitz")
+        return gaps
+    
+    return asyncio.run(run())
+
+
+def test_batch_pairs_everyone_greedy_strands():
+    # Greedy pairs 1200 with 1390 on arrival, leaving 1010 and 1580 out of each other's range
+    elos = [1200, 1390, 1010, 1580]
+    assert sorted(matches(elos, batch=False)) == [190]
+    assert sorted(matches(elos, batch=True)) == [190, 190]
+
+
+def test_batch_matches_at_least_as_many_with_smaller_gaps():
+    rng = random.Random(11)
+    elos = [int(rng.gauss(1200, 250)) for _ in range(400)]
+    greedy, batch = matches(elos, batch=False), matches(elos, batch=True)
+    assert len(batch) >= len(greedy)
+    assert sum(batch) / len(batch) <= sum(greedy) / len(greedy)
@@ -0,0 +1,38 @@
+"""JSON encoding gives the same output with or without orjson."""
+
+import json
+
+import pytest
+
+from app import encoding
+
+MESSAGES = [
+    {"event": "state", "fen": "8/8/8/8/8/8/8/8 w - - 0 1", "clock": [179.5, 180.0], "legal_moves": ["e2e4"]},
+    {"event": "chat", "name": "Schachmatt Jürgen ♞", "ids": [1, 2, 3], "nested": {"ok": True, "none": None}},
+    {1: "non-string keys"},
+]
+
+
+@pytest.fixture(params=["orjson", "json"])
+def encoder(request, monkeypatch):
+    if request.param == "json":
+        monkeypatch.setattr(encoding, "orjson", None)
+    elif encoding.orjson is None:
+        pytest.skip("orjson is not installed")
+    return request.param
+
+
+@pytest.mark.parametrize("message", MESSAGES)
+def test_output_matches_stdlib_compact_json(encoder, message):
+    expected = json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+    assert encoding.dumps(message) == expected
+    assert encoding.dumps_bytes(message) == expected.encode()
+    assert encoding.loads(expected) == encoding.loads(expected.encode()) == json.loads(expected)
+
+
+def test_encoder_name_reports_fallback(encoder):
+    assert encoding.encoder_name().startswith(encoder)
+
+
+def test_response_renders_with_either_encoder(encoder):
+    assert encoding.FastJSONResponse({"a": "é"}).body == '{"a":"é"}'.encode()
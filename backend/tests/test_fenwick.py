@@ -0,0 +1,37 @@
+"""Fenwick tree counts against a plain list."""
+
+import random
+
+from app.fenwick import FenwickTree
+
+
+def test_matches_a_list_of_counts():
+    rng = random.Random(0)
+    counts = [0] * 100
+    tree = FenwickTree(100)
+    for _ in range(500):
+        slot = rng.randrange(100)
+        delta = 1 if counts[slot] == 0 or rng.random() < 0.6 else -1
+        counts[slot] += delta
+        tree.add(slot, delta)
+        
+        probe = rng.randrange(-1, 101)
+        assert tree.prefix(probe) == sum(counts[:max(probe + 1, 0)])
+        assert tree.total == sum(counts)
+        
+        occupied = [i for i, count in enumerate(counts) if count]
+        assert tree.next_at_or_after(probe) == next((i for i in occupied if i >= probe), -1)
+        assert tree.prev_at_or_before(probe) == next((i for i in reversed(occupied) if i <= probe), -1)
+        if tree.total:
+            k = rng.randint(1, tree.total)
+            assert sum(counts[:tree.find(k)]) < k <= sum(counts[:tree.find(k) + 1])
+
+
+def test_from_counts_matches_adding_one_by_one():
+    counts = [3, 0, 1, 4, 1, 5, 9, 2, 6]
+    built = FenwickTree.from_counts(counts)
+    added = FenwickTree(len(counts))
+    for slot, count in enumerate(counts):
+        added.add(slot, count)
+    assert built._tree == added._tree
+    assert built.total == added.total == sum(counts)
@@ -0,0 +1,64 @@
+"""Draining to a handoff file with sockets still open."""
+
+import asyncio
+import json
+
+import pytest
+
+from app.config import get_settings
+from app.game_engine import ChessGame
+from app.websocket import play
+from app.websocket.handoff import drain
+from app.websocket.manager import create_outbox, manager
+from app.websocket.multiwatch import MultiSpectator
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+        self.closes = []
+    
+    async def send_text(self, text):
+        self.sent.append(text)
+    
+    async def send_bytes(self, data):
+        self.sent.append(data)
+    
+    async def close(self, code=1000, reason=""):
+        self.closes.append((code, reason))
+
+
+@pytest.fixture
+def handoff_path(tmp_path, monkeypatch):
+    path = tmp_path / "handoff.json"
+    monkeypatch.setattr(get_settings(), "handoff_path", str(path))
+    monkeypatch.setattr(play, "draining", False)
+    yield path
+    manager.spectators.clear()
+
+
+def start_game(monkeypatch, game_id):
+    game = ChessGame(game_id=game_id, white_agent_id=f"{game_id}w", black_agent_id=f"{game_id}b", category="blitz")
+    game.start()
+    monkeypatch.setitem(play.active_games, game_id, game)
+    return game
+
+
+def test_drain_closes_multi_game_socket_once(handoff_path, monkeypatch):
+    for game_id in ("g1", "g2"):
+        start_game(monkeypatch, game_id)
+    
+    async def run():
+        websocket = FakeWebSocket()
+        spectator = MultiSpectator(websocket, create_outbox(websocket))
+        await spectator.subscribe("g1")
+        await spectator.subscribe("g2")
+        
+        await drain()
+        return websocket
+    
+    websocket = asyncio.run(run())
+    assert websocket.closes == [(1012, "Server restarting")]
+    # Each game's join frame went out before the close
+    assert len(websocket.sent) == 2
+    assert sorted(game["game_id"] for game in json.loads(handoff_path.read_text())["games"]) == ["g1", "g2"]
@@ -0,0 +1,130 @@
+"""Replaying the move journal, before and after compaction."""
+
+import asyncio
+
+from app.game_engine import ChessGame
+from app.journal import MoveJournal, clock_reading, game_records, load_journal
+
+MOVES = ["e2e4", "e7e5", "g1f3", "b8c6", "f1b5"]
+
+
+def play(moves, pgn_clock_comments=True) -> ChessGame:
+    game = ChessGame(game_id="g1", white_agent_id="w", black_agent_id="b", category="blitz",
+                     pgn_clock_comments=pgn_clock_comments)
+    game.start()
+    for i, move in enumerate(moves):
+        # Distinct readings, so a lost clock would show in the PGN
+        game.clock.last_move_time -= 7 * (i + 1)
+        assert game.make_move(move) == (True, None)
+    return game
+
+
+def replay(record) -> ChessGame:
+    game = ChessGame(game_id=record.game_id, white_agent_id=record.white_agent_id,
+                     black_agent_id=record.black_agent_id, category=record.category,
+                     pgn_clock_comments=record.pgn_clock_comments)
+    assert all(game.replay_move(m, c) for m, c in zip(record.moves, record.clocks))
+    return game
+
+
+def write_journal(path, game: ChessGame, compact: bool):
+    async def run():
+        journal = MoveJournal()
+        await journal.open(path, fsync=False)
+        journal.record_start(game.game_id, game.white_agent_id, game.black_agent_id, game.category, None, True)
+        for move, clock in zip(game.moves, game.move_clocks):
+            journal.record_move(game.game_id, move, *clock)
+        journal.record_start("g2", "x", "y", "rapid", None)
+        journal.record_end("g2")
+        await journal.close()
+        
+        if compact:
+            await journal.open(path, fsync=False)
+            await journal.compact(game_records(
+                game.game_id, game.white_agent_id, game.black_agent_id, game.category, None, True,
+                game.moves, game.clock.white_time, game.clock.black_time, game.move_clocks,
+            ))
+            await journal.close()
+    
+    asyncio.run(run())
+
+
+def test_replay_drops_ended_games_and_torn_tail(tmp_path):
+    path = str(tmp_path / "journal")
+    game = play(MOVES)
+    write_journal(path, game, compact=False)
+    with open(path, "ab") as f:
+        f.write(b'{"t":"move","g":"g1","m":"e8')
+    
+    games = load_journal(path)
+    assert list(games) == ["g1"]
+    assert games["g1"].moves == MOVES
+
+
+def test_recovered_pgn_matches_uninterrupted_game(tmp_path):
+    game = play(MOVES)
+    assert "%clk" in game.pgn.movetext.decode()
+    
+    for compact in (False, True):
+        path = str(tmp_path / f"journal-{compact}")
+        write_journal(path, game, compact)
+        recovered = replay(load_journal(path)["g1"])
+        assert recovered.pgn.movetext == game.pgn.movetext
+        assert recovered.move_clocks == [(clock_reading(w), clock_reading(b)) for w, b in game.move_clocks]
+
+
+def test_compaction_keeps_only_last_clock_without_comments():
+    game = play(MOVES, pgn_clock_comments=False)
+    assert game.move_clocks == []
+    records = game_records("g1", "w", "b", "blitz", None, False, game.moves,
+                           game.clock.white_time, game.clock.black_time, game.move_clocks)
+    assert ["cw" in r for r in records[1:]] == [False] * (len(MOVES) - 1) + [True]
+
+
+def test_recovery_holds_clocks_and_ends_rows_it_cannot_replay(tmp_path, monkeypatch):
+    from app.database import get_db, init_db
+    from app.websocket import play as server
+    from app.websocket.manager import manager
+    
+    game = play(MOVES)
+    path = str(tmp_path / "journal")
+    
+    async def run():
+        await init_db()
+        async with get_db() as db:
+            for game_id in ("g1", "g3"):
+                await db.execute(
+                    "INSERT INTO games (id, white_agent_id, black_agent_id, category, status) VALUES (?, 'w', 'b', 'blitz', 'active')",
+                    (game_id,)
+                )
+            await db.commit()
+        
+        journal = MoveJournal()
+        await journal.open(path, fsync=False)
+        journal.record_start("g1", "w", "b", "blitz", None, True)
+        for move, clock in zip(game.moves, game.move_clocks):
+            journal.record_move("g1", move, *clock)
+        journal.record_start("g3", "x", "y", "blitz", None)
+        journal.record_move("g3", "e2e5", 180, 180)
+        await journal.close()
+        
+        await server.recover_games(path)
+        
+        async with get_db() as db:
+            cursor = await db.execute("SELECT id, status, termination FROM games ORDER BY id")
+            return [tuple(row) for row in await cursor.fetchall()]
+    
+    monkeypatch.setattr(server, "deadlines", server.DeadlineScheduler())
+    try:
+        rows = asyncio.run(run())
+        recovered = server.active_games["g1"]
+        
+        # Nobody's clock runs, and nobody can flag, until the player to move reconnects
+        assert recovered.clock.last_move_time is None
+        assert (recovered.clock.white_time, recovered.clock.black_time) == tuple(map(clock_reading, game.move_clocks[-1]))
+        assert ("g1", "flag") not in server.deadlines
+        assert rows == [("g1", "active", None), ("g3", "ended", "aborted")]
+        assert "g3" not in server.active_games
+    finally:
+        server.active_games.pop("g1", None)
+        manager.agent_games.clear()
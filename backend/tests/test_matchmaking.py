@@ -0,0 +1,114 @@
+"""The Elo-indexed seeker queue, and seeks matched as they arrive."""
+
+import asyncio
+import random
+import time
+
+from app.elo import get_elo_band
+from app.matchmaking import STAGE_WIDTHS, STAGES, MatchmakingQueue, Seeker, SeekerQueue, SeekStatus, matchmaking
+from app.websocket.play import handle_seek
+
+
+def test_seek_matched_on_insert_gets_no_queued_reply():
+    async def run():
+        first = await handle_seek("agent-a", "a", "blitz", 1200)
+        second = await handle_seek("agent-b", "b", "blitz", 1250)
+        return first, second
+    
+    first, second = asyncio.run(run())
+    assert first == {"event": "queued", "category": "blitz", "position": 1, "elo_range": [1000, 1400]}
+    assert second is None
+    assert not matchmaking.is_seeking("agent-a") and not matchmaking.is_seeking("agent-b")
+
+
+def test_matched_seekers_keep_the_range_they_were_queued_with():
+    async def run():
+        mm = MatchmakingQueue()
+        mm.adaptive_widening = False
+        waiting = await mm.add_seeker("agent-a", "a", 1200, "rapid", queued_at=time.time() - 40)
+        arriving = await mm.add_seeker("agent-b", "b", 1350, "rapid")
+        await mm.stop()
+        return waiting, arriving
+    
+    waiting, arriving = asyncio.run(run())
+    assert waiting.status == arriving.status == SeekStatus.MATCHED
+    assert waiting.get_elo_range() == (800, 1600)
+    assert arriving.get_elo_range() == (1150, 1550)
+
+
+def queued(queue, agent_id, elo, status=SeekStatus.SEARCHING):
+    seeker = Seeker(agent_id, agent_id, elo, "blitz", get_elo_band(elo), status=status)
+    queue.add(seeker)
+    return seeker
+
+
+def test_queue_positions_counts_and_removal():
+    queue = SeekerQueue()
+    seekers = [queued(queue, f"s{i}", elo) for i, elo in enumerate((1200, 1500, 1210, 900, 1500))]
+    
+    assert [queue.position(s) for s in seekers] == [1, 2, 3, 4, 5]
+    assert queue.count_between(1200, 1210) == 2
+    assert queue.count_between(1500, 1500) == 2
+    assert queue.count_between(0, 9999) == 5
+    
+    assert queue.remove(seekers[1])
+    assert not queue.remove(seekers[1])
+    assert [queue.position(s) for s in seekers] == [1, 0, 2, 3, 4]
+    assert queue.count_between(1500, 1500) == 1
+    assert [s.agent_id for s in queue.page(1, 2)] == ["s2", "s3"]
+    
+    # Restaging moves a seeker between stage indexes without changing its place or counts
+    queue.set_status(seekers[3], SeekStatus.WIDENING_2)
+    assert (queue.stage_count(0), queue.stage_count(2)) == (3, 1)
+    assert queue.position(seekers[3]) == 3
+    assert queue.count_between(800, 1000) == 1
+
+
+def test_positions_survive_renumbering():
+    queue = SeekerQueue()
+    kept = []
+    for i in range(3000):
+        seeker = queued(queue, f"s{i}", 1000 + i % 500)
+        if i % 7:
+            queue.remove(seeker)
+        else:
+            kept.append(seeker)
+    assert [queue.position(s) for s in kept] == list(range(1, len(kept) + 1))
+
+
+def test_partner_closest_within_each_stage_width():
+    queue = SeekerQueue()
+    seeker = queued(queue, "me", 1500)
+    queued(queue, "far", 1750, SeekStatus.WIDENING_2)
+    assert queue.find_partner(seeker) is None  # Outside my ±200
+    
+    queue.set_status(seeker, SeekStatus.WIDENING_1)
+    assert queue.find_partner(seeker).agent_id == "far"
+    
+    # Nearer, but only accepts ±200 and I am 300 away: not compatible
+    queued(queue, "picky", 1200)
+    assert queue.find_partner(seeker).agent_id == "far"
+    
+    # Nearest of the compatible ones; the earlier arrival on equal distance
+    queued(queue, "near", 1600, SeekStatus.WIDENING_1)
+    queued(queue, "near-too", 1400, SeekStatus.WIDENING_1)
+    assert queue.find_partner(seeker).agent_id == "near"
+
+
+def test_partner_matches_brute_force():
+    rng = random.Random(3)
+    widths = dict(zip(STAGES, STAGE_WIDTHS))
+    
+    def compatible(a, b):
+        distance = abs(a.elo - b.elo)
+        return all(widths[s.status] is None or distance <= widths[s.status] for s in (a, b))
+    
+    for _ in range(30):
+        queue = SeekerQueue()
+        seekers = [
+            queued(queue, f"s{i}", rng.randint(600, 2400), rng.choice(STAGES)) for i in range(rng.randint(1, 40))
+        ]
+        for seeker in seekers:
+            candidates = [other for other in seekers if other is not seeker and compatible(seeker, other)]
+            best = min(candidates, key=lambda other: (abs(other.elo - seeker.elo), other.seq), default=None)
+            assert queue.find_partner(seeker) is best
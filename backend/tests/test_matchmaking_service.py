@@ -0,0 +1,132 @@
+"""The shared matchmaking service with workers connected to it in-process."""
+
+import asyncio
+
+from app.matchmaking_service import MatchmakingClient, MatchmakingService, shard_for, start_server
+
+
+async def settle():
+    await asyncio.sleep(0.05)
+
+
+async def run_service(path, test, workers=2, relays=0):
+    """Run test(service, clients) against a service with connected clients: `workers`, then `relays`."""
+    service = MatchmakingService()
+    await service.start()
+    server = await start_server(service.handle_worker, path)
+    clients = [MatchmakingClient(path) for _ in range(workers + relays)]
+    for relay in clients[workers:]:
+        relay.host_games = False
+    try:
+        for client in clients:
+            await client.start()
+        await settle()
+        await test(service, clients)
+    finally:
+        for client in clients:
+            await client.stop()
+        server.close()
+        await service.stop()
+
+
+def match_one_game(clients, matches):
+    """Seek with one agent on each of two workers, recording on_match where it fires."""
+    for client in clients:
+        async def on_match(match, client=client):
+            matches.append((client.worker_id, match))
+        client.on_match = on_match
+    
+    async def seek():
+        await clients[0].agent_connected("a", False)
+        await clients[1].agent_connected("b", False)
+        await clients[0].add_seeker("a", "A", 1500, "blitz")
+        await clients[1].add_seeker("b", "B", 1500, "blitz")
+        await settle()
+    return seek()
+
+
+def test_games_rank_for_feeds_only_once_their_host_has_them(tmp_path):
+    async def test(service, clients):
+        matches = []
+        await match_one_game(clients, matches)
+        (host_id, match), = matches
+        host = next(client for client in clients if client.worker_id == host_id)
+        
+        # Matched, but no game on the host yet (it may never create one)
+        assert not service.ratings
+        assert await host.top_games("blitz", 5) == []
+        
+        host.assign("a", match.game_id, ("blitz", 1500.0))
+        host.assign("b", match.game_id, ("blitz", 1500.0))
+        await settle()
+        assert await host.top_games("blitz", 5) == [match.game_id]
+        
+        host.assign("a", None)
+        host.assign("b", None)
+        await settle()
+        assert await host.top_games("blitz", 5) == []
+        assert not service.ratings
+    
+    asyncio.run(run_service(str(tmp_path / "mm.sock"), test))
+
+
+def test_games_placed_by_hashing_their_id_over_hosting_workers(tmp_path):
+    async def test(service, clients):
+        workers, relay = clients[:2], clients[2]
+        assert service.hosting == {client.worker_id for client in workers}
+        
+        matches = []
+        for client in clients:
+            async def on_match(match, client=client):
+                matches.append((client.worker_id, match))
+            client.on_match = on_match
+        
+        # Every seeker on the first worker; the games still spread over both
+        for i in range(12):
+            await workers[0].agent_connected(f"a{i}", False)
+            await workers[0].agent_connected(f"b{i}", False)
+            await workers[0].add_seeker(f"a{i}", "A", 1500, "blitz")
+            await workers[0].add_seeker(f"b{i}", "B", 1500, "blitz")
+        await settle()
+        
+        assert len(matches) == 12
+        for host, match in matches:
+            assert host == shard_for(match.game_id, service.hosting)
+        assert {host for host, _ in matches} == service.hosting
+        assert relay.worker_id not in {host for host, _ in matches}
+    
+    asyncio.run(run_service(str(tmp_path / "mm.sock"), test, workers=2, relays=1))
+
+
+def test_published_frames_reach_only_subscribed_relays(tmp_path):
+    async def test(service, clients):
+        host, watching, idle = clients
+        routed = {client.worker_id: [] for client in clients}
+        for client in clients:
+            async def on_route(event, client=client):
+                routed[client.worker_id].append(event)
+            client.on_route = on_route
+        
+        host.assign("a", "g1", ("blitz", 1500.0))
+        await settle()
+        watching.watch("g1", 1, True)
+        await settle()
+        assert service.subscribers == {"g1": {watching.worker_id}}
+        assert [event["type"] for event in routed[host.worker_id]] == ["watchers"]
+        
+        host.publish("g1", {"event": "move", "n": 1}, state=True)
+        await settle()
+        assert routed[watching.worker_id] == [{
+            "type": "spectate", "game_id": "g1", "message": {"event": "move", "n": 1}, "state": True,
+        }]
+        assert routed[idle.worker_id] == []
+        
+        # Once its spectators leave, the relay gets no more of the game's frames
+        watching.watch("g1", 0, False)
+        await settle()
+        host.publish("g1", {"event": "move", "n": 2})
+        await settle()
+        assert len(routed[watching.worker_id]) == 1
+        assert routed[idle.worker_id] == []
+    
+    asyncio.run(run_service(str(tmp_path / "mm.sock"), test, workers=1, relays=2))
@@ -0,0 +1,57 @@
+"""Multi-game spectator sockets: subscriptions racing the feed."""
+
+import asyncio
+
+from app.websocket.manager import create_outbox, manager
+from app.websocket.multiwatch import MultiSpectator
+
+
+class FakeWebSocket:
+    async def send_text(self, text):
+        pass
+    
+    async def send_bytes(self, data):
+        pass
+    
+    async def close(self, code=1000, reason=""):
+        pass
+
+
+class SlowRelay:
+    """A matchmaking client whose lookups take a while, as over the network."""
+    
+    def __init__(self):
+        self.watches = []
+    
+    async def locate(self, game_id):
+        await asyncio.sleep(0.01)
+        return "other-worker"
+    
+    def watch(self, game_id, count, joined):
+        self.watches.append((game_id, count, joined))
+
+
+def test_concurrent_subscribes_to_one_game_add_one_view(monkeypatch):
+    relay = SlowRelay()
+    monkeypatch.setattr(manager, "relay", relay)
+    
+    async def run():
+        websocket = FakeWebSocket()
+        spectator = MultiSpectator(websocket, create_outbox(websocket))
+        try:
+            # The client subscribing while the feed picks the same game
+            await asyncio.gather(spectator.subscribe("g1"), spectator.subscribe("g1", pinned=False))
+            assert list(spectator.views) == ["g1"]
+            assert manager.get_spectator_count("g1") == 1
+            assert relay.watches == [("g1", 1, True)]
+            
+            # Ending the game unsubscribes in a task the spectator keeps hold of
+            spectator.views["g1"].send({"event": "game_end"})
+            assert spectator._leaving
+            await asyncio.sleep(0.01)
+            assert not spectator.views and not spectator._leaving
+        finally:
+            await spectator.close()
+            manager.joining.clear()
+    
+    asyncio.run(run())
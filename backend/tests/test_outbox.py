@@ -0,0 +1,121 @@
+"""Per-socket send queues: slow consumer policies and who is served first."""
+
+import asyncio
+
+from app.websocket.manager import AgentConnection, manager
+from app.websocket.outbox import COALESCE, DISCONNECT, SLOW_CONSUMER_CODE, Outbox
+
+
+class StalledWebSocket:
+    """A socket whose sends wait until released, as on a bad link."""
+    
+    def __init__(self, name="", log=None, stalled=True):
+        self.name = name
+        self.log = log if log is not None else []
+        self.released = asyncio.Event()
+        if not stalled:
+            self.released.set()
+        self.sent = []
+        self.closes = []
+    
+    async def send_text(self, text):
+        await self.released.wait()
+        self.sent.append(text)
+        self.log.append(self.name)
+    
+    async def send_bytes(self, data):
+        await self.send_text(data)
+    
+    async def close(self, code=1000, reason=""):
+        self.closes.append((code, reason))
+
+
+def queued(outbox):
+    return [text for text, _ in outbox._frames]
+
+
+def test_disconnect_policy_evicts_a_full_queue():
+    async def run():
+        websocket = StalledWebSocket()
+        outbox = Outbox(websocket, limit=3, policy=DISCONNECT)
+        assert all(outbox.put(f"s{i}", state=True) for i in range(3))
+        assert not outbox.put("s3", state=True)
+        await asyncio.sleep(0)
+        assert outbox.closed and not queued(outbox)
+        assert not outbox.put("s4")
+        return websocket
+    
+    websocket = asyncio.run(run())
+    assert websocket.closes == [(SLOW_CONSUMER_CODE, "Too slow")]
+    assert websocket.sent == []
+
+
+def test_coalesce_policy_keeps_the_newest_state_per_game():
+    async def run():
+        websocket = StalledWebSocket()
+        outbox = Outbox(websocket, limit=3, policy=COALESCE)
+        outbox.put("chat")
+        for i in range(10):
+            assert outbox.put(f"g1 state {i}", state=True, game_id="g1")
+            assert outbox.put(f"g2 state {i}", state=True, game_id="g2")
+        assert queued(outbox) == ["chat", "g1 state 9", "g2 state 9"]
+        
+        # A delta move event can't stand in for the queued snapshots, so a full queue still evicts
+        assert not outbox.put("g1 move", state=True, snapshot=False, game_id="g1")
+        await asyncio.sleep(0)
+        assert outbox.closed
+        return websocket
+    
+    websocket = asyncio.run(run())
+    assert websocket.closes == [(SLOW_CONSUMER_CODE, "Too slow")]
+
+
+def test_coalesced_frames_go_out_once_the_consumer_catches_up():
+    async def run():
+        websocket = StalledWebSocket()
+        outbox = Outbox(websocket, limit=2, policy=COALESCE)
+        for i in range(5):
+            outbox.put(f"state {i}", state=True)
+        websocket.released.set()
+        await outbox.close()
+        return websocket
+    
+    websocket = asyncio.run(run())
+    # The writer may already have taken the first frame when later ones arrived
+    assert websocket.sent[-1] == "state 4"
+    assert len(websocket.sent) <= 2
+    assert websocket.closes == [(1000, "")]
+
+
+def test_opponent_served_before_spectators_however_many_are_stuck():
+    async def run():
+        log = []
+        players = {
+            agent_id: StalledWebSocket(agent_id, log, stalled=False) for agent_id in ("w", "b")
+        }
+        for agent_id, websocket in players.items():
+            manager.agents[agent_id] = AgentConnection(agent_id, agent_id, websocket, Outbox(websocket, 8))
+        
+        spectators = [StalledWebSocket(f"spectator{i}", log) for i in range(50)]
+        for websocket in spectators:
+            manager.add_spectator(websocket, "g1", Outbox(websocket, 8))
+        # Every writer idle, waiting for frames
+        await asyncio.sleep(0)
+        
+        try:
+            await manager.broadcast_to_game("g1", {"event": "state"}, "w", "b", first_id="b", state=True)
+            await asyncio.sleep(0.01)
+            # Both players have their frame, with every spectator still stuck
+            assert log == ["b", "w"]
+            
+            for websocket in spectators:
+                websocket.released.set()
+            await asyncio.sleep(0.01)
+            assert log[:2] == ["b", "w"] and len(log) == 52
+        finally:
+            for agent_id in players:
+                manager.agents.pop(agent_id).outbox.discard()
+            for outbox in manager.spectators.pop("g1").values():
+                outbox.discard()
+    
+    asyncio.run(run())
@@ -0,0 +1,43 @@
+"""Ending games: finalizing once, and cleaning up when recording fails."""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from app.game_engine import ChessGame
+from app.websocket import play
+from app.websocket.manager import manager
+
+
+@pytest.fixture
+def game(monkeypatch):
+    game = ChessGame(game_id="g1", white_agent_id="w", black_agent_id="b", category="blitz")
+    game.start()
+    monkeypatch.setitem(play.active_games, "g1", game)
+    manager.set_agent_game("w", "g1")
+    manager.set_agent_game("b", "g1")
+    yield game
+    manager.agent_games.clear()
+
+
+def test_players_freed_when_the_result_cannot_be_recorded(game, monkeypatch):
+    calls = []
+    
+    @asynccontextmanager
+    async def broken_db():
+        calls.append(True)
+        raise OSError("disk full")
+        yield
+    
+    monkeypatch.setattr(play, "get_db", broken_db)
+    game.end_by_disconnect(True)
+    
+    with pytest.raises(OSError):
+        asyncio.run(play.end_game(game))
+    assert "g1" not in play.active_games
+    assert manager.get_agent_game("w") is None and manager.get_agent_game("b") is None
+    
+    # A second caller (a flag racing the forfeit) finds nothing left to finalize
+    asyncio.run(play.end_game(game))
+    assert len(calls) == 1
@@ -0,0 +1,49 @@
+"""Wire protocol negotiation and framing, with and without msgpack."""
+
+import pytest
+
+from app.game_engine import ChessGame
+from app.websocket import protocol
+from app.websocket.protocol import DELTA, JSON, MSGPACK, FrameEncoder, parse_protocol
+
+
+def state_frames():
+    game = ChessGame(game_id="g1", white_agent_id="w", black_agent_id="b", category="blitz")
+    game.start()
+    frames = [game.get_state_frame({"game_id": "g1"})]
+    for move in ("e2e4", "e7e5"):
+        game.make_move(move)
+        frames.append(game.get_state_frame({"game_id": "g1"}))
+    return frames
+
+
+def test_parse_protocol():
+    assert parse_protocol(None) == JSON
+    assert parse_protocol("DELTA") == DELTA
+    assert parse_protocol("protobuf") is None
+
+
+def test_msgpack_refused_and_unlisted_without_the_package(monkeypatch):
+    monkeypatch.setattr(protocol, "msgpack", None)
+    assert parse_protocol("msgpack") is None
+    assert protocol.supported_protocols() == (JSON, DELTA)
+    assert protocol.unsupported_protocol_error()["message"] == "Unsupported protocol. Use: json, delta"
+
+
+def test_delta_sends_a_snapshot_then_moves():
+    encoder = FrameEncoder(DELTA)
+    kinds = []
+    for frame in state_frames():
+        encoded, snapshot = encoder.encode(frame)
+        kinds.append((protocol.loads(encoded)["event"], snapshot))
+    assert kinds == [("state", True), ("move", False), ("move", False)]
+
+
+def test_msgpack_frames_decode_to_the_delta_events():
+    msgpack = pytest.importorskip("msgpack")
+    delta, packed = FrameEncoder(DELTA), FrameEncoder(MSGPACK)
+    for frame in state_frames():
+        text, _ = delta.encode(frame)
+        data, _ = packed.encode(frame)
+        assert isinstance(data, bytes)
+        assert msgpack.unpackb(data) == protocol.loads(text)
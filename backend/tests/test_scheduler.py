@@ -0,0 +1,41 @@
+"""Deadline scheduler: firing order and coroutine callbacks."""
+
+import asyncio
+import gc
+
+from app.scheduler import DeadlineScheduler
+
+
+def test_due_deadlines_fire_in_order_and_skip_cancelled():
+    now = [0.0]
+    scheduler = DeadlineScheduler(clock=lambda: now[0])
+    fired = []
+    for key, delay in (("b", 2), ("a", 1), ("c", 3)):
+        scheduler.schedule_in(key, delay, lambda key=key: fired.append(key))
+    scheduler.schedule_in("a", 2.5, lambda: fired.append("a"))
+    scheduler.cancel("c")
+    
+    now[0] = 10
+    assert scheduler.run_due() == 2
+    assert fired == ["b", "a"]
+    assert len(scheduler) == 0
+
+
+def test_coroutine_callbacks_run_to_completion():
+    scheduler = DeadlineScheduler(clock=lambda: 0.0)
+    finished = []
+    
+    async def callback():
+        await asyncio.sleep(0.01)
+        finished.append(True)
+    
+    async def run():
+        scheduler.schedule("flag", 0, callback)
+        scheduler.run_due()
+        # Nothing but the scheduler holds the task
+        gc.collect()
+        await asyncio.sleep(0.05)
+    
+    asyncio.run(run())
+    assert finished == [True]
+    assert not scheduler._running
@@ -0,0 +1,131 @@
+"""Spectator event streams: registration, disconnects and shutdown."""
+
+import asyncio
+
+import pytest
+
+from app.game_engine import ChessGame
+from app.websocket import leaderboard_feed, lobby, play, sse
+from app.websocket.manager import manager
+from app.websocket.spectator import handle_spectator_events
+
+
+@pytest.fixture
+def game(monkeypatch):
+    game = ChessGame(game_id="g1", white_agent_id="w", black_agent_id="b", category="blitz")
+    game.start()
+    monkeypatch.setitem(play.active_games, "g1", game)
+    monkeypatch.setattr(sse, "streams_ended", False)
+    yield game
+    manager.streams.clear()
+
+
+async def never_disconnects():
+    await asyncio.Event().wait()
+
+
+def scope(spec_version):
+    return {"type": "http", "asgi": {"spec_version": spec_version}}
+
+
+def test_stream_registered_only_while_streaming(game):
+    async def run():
+        response = await handle_spectator_events("g1", None)
+        # A response that is never sent leaves nothing behind
+        assert "g1" not in manager.streams
+        
+        sent = []
+        async def send(message):
+            sent.append(message)
+        
+        task = asyncio.create_task(response(scope("2.4"), never_disconnects, send))
+        await asyncio.sleep(0.05)
+        assert manager.streams["g1"].viewers == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert "g1" not in manager.streams
+    
+    asyncio.run(run())
+
+
+def test_disconnect_ends_stream_on_older_servers(game):
+    async def run():
+        gone = asyncio.Event()
+        async def receive():
+            await gone.wait()
+            return {"type": "http.disconnect"}
+        async def send(message):
+            pass
+        
+        response = await handle_spectator_events("g1", None)
+        task = asyncio.create_task(response(scope("2.3"), receive, send))
+        await asyncio.sleep(0.05)
+        assert manager.streams["g1"].viewers == 1
+        gone.set()
+        await asyncio.wait_for(task, 1)
+        assert "g1" not in manager.streams
+    
+    asyncio.run(run())
+
+
+def test_end_streams_finishes_every_response(game):
+    async def run():
+        sent = []
+        async def send(message):
+            sent.append(message)
+        
+        response = await handle_spectator_events("g1", None)
+        task = asyncio.create_task(response(scope("2.4"), never_disconnects, send))
+        await asyncio.sleep(0.05)
+        sse.end_streams()
+        await asyncio.wait_for(task, 1)
+        assert sent[-1] == {"type": "http.response.body", "body": b"", "more_body": False}
+        
+        # Streams opened afterwards end straight away
+        response = await handle_spectator_events("g1", None)
+        await asyncio.wait_for(response(scope("2.4"), never_disconnects, send), 1)
+    
+    asyncio.run(run())
+
+
+def test_leaderboard_window_registered_only_while_streaming(monkeypatch):
+    monkeypatch.setattr(sse, "streams_ended", False)
+    monkeypatch.setattr(leaderboard_feed.rankings, "loaded", True)
+    
+    async def run():
+        response = await leaderboard_feed.handle_leaderboard_events("blitz", 10, None, 5, None)
+        assert not leaderboard_feed.windows
+        
+        sent = []
+        async def send(message):
+            sent.append(message)
+        
+        task = asyncio.create_task(response(scope("2.4"), never_disconnects, send))
+        await asyncio.sleep(0.05)
+        assert list(leaderboard_feed.windows) == [("top", "blitz", 10)]
+        sse.end_streams()
+        await asyncio.wait_for(task, 1)
+        assert not leaderboard_feed.windows
+    
+    asyncio.run(run())
+
+
+def test_end_streams_finishes_lobby_feed(monkeypatch):
+    monkeypatch.setattr(sse, "streams_ended", False)
+    monkeypatch.setattr(lobby.stream, "ended", False)
+    
+    async def run():
+        sent = []
+        async def send(message):
+            sent.append(message)
+        
+        response = await lobby.handle_lobby_events(None)
+        task = asyncio.create_task(response(scope("2.4"), never_disconnects, send))
+        await asyncio.sleep(0.05)
+        assert lobby.stream.viewers == 1
+        sse.end_streams()
+        await asyncio.wait_for(task, 1)
+        assert lobby.stream.viewers == 0
+    
+    asyncio.run(run())
@@ -0,0 +1,110 @@
+"""TerminationDetector against python-chess's own end-of-game checks."""
+
+import random
+
+import chess
+import pytest
+
+from app.termination import TerminationDetector
+
+# Sparse positions reach insufficient material and the fifty-move rule within a few hundred plies
+START_FENS = [
+    chess.STARTING_FEN,
+    "r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1",
+    "4k3/8/8/3n4/8/8/8/2B1K3 w - - 0 1",
+    "4k3/2p5/8/3N4/8/8/5P2/4K3 w - - 90 1",
+    "8/4k3/8/8/8/8/4K3/3QB3 b - - 0 1",
+]
+
+
+def expected(board: chess.Board):
+    """What ChessGame ended games on before the detector, in the same order."""
+    if board.is_checkmate():
+        return "checkmate"
+    if board.is_stalemate():
+        return "stalemate"
+    if board.is_insufficient_material():
+        return "insufficient"
+    if board.can_claim_threefold_repetition():
+        return "repetition"
+    if board.can_claim_fifty_moves():
+        return "fifty_move"
+    return None
+
+
+def play(board: chess.Board, moves) -> str:
+    """
+    Push moves through a detector, checking it against python-chess after every ply.
+    
+    Stops at the first ending, as a game does (the detector only looks for
+    insufficient material right after the capture or promotion causing it).
+    """
+    detector = TerminationDetector(board)
+    ending = detector.check(board)
+    assert ending == expected(board)
+    for move in moves:
+        if ending:
+            break
+        detector.push(board, move)
+        ending = detector.check(board)
+        assert ending == expected(board), (board.fen(), [m.uci() for m in board.move_stack])
+    return ending
+
+
+def random_moves(board: chess.Board, rng: random.Random, plies: int, shuffle_bias: float):
+    """Random legal moves on the board as it goes, mostly reversible ones with a high shuffle_bias."""
+    for _ in range(plies):
+        legal = list(board.legal_moves)
+        if not legal:
+            return
+        quiet = [move for move in legal if not board.is_irreversible(move)]
+        yield rng.choice(quiet) if quiet and rng.random() < shuffle_bias else rng.choice(legal)
+
+
+@pytest.mark.parametrize("fen", START_FENS)
+@pytest.mark.parametrize("shuffle_bias", [0.0, 0.9])
+def test_random_games_match_python_chess(fen, shuffle_bias):
+    for seed in range(8):
+        board = chess.Board(fen)
+        play(board, random_moves(board, random.Random(seed), 300, shuffle_bias))
+
+
+def test_knight_shuffle_claims_the_move_before_the_third_occurrence():
+    board = chess.Board()
+    shuffle = ["g1f3", "g8f6", "f3g1", "f6g8"] * 3
+    assert play(board, [chess.Move.from_uci(uci) for uci in shuffle]) == "repetition"
+    # Black's f6g8 would now bring back the starting position a third time
+    assert len(board.move_stack) == 7
+
+
+# Knights going out and back, starting with the side to move after the double push
+SHUFFLES = {
+    chess.BLACK: ["g8f6", "g1f3", "f6g8", "f3g1"] * 3,
+    chess.WHITE: ["g1f3", "g8f6", "f3g1", "f6g8"] * 3,
+}
+
+
+@pytest.mark.parametrize("fen, first, plies", [
+    # A double push whose en passant capture is legal: the position after it differs from the
+    # same pieces later on, so the knights need one more move to be able to claim
+    ("4k1n1/8/8/8/3p4/8/4P3/4K1N1 w - - 0 1", "e2e4", 9),
+    # A double push with no pawn beside it: the en passant square doesn't make the position new
+    ("4k1n1/8/8/8/8/8/4P3/4K1N1 w - - 0 1", "e2e4", 8),
+    # The capture exists but would expose the king to the rook along the rank: not legal, so it doesn't count
+    ("6n1/8/8/8/k2p3R/8/4P3/4K1N1 w - - 0 1", "e2e4", 8),
+    # Black's double push, with White's capture legal
+    ("4k1n1/3p4/8/4P3/8/8/8/4K1N1 b - - 0 1", "d7d5", 9),
+])
+def test_en_passant_repetitions(fen, first, plies):
+    board = chess.Board(fen)
+    moves = [first] + SHUFFLES[not board.turn]
+    assert play(board, [chess.Move.from_uci(uci) for uci in moves]) == "repetition"
+    assert len(board.move_stack) == plies
+
+
+def test_detector_rebuilt_mid_game_agrees():
+    rng = random.Random(1)
+    board = chess.Board()
+    for _ in range(40):
+        board.push(rng.choice(list(board.legal_moves)))
+    play(board, random_moves(board, rng, 200, 0.9))
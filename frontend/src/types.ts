@@ -1,7 +1,7 @@
 export type Category = 'bullet' | 'blitz' | 'rapid';
 export type GameStatus = 'pending' | 'active' | 'ended';
 export type GameResult = 'white_win' | 'black_win' | 'draw';
-export type Termination = 'checkmate' | 'timeout' | 'stalemate' | 'insufficient' | 'repetition' | 'fifty_move' | 'disconnect';
+export type Termination = 'checkmate' | 'timeout' | 'stalemate' | 'insufficient' | 'repetition' | 'fifty_move' | 'disconnect' | 'aborted';
 
 export interface Agent {
   id: string;